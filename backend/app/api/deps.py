@@ -1,12 +1,10 @@
 #Simple helper functions without Depends
 
 from fastapi import HTTPException, status
-from sqlalchemy import select
 
-from app.db.session import AsyncSessionLocal
-from app.models.user import User
 from app.core.security import decode_access_token
 from app.core.logger import logger
+from app.utils.principal_cache import principal_cache
 
 
 async def get_user_from_token(token):
@@ -32,24 +30,20 @@ async def get_user_from_token(token):
             detail="Invalid token payload"
         )
     
-    # Get database session
-    async with AsyncSessionLocal() as db:
-        result = await db.execute(
-            select(User).where(User.email == email)
+    # Cached for a short TTL, otherwise loaded from the database
+    user = await principal_cache.get_user(email)
+    
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
         )
-        user = result.scalar_one_or_none()
-        
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found"
-            )
-        
-        if not user.is_active:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="User account is inactive"
-            )
-        
-        logger.info(f"User authenticated: {user.email}")
-        return user
\ No newline at end of file
+    
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User account is inactive"
+        )
+    
+    logger.debug(f"User authenticated: {user.email}")
+    return user
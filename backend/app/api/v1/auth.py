@@ -7,10 +7,12 @@ from sqlalchemy import select
 
 from app.schemas.user import UserCreate, UserLogin, UserResponse, Token
 from app.models.user import User, UserRole
-from app.core.security import hash_password, verify_password, create_access_token, validate_password_strength
+from app.core.security import create_access_token, validate_password_strength
+from app.utils.password_service import password_service
 from app.api.deps import get_user_from_token
 from app.db.session import AsyncSessionLocal
 from app.core.logger import logger
+from app.core.config import settings
 
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -63,7 +65,7 @@ async def register_user(user_data: UserCreate):
             new_user = User(
                 employee_id=user_data.employee_id,
                 email=user_data.email,
-                hashed_password=hash_password(user_data.password),
+                hashed_password=await password_service.hash(user_data.password),
                 full_name=user_data.full_name,
                 role=UserRole.USER,
                 is_active=True,
@@ -133,12 +135,9 @@ async def login(login_data: UserLogin):
         
         # Debug logging
         logger.debug(f"Login attempt - User found: {user.email}")
-        logger.debug(f"Password received (length): {len(login_data.password)}")
-        logger.debug(f"Password received (repr): {repr(login_data.password)}")
-        logger.debug(f"Hash (first 20): {user.hashed_password[:20]}")
         
-        # Verify password
-        password_valid = verify_password(login_data.password, user.hashed_password)
+        # Verify password (bcrypt runs in the password thread pool, not on the event loop)
+        password_valid, new_hash = await password_service.verify_and_update(login_data.password, user.hashed_password)
         logger.debug(f"Password verification result: {password_valid}")
         
         if not password_valid:
@@ -155,6 +154,12 @@ async def login(login_data: UserLogin):
                 detail="User account is inactive"
             )
         
+        # Stored hash uses an old BCRYPT_ROUNDS, replace it now that we know the password
+        if new_hash:
+            user.hashed_password = new_hash
+            await db.commit()
+            logger.info(f"Rehashed password for {user.email} with cost {settings.BCRYPT_ROUNDS}")
+        
         # Create JWT token
         access_token = create_access_token(
             data={"sub": user.email, "user_id": user.id}
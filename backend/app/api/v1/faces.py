@@ -1,9 +1,9 @@
 ### Fae recongnition endpoints
 
-from openpyxl.styles import Font
-from fastapi import Depends,APIRouter,UploadFile,File,Header,HTTPException,status,Form
+from fastapi import Depends,APIRouter,UploadFile,File,Header,HTTPException,status,Form,WebSocket,WebSocketDisconnect
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+import asyncio
 import os
 import uuid
 from typing import Optional
@@ -14,7 +14,10 @@ from app.schemas.face import (
     FaceUploadResponse,
     FaceMatchResponse,
     FaceMatchResult,
-    FaceRegisterResponse
+    FaceRegisterResponse,
+    MultiFaceCandidate,
+    DetectedFaceMatch,
+    MultiFaceMatchResponse
 )
 
 from app.models.user import User, UserRole
@@ -26,7 +29,16 @@ from app.core.config import settings
 from app.db.session import AsyncSessionLocal
 from app.utils.face_detector import face_detector
 from app.utils.face_encoder import face_encoder
+from app.utils.inference_executor import inference_executor,InferenceOverloadedError
+from app.utils.face_tracker import FaceTracker
+from app.utils.model_registry import model_registry
+from app.utils.inference_cache import inference_cache
+from app.utils.principal_cache import principal_cache
 from app.utils.redis_cache import redis_cache
+from app.utils.async_redis_cache import async_redis_cache
+from app.utils.face_gallery import face_gallery
+from app.utils.gallery_sync import gallery_sync
+from app.utils.quantization import pack_int8
 import numpy as np
 
 router=APIRouter(prefix="/faces",tags=["Face Recognition"])
@@ -34,9 +46,8 @@ router=APIRouter(prefix="/faces",tags=["Face Recognition"])
 #helper function to get current user
 async def get_current_user_from_token(authorization:str) -> User:
     """extracting and validating user from JWT token"""
-    logger.info(f"Received authorization header: {authorization}")
     if not authorization or not authorization.startswith("Bearer "):
-        logger.warning(f"Invalid authorization format: {authorization}")
+        logger.warning("Invalid authorization header format")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials"
@@ -51,16 +62,14 @@ async def get_current_user_from_token(authorization:str) -> User:
         
     email=payload.get("sub")
     
-    async with AsyncSessionLocal() as db:
-        result=await db.execute(select(User).where(User.email==email))
-        user=result.scalar_one_or_none()
-        
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found"
-            )
-        return user
+    #cached for a short TTL, dashboard polling doesn't query users every time
+    user=await principal_cache.get_user(email) if email else None
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    return user
     
 @router.post("/register",response_model=FaceRegisterResponse)
 async def register_face(
@@ -103,12 +112,12 @@ async def register_face(
             
             if not employee_user:
                 # Create new employee user with temporary email and password
-                from app.core.security import hash_password
+                from app.utils.password_service import password_service
                 employee_user = User(
                     employee_id=employee_id,
                     full_name=full_name,
                     email=f"{employee_id}@temp.local",  # Temporary email
-                    hashed_password=hash_password("changeme123"),  # Temporary password
+                    hashed_password=await password_service.hash("changeme123"),  # Temporary password
                     role=UserRole.USER,
                     is_active=True,
                     is_verified=False
@@ -130,52 +139,43 @@ async def register_face(
                     detail="Maximum of 5 faces already registered for this employee"
                 )
         
-        #Saving uploaded file
-        file_extension=file.filename.split(".")[-1]
-        filename=f"{employee_id}_photo{photo_number}.{file_extension}"
-        
-        #creating upload directory for this employee
-        upload_dir=f"./data/uploads/{employee_user.id}"
-        os.makedirs(upload_dir,exist_ok=True)
-        
-        #generating unique filename
-        file_extension=file.filename.split(".")[-1]
-        unique_filename=f"{uuid.uuid4()}.{file_extension}"
-        file_path=os.path.join(upload_dir,unique_filename)
-        
-        #save the file at the location
-        with open(file_path,'wb') as f:
-            content=await file.read()
-            f.write(content)
-            
-        logger.info(f"Saved uploaded image to {file_path}")
-        
+        #Analysing the upload in memory, the image is only written once it is accepted
+        content=await file.read()
         
-        #Face detection and quality check
-        face_info=face_detector.detect_face(file_path)
+        #Face detection, quality check and embedding in a single detector pass
+        face_info,embedding=await inference_executor.analyze(content,min_quality=0.5)
         if not face_info:
-            os.remove(file_path)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No face detected in the image"
             )
         #Checking quality
         if face_info['quality_score'] <0.5:
-            os.remove(file_path)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Face quality too low: {face_info['quality_score']:.2f}"
             )
         
-        #Extract embedding
-        embedding=face_encoder.extract_embedding(file_path)
-        
         if embedding is None:
-            os.remove(file_path)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to extract face embedding"
             )
+        
+        #creating upload directory for this employee
+        upload_dir=f"./data/uploads/{employee_user.id}"
+        os.makedirs(upload_dir,exist_ok=True)
+        
+        #generating unique filename
+        file_extension=file.filename.split(".")[-1]
+        unique_filename=f"{uuid.uuid4()}.{file_extension}"
+        file_path=os.path.join(upload_dir,unique_filename)
+        
+        #save the file at the location
+        with open(file_path,'wb') as f:
+            f.write(content)
+            
+        logger.info(f"Saved uploaded image to {file_path}")
             
         #Save to database
         async with AsyncSessionLocal() as db:
@@ -198,7 +198,8 @@ async def register_face(
             #Creating encoding record
             new_encoding=Encoding(
                 face_id=new_face.id,
-                embedding=face_encoder.serialize_embedding(embedding),
+                embedding=face_encoder.serialize_embedding(embedding,model_name=face_encoder.model_name),
+                embedding_int8=pack_int8(embedding),
                 model_name=face_encoder.model_name,
                 model_version="1.0"
             )
@@ -206,6 +207,16 @@ async def register_face(
             await db.commit()
             logger.info(f"Registered face {new_face.id} for employee {employee_id} ({full_name})")
             
+            #keeping the in-memory gallery in sync
+            face_gallery.add(
+                face_id=new_face.id,
+                user_id=employee_user.id,
+                employee_id=employee_user.employee_id,
+                full_name=employee_user.full_name,
+                embedding=embedding
+            )
+            await gallery_sync.publish(added=[new_face.id])
+            
             # Return proper response format 
             return FaceRegisterResponse(
                 success=True,
@@ -280,6 +291,8 @@ async def mark_attendance(data:dict):
             status=AttendanceStatus.PRESENT
         )
         db.add(new_attendance)
+        #rollups are updated in the same transaction as the row
+        await record_attendance(db, user.id, today, AttendanceStatus.PRESENT)
         await db.commit()
         await db.refresh(new_attendance)
         
@@ -330,24 +343,14 @@ async def match_face_from_upload(file: UploadFile = File(...)):
             detail="File must be an image"
         )
     
-    # Save temp file
-    temp_id = str(uuid.uuid4())
-    temp_path = f"./data/temp/{temp_id}.jpg"
-    os.makedirs("./data/temp", exist_ok=True)
-    
-    logger.info(f"Saving to temp path: {temp_path}")
-    
     try:
-        # Save uploaded file
+        # Read upload into memory, matching never touches the disk
         contents = await file.read()
-        logger.info(f"Saved {len(contents)} bytes")
+        logger.info(f"Received {len(contents)} bytes")
         
-        with open(temp_path, "wb") as f:
-            f.write(contents)
-        
-        # Detect face
+        # Detect, align and embed face in one pass
         logger.info("Starting face detection...")
-        face_info = face_detector.detect_face(temp_path)
+        face_info, embedding = await inference_executor.analyze(contents)
         
         if not face_info:
             raise HTTPException(
@@ -357,10 +360,6 @@ async def match_face_from_upload(file: UploadFile = File(...)):
         
         logger.info(f"Face detected: {face_info}")
         
-        # Extract embedding
-        logger.info("Extracting face embedding...")
-        embedding = face_encoder.extract_embedding(temp_path)
-        
         if embedding is None:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -369,39 +368,16 @@ async def match_face_from_upload(file: UploadFile = File(...)):
         
         logger.info(f"Embedding extracted, shape: {embedding.shape}")
         
-        # Get all registered faces from database
-        async with AsyncSessionLocal() as db:
-            result = await db.execute(
-                select(Encoding, Face, User)
-                .join(Face, Encoding.face_id == Face.id)
-                .join(User, Face.user_id == User.id)
-                .where(User.is_active == True)
-            )
-            
-            db_faces = result.all()
-            logger.info(f"Comparing against {len(db_faces)} faces in database")
+        # Compare against the in-memory gallery
+        await face_gallery.ensure_loaded()
+        logger.info(f"Comparing against {len(face_gallery)} faces in gallery")
         
-        # Compare with database faces
-        matches = []
         threshold = 0.40  # 40% threshold for considering candidates
+        matches = await face_gallery.search_async(embedding, top_k=5, threshold=threshold)
+        
+        for match in matches:
+            logger.info(f"Match candidate: {match['full_name']} - {match['similarity']*100:.1f}% confidence")
         
-        for encoding, face, user in db_faces:
-            db_embedding = face_encoder.deserialize_embedding(encoding.embedding)
-            similarity = face_encoder.cosine_similarity(embedding, db_embedding)
-            
-            if similarity >= threshold:
-                logger.info(f"Match candidate: {user.full_name} - {similarity*100:.1f}% confidence")
-                matches.append({
-                    'user_id': user.id,
-                    'employee_id': user.employee_id,
-                    'full_name': user.full_name,
-                    'similarity': similarity
-                })
-        
-        # Sort by similarity
-        if matches:
-            matches.sort(key=lambda x: x.get('similarity', 0), reverse=True)
-            
         logger.info(f"Found {len(matches)} matches above threshold")
         
         # Only return match if confidence is above 50% (good match)
@@ -443,11 +419,6 @@ async def match_face_from_upload(file: UploadFile = File(...)):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing face: {str(e)}"
         )
-    finally:
-        # Cleanup temp file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-            logger.info(f"Cleaned up temp file: {temp_path}")
             
 @router.get("/my-faces",response_model=list[FaceDetailResponse])
 async def get_my_faces(
@@ -464,32 +435,36 @@ async def get_my_faces(
         return faces
     
     
-    @router.delete("/{face_id}")
-    async def delete_face(
-        face_id:int,
-        authorization:str=Header(None)
-        
-    ):
-        #Deleting a face by face id
-        user =await get_current_user_from_token(authorization)
-        
-        async with AsyncSessionLocal() as db:
-            result=await db.execute(
-                select(Face).where(Face.id==face_id,Face.user_id==user.id)
+@router.delete("/{face_id}")
+async def delete_face(
+    face_id:int,
+    authorization:str=Header(None)
+    
+):
+    #Deleting a face by face id
+    user =await get_current_user_from_token(authorization)
+    
+    async with AsyncSessionLocal() as db:
+        result=await db.execute(
+            select(Face).where(Face.id==face_id,Face.user_id==user.id)
+        )
+        face=result.scalar_one_or_none()
+        if not face:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Face not found"
             )
-            face=result.scalar_one_or_none()
-            if not face:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Face not found"
-                )
-            #deleting face
-            if face.original_image_path and os.path.exists(face.original_image_path):
-                os.remove(face.original_image_path)
-                
-            await db.delete(face)
-            await db.commit()
-            return {"message": "Face Deleted Successfully"}
+        #deleting face
+        if face.original_image_path and os.path.exists(face.original_image_path):
+            os.remove(face.original_image_path)
+            
+        await db.delete(face)
+        await db.commit()
+        face_gallery.remove_face(face_id)
+        #the shared Redis tier must not keep the deleted face's vector
+        await async_redis_cache.remove_gallery_faces([face_id])
+        await gallery_sync.publish(removed=[face_id])
+        return {"message": "Face Deleted Successfully"}
 
 
 @router.post("/match-camera", response_model=FaceMatchResponse)
@@ -502,28 +477,16 @@ async def match_face_from_camera(
     This endpoint accepts image captured from webcam and matches against database.
     No authentication required for quick face matching.
     """
-    temp_path = None
-    
     try:
         logger.info(f"Received camera capture: {file.filename}, content_type: {file.content_type}")
         
-        # Save temporary file
-        temp_dir = "./data/temp"
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        temp_filename = f"{uuid.uuid4()}.{file.filename.split('.')[-1]}"
-        temp_path = os.path.join(temp_dir, temp_filename)
-        
-        logger.info(f"Saving to temp path: {temp_path}")
-        
-        with open(temp_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-            logger.info(f"Saved {len(content)} bytes")
+        # Read capture into memory, matching never touches the disk
+        content = await file.read()
+        logger.info(f"Received {len(content)} bytes")
         
-        # Detect face
+        # Detect, align and embed face in one pass
         logger.info("Starting face detection...")
-        face_info = face_detector.detect_face(temp_path)
+        face_info, query_embedding = await inference_executor.analyze(content)
         
         if not face_info:
             logger.warning("No face detected in image")
@@ -534,10 +497,6 @@ async def match_face_from_camera(
         
         logger.info(f"Face detected: {face_info}")
         
-        # Extract embedding
-        logger.info("Extracting face embedding...")
-        query_embedding = face_encoder.extract_embedding(temp_path)
-        
         if query_embedding is None:
             logger.error("Failed to extract embedding")
             raise HTTPException(
@@ -547,43 +506,16 @@ async def match_face_from_camera(
         
         logger.info(f"Embedding extracted, shape: {query_embedding.shape}")
         
-        # Always query database for accurate matching
-        async with AsyncSessionLocal() as db:
-            result = await db.execute(
-                select(Encoding, Face, User)
-                .join(Face, Encoding.face_id == Face.id)
-                .join(User, Face.user_id == User.id)
-                .where(User.is_active == True)
-            )
-            
-            all_encodings = result.all()
-            logger.info(f"Comparing against {len(all_encodings)} faces in database")
-            
-            matches = []
-            
-            for encoding, face, user in all_encodings:
-                # Deserialize embedding
-                db_embedding = face_encoder.deserialize_embedding(encoding.embedding)
-                
-                # Calculate similarity using cosine similarity
-                similarity = face_encoder.cosine_similarity(query_embedding, db_embedding)
-                
-                # Only consider matches above 40% confidence
-                if similarity >= 0.40:
-                    matches.append({
-                        "user_id": user.id,
-                        "employee_id": user.employee_id,
-                        "full_name": user.full_name,
-                        "similarity": float(similarity),
-                        "quality_score": face.quality_score
-                    })
-                    
-                    logger.info(f"Match candidate: {user.full_name} - {similarity*100:.1f}% confidence")
-        
-        # Sort by similarity
-        if matches:
-            matches.sort(key=lambda x: x.get('similarity', 0), reverse=True)
-            
+        # Compare against the in-memory gallery
+        await face_gallery.ensure_loaded()
+        logger.info(f"Comparing against {len(face_gallery)} faces in gallery")
+        
+        # Only consider matches above 40% confidence
+        matches = await face_gallery.search_async(query_embedding, top_k=5, threshold=0.40)
+        
+        for match in matches:
+            logger.info(f"Match candidate: {match['full_name']} - {match['similarity']*100:.1f}% confidence")
+        
         logger.info(f"Camera match: Found {len(matches)} matches above threshold")
         
         # Only return match if confidence is above 50% (good match)
@@ -617,17 +549,211 @@ async def match_face_from_camera(
                 message="No matching face found in database"
             )
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in match_face_from_camera: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
+
+
+@router.post("/match-multi", response_model=MultiFaceMatchResponse)
+async def match_multiple_faces(
+    file: UploadFile = File(...),
+    top_k: int = Form(3)
+):
+    """
+    Match every face in one image (group photo, entrance camera).
+    
+    All faces are embedded in a single forward pass and searched against
+    the gallery with one matrix-matrix product. Returns each face's box
+    and its top_k candidates, largest face first.
+    """
+    if not file.content_type or not file.content_type.startswith('image/'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File must be an image"
+        )
+    top_k = max(1, min(top_k, 10))
+    
+    try:
+        content = await file.read()
+        logger.info(f"Received multi-face image: {file.filename}, {len(content)} bytes")
+        
+        analyzed = await inference_executor.analyze_all(content)
+        if not analyzed:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No face detected in image"
+            )
+        
+        # Search only the faces that produced an embedding
+        embedded = [i for i, (_, embedding) in enumerate(analyzed) if embedding is not None]
+        await face_gallery.ensure_loaded()
+        results = await face_gallery.search_batch_async(
+            [analyzed[i][1] for i in embedded],
+            top_k=top_k,
+            threshold=0.40  # same candidate threshold as /match
+        )
+        matches_of = dict(zip(embedded, results))
+        
+        faces = []
+        for i, (face_info, _) in enumerate(analyzed):
+            matches = matches_of.get(i, [])
+            best = matches[0] if matches and matches[0]['similarity'] >= 0.50 else None
+            faces.append(DetectedFaceMatch(
+                box=face_info['box'],
+                detection_confidence=face_info['confidence'],
+                quality_score=face_info['quality_score'],
+                match_found=best is not None,
+                employee_id=best['employee_id'] if best else None,
+                full_name=best['full_name'] if best else None,
+                confidence=best['similarity'] if best else None,
+                candidates=[
+                    MultiFaceCandidate(
+                        employee_id=match['employee_id'],
+                        full_name=match['full_name'],
+                        confidence=match['similarity']
+                    )
+                    for match in matches
+                ]
+            ))
+        
+        matches_found = sum(1 for face in faces if face.match_found)
+        logger.info(f"Multi-face match: {matches_found}/{len(faces)} faces matched")
+        
+        return MultiFaceMatchResponse(
+            faces_detected=len(faces),
+            matches_found=matches_found,
+            faces=faces,
+            message=f"Matched {matches_found} of {len(faces)} detected faces"
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in match_multiple_faces: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+
+async def _process_stream_frame(websocket: WebSocket, tracker: FaceTracker, frame: bytes, frame_number: int):
+    """Detect and track faces in one frame, embed only new or clearly better tracks"""
+    faces = await inference_executor.detect_all(frame)
+    tracked, ended = tracker.update(faces)
+    
+    to_embed = [
+        (track, face_info) for track, face_info in tracked
+        if tracker.needs_embedding(track, face_info['quality_score'])
+    ]
+    events = []
+    if to_embed:
+        # One forward pass and one gallery search for every face that needs it
+        embeddings = await inference_executor.embed_batch([face_info['aligned_face'] for _, face_info in to_embed])
+        results = await face_gallery.search_batch_async(list(embeddings), top_k=1, threshold=0.40)
+        
+        for (track, face_info), matches in zip(to_embed, results):
+            track.embedded_quality = face_info['quality_score']
+            best = matches[0] if matches and matches[0]['similarity'] >= 0.50 else None
+            result = {
+                "match_found": best is not None,
+                "employee_id": best['employee_id'] if best else None,
+                "full_name": best['full_name'] if best else None,
+                "confidence": best['similarity'] if best else None
+            }
+            previous = track.match
+            # A better crop may confirm or correct the identity, never lose a confident one
+            if previous is None or (result['confidence'] or 0) >= (previous['confidence'] or 0):
+                track.match = result
+            if previous is None or previous['employee_id'] != track.match['employee_id']:
+                events.append({"type": "match", **track.to_dict()})
+    
+    for track in ended:
+        events.append({"type": "lost", "track_id": track.track_id})
+    events.append({
+        "type": "tracks",
+        "frame": frame_number,
+        "tracks": [track.to_dict() for track, _ in tracked]
+    })
+    
+    for event in events:
+        await websocket.send_json(event)
+
+
+@router.websocket("/stream")
+async def recognize_stream(websocket: WebSocket):
+    """
+    Continuous recognition over a WebSocket.
+    
+    The client sends JPEG frames as binary messages. Only every
+    (STREAM_FRAME_SKIP + 1)th frame is processed and, while one is being
+    processed, newer frames replace the waiting one instead of queueing.
+    Faces are followed across frames by an IoU tracker and only new tracks
+    (or a clearly better crop of a known one) are embedded and matched.
+    
+    Server messages (JSON):
+      {"type": "match", track_id, box, match_found, employee_id, full_name, confidence}
+      {"type": "lost", track_id}
+      {"type": "tracks", frame, tracks: [...]}   after every processed frame
+      {"type": "busy", retry_after}             frame dropped, inference pool saturated
+    
+    No authentication required, same as /match-camera.
+    """
+    await websocket.accept()
+    logger.info("Recognition stream opened")
+    
+    tracker = FaceTracker()
+    latest = {}
+    frame_ready = asyncio.Event()
+    
+    async def receive_frames():
+        received = 0
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                raise WebSocketDisconnect(message.get('code', 1000))
+            frame = message.get('bytes')
+            if not frame:
+                continue  # text messages are ignored
+            received += 1
+            if (received - 1) % (settings.STREAM_FRAME_SKIP + 1):
+                continue
+            # Keep only the newest frame, stale ones are dropped while inference is busy
+            latest['frame'] = (received, frame)
+            frame_ready.set()
+    
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        await face_gallery.ensure_loaded()
+        while True:
+            waiter = asyncio.create_task(frame_ready.wait())
+            await asyncio.wait({receiver, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver.done():
+                waiter.cancel()
+                receiver.result()  # re-raises the disconnect
+            
+            frame_ready.clear()
+            frame_number, frame = latest.pop('frame')
+            try:
+                await _process_stream_frame(websocket, tracker, frame, frame_number)
+            except InferenceOverloadedError as e:
+                await websocket.send_json({"type": "busy", "retry_after": int(e.headers["Retry-After"])})
+    
+    except WebSocketDisconnect:
+        logger.info("Recognition stream closed by client")
+    except HTTPException as e:
+        # ML disabled and similar, tell the client why before closing
+        await websocket.send_json({"type": "error", "detail": e.detail})
+        await websocket.close(code=1011)
+    except Exception as e:
+        logger.error(f"Error in recognition stream: {str(e)}", exc_info=True)
+        await websocket.close(code=1011)
     finally:
-        # Clean up temp file
-        if temp_path and os.path.exists(temp_path):
-            os.remove(temp_path)
-            logger.info(f"Cleaned up temp file: {temp_path}")
+        receiver.cancel()
 
 
 # ============================================
@@ -641,10 +767,16 @@ from app.schemas.attendance import (
     AttendanceMarkRequest,
     AttendanceResponse,
     AttendanceMarkResponse,
-    AttendanceAnalytics
+    AttendanceAnalytics,
+    AttendanceDayCounts,
+    OrgDailyAnalytics,
+    EmployeeMonthCounts,
+    OrgMonthlyAnalytics
 )
+from app.models.attendance_rollup import AttendanceUserMonth, AttendanceOrgDay
+from app.utils.attendance_rollups import record_attendance, forget_user
 from datetime import date, timedelta
-from sqlalchemy import func, and_, extract
+from sqlalchemy import func, and_
 
 
 @router.post("/attendance/mark", response_model=AttendanceMarkResponse)
@@ -697,6 +829,8 @@ async def mark_attendance(
         )
         
         db.add(new_attendance)
+        # Rollups are updated in the same transaction as the row
+        await record_attendance(db, request.user_id, today, AttendanceStatus.PRESENT)
         await db.commit()
         await db.refresh(new_attendance)
         
@@ -742,40 +876,42 @@ async def get_attendance_analytics(
     """
     user = await get_current_user_from_token(authorization)
     
+    # Sargable range for the current month, extract() can't use the (user_id, date) index
+    today = date.today()
+    month_start = today.replace(day=1)
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+    in_current_month = and_(Attendance.date >= month_start, Attendance.date < next_month)
+    
     async with AsyncSessionLocal() as db:
-        # Get all attendance records
+        # One aggregate query: per status, all-time and current month counts
         result = await db.execute(
-            select(Attendance).where(Attendance.user_id == user.id)
+            select(
+                Attendance.status,
+                func.count(),
+                func.count().filter(in_current_month)
+            )
+            .where(Attendance.user_id == user.id)
+            .group_by(Attendance.status)
         )
-        all_attendances = result.scalars().all()
+        totals = {}
+        month_totals = {}
+        for attendance_status, count, month_count in result.all():
+            totals[attendance_status] = count
+            month_totals[attendance_status] = month_count
         
         # Calculate statistics
-        total_days = len(all_attendances)
-        present_days = sum(1 for att in all_attendances if att.status == AttendanceStatus.PRESENT)
-        absent_days = sum(1 for att in all_attendances if att.status == AttendanceStatus.ABSENT)
-        half_days = sum(1 for att in all_attendances if att.status == AttendanceStatus.HALF_DAY)
-        leave_days = sum(1 for att in all_attendances if att.status == AttendanceStatus.LEAVE)
+        total_days = sum(totals.values())
+        present_days = totals.get(AttendanceStatus.PRESENT, 0)
+        absent_days = totals.get(AttendanceStatus.ABSENT, 0)
+        half_days = totals.get(AttendanceStatus.HALF_DAY, 0)
+        leave_days = totals.get(AttendanceStatus.LEAVE, 0)
         
         # Calculate attendance percentage
         attendance_percentage = (present_days / total_days * 100) if total_days > 0 else 0.0
         
         # Current month statistics
-        today = date.today()
-        current_month_result = await db.execute(
-            select(Attendance).where(
-                and_(
-                    Attendance.user_id == user.id,
-                    extract('year', Attendance.date) == today.year,
-                    extract('month', Attendance.date) == today.month
-                )
-            )
-        )
-        current_month_attendances = current_month_result.scalars().all()
-        current_month_total = len(current_month_attendances)
-        current_month_present = sum(
-            1 for att in current_month_attendances 
-            if att.status == AttendanceStatus.PRESENT
-        )
+        current_month_total = sum(month_totals.values())
+        current_month_present = month_totals.get(AttendanceStatus.PRESENT, 0)
         
         return AttendanceAnalytics(
             total_days=total_days,
@@ -787,12 +923,107 @@ async def get_attendance_analytics(
             current_month_present=current_month_present,
             current_month_total=current_month_total
         )
+
+
+
+async def _require_admin(authorization: str) -> User:
+    current_user = await get_current_user_from_token(authorization)
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=403,
+            detail="Only administrators can view organisation analytics"
+        )
+    return current_user
+
+
+async def _active_employees(db: AsyncSession) -> int:
+    result = await db.execute(select(func.count(User.id)).where(User.is_active == True))
+    return result.scalar_one()
+
+
+@router.get("/admin/attendance/daily", response_model=OrgDailyAnalytics)
+async def get_org_daily_attendance(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    authorization: str = Header(None)
+):
+    """
+    Organisation wide status counts per day (Admin only), default the last 30 days.
+    Reads the attendance_org_day rollup, one row per day however long the history.
+    """
+    await _require_admin(authorization)
+    
+    end_date = end_date or date.today()
+    start_date = start_date or end_date - timedelta(days=29)
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+    
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(AttendanceOrgDay)
+            .where(AttendanceOrgDay.date >= start_date, AttendanceOrgDay.date <= end_date)
+            .order_by(AttendanceOrgDay.date)
+        )
+        days = result.scalars().all()
+        
+        return OrgDailyAnalytics(
+            start_date=start_date,
+            end_date=end_date,
+            active_employees=await _active_employees(db),
+            days=[AttendanceDayCounts.model_validate(day) for day in days]
+        )
+
+
+@router.get("/admin/attendance/monthly", response_model=OrgMonthlyAnalytics)
+async def get_org_monthly_attendance(
+    month: Optional[str] = None,
+    authorization: str = Header(None)
+):
+    """
+    Per employee status counts for one month (YYYY-MM, default this month) plus
+    organisation totals (Admin only). Reads the attendance_user_month rollup.
+    """
+    await _require_admin(authorization)
+    
+    try:
+        month_start = datetime.strptime(month, "%Y-%m").date() if month else date.today().replace(day=1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="month must be formatted as YYYY-MM")
+    
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(AttendanceUserMonth, User.employee_id, User.full_name)
+            .join(User, User.id == AttendanceUserMonth.user_id)
+            .where(AttendanceUserMonth.month == month_start)
+            .order_by(User.employee_id)
+        )
+        employees = [
+            EmployeeMonthCounts(
+                user_id=counts.user_id,
+                employee_id=employee_id,
+                full_name=full_name,
+                present=counts.present,
+                absent=counts.absent,
+                half_day=counts.half_day,
+                leave=counts.leave,
+                total=counts.total,
+                attendance_percentage=round(counts.present / counts.total * 100, 2) if counts.total else 0.0
+            )
+            for counts, employee_id, full_name in result.all()
+        ]
+        
+        return OrgMonthlyAnalytics(
+            month=month_start,
+            active_employees=await _active_employees(db),
+            present=sum(employee.present for employee in employees),
+            total=sum(employee.total for employee in employees),
+            employees=employees
+        )
         
         
         
-from fastapi.responses import FileResponse
-from fastapi import BackgroundTasks
-from openpyxl import Workbook
+from fastapi.responses import StreamingResponse
+from app.utils.report_export import stream_csv, build_xlsx, iter_file, XLSX_MEDIA_TYPE
 from datetime import datetime
 import os
 
@@ -800,8 +1031,14 @@ import os
 async def export_attendance(
     start_date:str=None,
     end_date:str=None,
+    format:str="xlsx",
     authorization:str=Header(None)
 ):
+    """
+    Export attendance as XLSX (default) or CSV (format=csv), admin only.
+    Rows are read from a server-side cursor in chunks, so memory stays flat
+    however many years the report covers. CSV is streamed as it is read.
+    """
     
     #verifuing admin
     current_user=await get_current_user_from_token(authorization)
@@ -812,98 +1049,71 @@ async def export_attendance(
             detail="only administrators can export attendance reports"
         )
     
-    async with AsyncSessionLocal() as db:
-        try:
-            query=select(Attendance,User).join(
-                User,Attendance.user_id==User.id
-            ).order_by(Attendance.date.desc())
-            
-            if start_date:
-                query=query.filter(Attendance.date>=start_date)
-            if end_date:
-                query=query.filter(Attendance.date<=end_date)
-                
-            #execuring query
-            result=await db.execute(query)
-            records=result.all()
-            
-            #Creating Excel workbook
-            
-            wb=Workbook()
-            ws=wb.active
-            ws.title="Attendance Report"
-            
-            headers= [
-                "Date",
-                "employee_id",
-                "Employee Name",
-                "Time in",
-                "Time out",
-                "Status",
-                "Day of Week"
-            ]
-            ws.append(headers)
-            
-            #making headers bold
-            for cell in ws[1]:
-                cell.font=Font(bold=True)
-                
-            #addng data
-            for attendance,user in records:
-                ws.append([
-                    attendance.date.strftime("%Y-%m-%d"),
-                    user.employee_id,
-                    user.full_name,
-                    attendance.time_in.strftime("%I:%M %p") if attendance.time_in else "",
-                    attendance.time_out.strftime("%I:%M %p") if attendance.time_out else "",
-                    attendance.status.value if hasattr(attendance.status, 'value') else str(attendance.status),
-                    attendance.date.strftime("%A")
-                ])
-                
-            for column in ws.columns:
-                max_length=0
-                column=[cell for cell in column]
-                for cell in column:
-                    try:
-                        if len(str(cell.value))> max_length:
-                            max_length=len(cell.value)
-                        
-                    except:
-                        pass
-                    
-                    adjusted_width = (max_length + 2)
-                    ws.column_dimensions[column[0].column_letter].width = adjusted_width
-                    
-            #Saving the file
-            temp_dir="./data/temp"
-            os.makedirs(temp_dir,exist_ok=True)
-            
-            filename=f"attendance_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-            filepath=os.path.join(temp_dir,filename)
-            
-            wb.save(filepath)
-            
-            logger.info(f"Created Attendance report: {filepath}")
-            
-            def cleanup():
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-            
-            #returning the file
-            from starlette.background import BackgroundTask
-            return FileResponse(
-                path=filepath,
-                filename=filename,
-                media_type="application/vnd.openxmlformats-officedocument.spreadsheet.sheet",
-                background=BackgroundTask(cleanup)  #cleanup
-            )
-        
-        except Exception as e:
-            logger.error(f"Export failed:{str(e)}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to export : {str(e)}"
-            )
+    if format not in ("xlsx","csv"):
+        raise HTTPException(status_code=400,detail="format must be xlsx or csv")
+    try:
+        start=date.fromisoformat(start_date) if start_date else None
+        end=date.fromisoformat(end_date) if end_date else None
+    except ValueError:
+        raise HTTPException(status_code=400,detail="Dates must be formatted as YYYY-MM-DD")
+    
+    filename=f"attendance_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    headers={"Content-Disposition":f'attachment; filename="{filename}"'}
+    
+    if format=="csv":
+        #errors after the first byte can only abort the download, the status is already sent
+        logger.info(f"Streaming attendance report: {filename}")
+        return StreamingResponse(stream_csv(start,end),media_type="text/csv",headers=headers)
+    
+    try:
+        #the zip index comes last, so the workbook is finished before sending
+        output=await build_xlsx(start,end)
+    except Exception as e:
+        logger.error(f"Export failed:{str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to export : {str(e)}"
+        )
+    
+    logger.info(f"Created Attendance report: {filename}")
+    return StreamingResponse(iter_file(output),media_type=XLSX_MEDIA_TYPE,headers=headers)
+
+@router.get("/admin/detector-stats")
+async def get_detector_stats(authorization: str = Header(None)):
+    """Per-backend latency/success/confidence statistics of the detector cascade (Admin only)"""
+    
+    # Verify admin
+    current_user = await get_current_user_from_token(authorization)
+    
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=403,
+            detail="Only administrators can view detector statistics"
+        )
+    
+    return face_detector.cascade.stats()
+
+
+@router.get("/admin/inference-stats")
+async def get_inference_stats(authorization: str = Header(None)):
+    """Worker pool and embedding batcher metrics (Admin only)"""
+    
+    # Verify admin
+    current_user = await get_current_user_from_token(authorization)
+    
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=403,
+            detail="Only administrators can view inference statistics"
+        )
+    
+    return {
+        "executor": inference_executor.stats(),
+        "batcher": inference_executor.batcher.stats(),
+        "models": model_registry.stats(),
+        "cache": inference_cache.stats()
+    }
+
 
 @router.get("/employees")
 async def get_employees(authorization: str = Header(None)):
@@ -988,6 +1198,7 @@ async def delete_employee(employee_id: str, authorization: str = Header(None)):
                 select(Face).where(Face.user_id == user.id)
             )
             faces = faces_result.scalars().all()
+            face_ids = [face.id for face in faces]
             
             # Delete face image files
             for face in faces:
@@ -996,9 +1207,16 @@ async def delete_employee(employee_id: str, authorization: str = Header(None)):
                 if face.processed_image_path and os.path.exists(face.processed_image_path):
                     os.remove(face.processed_image_path)
             
+            # Take their attendance out of the org-day rollup first
+            await forget_user(db, user.id)
+            
             # Delete user (cascade will delete faces, encodings, attendance)
             await db.delete(user)
             await db.commit()
+            await principal_cache.invalidate(user.email)
+            face_gallery.remove_user(user.id)
+            await async_redis_cache.remove_gallery_faces(face_ids)
+            await gallery_sync.publish(removed=face_ids)
             
             logger.info(f"Deleted employee {employee_id} and all associated data")
             
@@ -19,6 +19,13 @@ class Settings(BaseSettings):
     SECRET_KEY: str = Field(default_factory=lambda: secrets.token_urlsafe(32))
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    BCRYPT_ROUNDS: int = 12  # bcrypt cost factor, existing hashes are upgraded on login when it changes
+    PASSWORD_HASH_WORKERS: int = 2  # Threads hashing/verifying passwords off the event loop
+    PASSWORD_HASH_QUEUE_SIZE: int = 64  # Hash requests allowed to wait before returning 503
+    PRINCIPAL_CACHE_ENABLED: bool = True  # Cache the authenticated user instead of querying it per request
+    PRINCIPAL_CACHE_TTL: int = 60  # Seconds a cached user is trusted, bounds staleness across workers
+    PRINCIPAL_CACHE_SIZE: int = 10000  # Users kept in the in-process cache
+    PRINCIPAL_CACHE_REDIS: bool = False  # Also share cached users between workers through Redis
     
     #CORS- resource sharing
     BACKEND_CORS_ORIGINS: List[str] = ["http://localhost:5173", "http://localhost:3000"]
@@ -46,7 +53,12 @@ class Settings(BaseSettings):
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", 6379))
     REDIS_DB: int = int(os.getenv("REDIS_DB", 0))
     REDIS_PASSWORD: Optional[str] = os.getenv("REDIS_PASSWORD", None)
-    
+    REDIS_MAX_CONNECTIONS: int = 50  # shared pool size per worker
+    REDIS_SOCKET_TIMEOUT: float = 0.5  # seconds, per command
+    REDIS_CONNECT_TIMEOUT: float = 1.0  # seconds
+    REDIS_BREAKER_THRESHOLD: int = 5  # consecutive failures before the cache is skipped
+    REDIS_BREAKER_COOLDOWN: float = 30.0  # seconds before trying Redis again
+
     @property
     def REDIS_URL(self) -> str:
         """Construct Redis connection string"""
@@ -56,18 +68,31 @@ class Settings(BaseSettings):
     
     # ==================== ML Model Configuration ====================
     
+    ENABLE_ML: bool = True  # False for admin-only replicas: TensorFlow is never imported, face endpoints return 503
+    
     # Face Detection
     DETECTION_BACKEND: str = "retinaface"  # retinaface, mtcnn
     DETECTION_CONFIDENCE_THRESHOLD: float = 0.9
+    DETECTION_TIME_BUDGET_MS: int = 3000  # Total detector cascade time per request, 0 = unlimited
+    DETECTION_FALLBACK_CONFIDENCE: float = 0.3  # Accept best low-confidence face when the cascade runs out
     
     # Face Recognition
     RECOGNITION_MODEL: str = "arcface"  # arcface, facenet
     EMBEDDING_SIZE: int = 512
+    ALLOW_PICKLE_EMBEDDINGS: bool = True  # Read legacy pickled rows, disable once migrate_embeddings.py has run
     
     # Face Matching
     MATCHING_THRESHOLD: float = 0.6  # Cosine similarity threshold
+    FAISS_ENABLED: bool = True  # Use FAISS for 1:N search when installed
     FAISS_INDEX_TYPE: str = "Flat"  # Flat, IVF
     FAISS_NPROBE: int = 10
+    FAISS_NLIST: int = 0  # IVF cells, 0 = auto (4 * sqrt(N))
+    GALLERY_LOAD_CHUNK_SIZE: int = 2000  # Rows per server-side cursor fetch when loading the gallery
+    GALLERY_SYNC_ENABLED: bool = True  # Broadcast gallery changes to other workers over Redis pub/sub
+    GALLERY_TEMPLATE_MODE: bool = False  # Search per-user centroids first, then rescore only the best users' faces
+    GALLERY_TEMPLATE_TOP_USERS: int = 10  # Users whose faces are rescored in template mode
+    GALLERY_QUANTIZED: bool = False  # Keep int8 codes in RAM and rerank the best candidates with float32
+    GALLERY_RERANK_CANDIDATES: int = 50  # Candidates rescored exactly in quantized mode
     
     
     # Face Quality Checks
@@ -85,11 +110,29 @@ class Settings(BaseSettings):
     FACES_DIR: str = "./data/faces"
     EMBEDDINGS_DIR: str = "./data/embeddings"
     FAISS_INDEX_PATH: str = "./data/faiss_index.bin"
+    ARCFACE_ONNX_PATH: str = "./data/models/arcface.onnx"  # written by export_onnx_models.py
+    YUNET_ONNX_PATH: str = "./data/models/face_detection_yunet_2023mar.onnx"
     
     # ==================== Performance ====================
-    MAX_WORKERS: int = 4
-    BATCH_SIZE: int = 32
-    USE_ONNX: bool = True  # Use ONNX runtime for faster inference
+    MAX_WORKERS: int = 4  # Inference worker pool size
+    INFERENCE_EXECUTOR: str = "process"  # process, thread
+    INFERENCE_QUEUE_SIZE: int = 16  # Requests allowed to wait for a worker before returning 503
+    BATCH_SIZE: int = 32  # Max faces per batched ArcFace forward pass
+    BATCHING_ENABLED: bool = True
+    BATCH_MAX_WAIT_MS: float = 10.0  # How long the batcher waits to fill a batch
+    USE_ONNX: bool = True  # Use ONNX runtime for faster inference (when the exported models exist)
+    ONNX_THREADS: int = 1  # Intra-op threads per ONNX session, each inference worker has its own
+    INFERENCE_CACHE_ENABLED: bool = True  # Reuse detection/embedding results for byte-identical uploads
+    INFERENCE_CACHE_SIZE: int = 1024  # Entries kept in the in-memory LRU (~3 KB each)
+    INFERENCE_CACHE_REDIS: bool = False  # Also share cached results between workers through Redis
+    INFERENCE_CACHE_TTL: int = 600  # Seconds a result lives in Redis
+    WARMUP_ON_STARTUP: bool = True  # Build models and run a dummy inference before /ready reports ready
+    STREAM_FRAME_SKIP: int = 2  # Frames dropped between processed frames on the recognition WebSocket
+    STREAM_TRACK_IOU: float = 0.3  # Min box overlap to continue a track
+    STREAM_TRACK_MAX_MISSED: int = 5  # Processed frames a track may go unseen before it ends
+    STREAM_REEMBED_QUALITY_GAIN: float = 0.1  # Quality improvement that triggers a re-embed of a known track
+    REPORT_EXPORT_CHUNK_SIZE: int = 5000  # Attendance rows per server-side cursor fetch when exporting
+    REPORT_EXPORT_SPOOL_BYTES: int = 8 * 1024 * 1024  # XLSX exports larger than this are spooled to a temp file
     
     # ==================== Rate Limiting ====================
     RATE_LIMIT_ENABLED: bool = True
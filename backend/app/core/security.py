@@ -8,7 +8,15 @@ from app.core.logger import logger
 
 #password hashing (one way)
 
-pwd_context=CryptContext(schemes=["bcrypt"],deprecated="auto")
+#hashes whose cost differs from BCRYPT_ROUNDS in either direction are reported by
+#needs_update/verify_and_update, so they get rehashed on the next login
+pwd_context=CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS
+)
 
 def hash_password(password):
     
@@ -21,6 +29,15 @@ def verify_password(plain_password,hashed_password):
     except Exception as e:
         logger.error(f"Password verification failed:{e}")
         return False
+
+
+def verify_and_update_password(plain_password,hashed_password):
+    """Returns (valid, new_hash), new_hash is set when the stored hash uses an outdated cost"""
+    try:
+        return pwd_context.verify_and_update(plain_password,hashed_password)
+    except Exception as e:
+        logger.error(f"Password verification failed:{e}")
+        return False,None
     
 def create_access_token(data,expires_delta=None):
     to_encode=data.copy()
@@ -1,13 +1,20 @@
 #Main dast api applciaton
 
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
+import asyncio
 
 from app.core.config import settings
 from app.core.logger import logger
 from app.api.v1 import auth,faces
+from app.utils.face_gallery import face_gallery
+from app.utils.inference_executor import inference_executor
+from app.utils.async_redis_cache import async_redis_cache
+from app.utils.gallery_sync import gallery_sync
+from app.utils.password_service import password_service
 
 app=FastAPI(
     title="FaceMatch++ API",
@@ -33,6 +40,35 @@ app.add_middleware(
 app.include_router(auth.router,prefix="/api/v1")
 app.include_router(faces.router,prefix="/api/v1")
 
+#set once the inference workers are warm, /ready returns 503 until then
+app.state.models_warm=False
+app.state.startup_tasks=[]
+
+#backoff between retries of a failed startup step, doubled up to the max
+STARTUP_RETRY_DELAY=1.0
+STARTUP_RETRY_MAX_DELAY=60.0
+
+
+async def retry_startup_step(name,step):
+    #keeps trying, /ready only sends traffic here once every step succeeded
+    delay=STARTUP_RETRY_DELAY
+    while True:
+        try:
+            return await step()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"{name} failed, retrying in {delay:.0f}s: {e}")
+            await asyncio.sleep(delay)
+            delay=min(delay*2,STARTUP_RETRY_MAX_DELAY)
+
+
+async def warm_up_models():
+    #runs in the background so /health answers while the models load
+    await retry_startup_step("Model warm-up",inference_executor.warm_up)
+    app.state.models_warm=True
+
+
 @app.on_event("startup")
 async def startup_event():
     
@@ -43,8 +79,44 @@ async def startup_event():
     logger.info(f"Log Level: {settings.LOG_LEVEL}")
     logger.info("="*60)
     
+    #open the shared Redis pool, the API keeps serving if Redis is down
+    await async_redis_cache.connect()
+    
+    if not settings.ENABLE_ML:
+        #admin-only replica: no models, no gallery, face endpoints answer 503
+        logger.info("ML features disabled (ENABLE_ML=false), skipping model and gallery loading")
+        app.state.models_warm=True
+        return
+    
+    #start the inference workers and warm the models before the first request
+    inference_executor.start()
+    if settings.WARMUP_ON_STARTUP:
+        app.state.startup_tasks.append(asyncio.create_task(warm_up_models()))
+    else:
+        app.state.models_warm=True
+    
+    #listen for gallery changes made by other workers
+    await gallery_sync.start()
+    
+    #load the face gallery (from the persisted index when available)
+    try:
+        await face_gallery.ensure_loaded()
+    except Exception as e:
+        #no match request reaches a worker that is not ready, so don't wait for one to load it lazily
+        logger.error(f"Failed to load face gallery at startup, retrying in the background: {e}")
+        app.state.startup_tasks.append(asyncio.create_task(
+            retry_startup_step("Gallery load",face_gallery.ensure_loaded)
+        ))
+    
 @app.on_event("shutdown")
 async def shutdown_event():
+    for task in app.state.startup_tasks:
+        task.cancel()
+    await gallery_sync.stop()
+    await face_gallery.close()
+    await async_redis_cache.close()
+    inference_executor.shutdown()
+    password_service.shutdown()
     logger.info("="*60)
     logger.info("Shutting down FaceMatch++ API ...")
     logger.info("="*60)
@@ -65,4 +137,17 @@ async def health_check():
         "status": "ok",
         "message": "FaceMatch++ API is healthy",
         "version": "1.0.0"
-    }
\ No newline at end of file
+    }
+    
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe, 503 until the models are warm and the gallery is loaded"""
+    checks={
+        "models":app.state.models_warm,
+        "gallery":face_gallery.is_loaded or not settings.ENABLE_ML
+    }
+    ready=all(checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status":"ready" if ready else "warming_up","checks":checks}
+    )
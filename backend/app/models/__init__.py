@@ -5,8 +5,9 @@ from app.models.face import Face
 from app.models.encoding import Encoding
 from app.models.audit_log import AuditLog
 from app.models.attendance import Attendance, AttendanceStatus
+from app.models.attendance_rollup import AttendanceUserMonth, AttendanceOrgDay
 
 ## Export all models
 
-__all__=["User","UserRole","Face","Encoding","AuditLog","Attendance","AttendanceStatus"]
+__all__=["User","UserRole","Face","Encoding","AuditLog","Attendance","AttendanceStatus","AttendanceUserMonth","AttendanceOrgDay"]
 
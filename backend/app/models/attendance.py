@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Date, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, Date, ForeignKey, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -16,6 +16,10 @@ class AttendanceStatus(enum.Enum):
 class Attendance(Base):
     """Attendance model for tracking employee attendance"""
     __tablename__ = "attendances"
+    __table_args__ = (
+        # Per-employee date range scans (analytics, my-records, reports)
+        Index("ix_attendances_user_id_date", "user_id", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, Date, DateTime, ForeignKey
+from datetime import datetime
+from app.db.base import Base
+
+
+class AttendanceUserMonth(Base):
+    """Per employee per month status counts, maintained by app.utils.attendance_rollups"""
+    __tablename__ = "attendance_user_month"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    month = Column(Date, primary_key=True, index=True)  # first day of the month
+    present = Column(Integer, default=0, nullable=False)
+    absent = Column(Integer, default=0, nullable=False)
+    half_day = Column(Integer, default=0, nullable=False)
+    leave = Column(Integer, default=0, nullable=False)
+    total = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<AttendanceUserMonth(user_id={self.user_id}, month={self.month}, present={self.present}, total={self.total})>"
+
+
+class AttendanceOrgDay(Base):
+    """Organisation wide status counts per day, maintained by app.utils.attendance_rollups"""
+    __tablename__ = "attendance_org_day"
+
+    date = Column(Date, primary_key=True)
+    present = Column(Integer, default=0, nullable=False)
+    absent = Column(Integer, default=0, nullable=False)
+    half_day = Column(Integer, default=0, nullable=False)
+    leave = Column(Integer, default=0, nullable=False)
+    total = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<AttendanceOrgDay(date={self.date}, present={self.present}, total={self.total})>"
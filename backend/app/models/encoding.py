@@ -14,6 +14,8 @@ class Encoding(Base,TimestampMixin):
     
     #Store embedding as binary data(more efficient than json)
     embedding=Column(LargeBinary,nullable=False)  ##Numpy array serialised
+    #int8 code of the normalized embedding (float32 scale + dim bytes), filled by migrate_embeddings.py
+    embedding_int8=Column(LargeBinary,nullable=True)
     
     #model metadata
     model_name=Column(String(50),default="arcface")
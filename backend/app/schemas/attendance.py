@@ -1,6 +1,6 @@
 from pydantic import BaseModel, ConfigDict
 from datetime import datetime, date
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 
 
@@ -48,3 +48,45 @@ class AttendanceAnalytics(BaseModel):
     attendance_percentage: float
     current_month_present: int
     current_month_total: int
+
+
+class AttendanceDayCounts(BaseModel):
+    """Organisation wide status counts for one day"""
+    model_config = ConfigDict(from_attributes=True)
+    
+    date: date
+    present: int
+    absent: int
+    half_day: int
+    leave: int
+    total: int
+
+
+class OrgDailyAnalytics(BaseModel):
+    """Per day attendance for the whole organisation"""
+    start_date: date
+    end_date: date
+    active_employees: int
+    days: List[AttendanceDayCounts]
+
+
+class EmployeeMonthCounts(BaseModel):
+    """Status counts of one employee for one month"""
+    user_id: int
+    employee_id: str
+    full_name: str
+    present: int
+    absent: int
+    half_day: int
+    leave: int
+    total: int
+    attendance_percentage: float
+
+
+class OrgMonthlyAnalytics(BaseModel):
+    """Per employee attendance for one month plus organisation totals"""
+    month: date
+    active_employees: int
+    present: int
+    total: int
+    employees: List[EmployeeMonthCounts]
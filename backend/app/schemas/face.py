@@ -60,4 +60,30 @@ class FaceRegisterResponse(BaseModel):
     image_url: str
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True        
+        
+class MultiFaceCandidate(BaseModel):
+    """One gallery candidate for a detected face"""
+    employee_id: str
+    full_name: Optional[str]=None
+    confidence: float
+    
+    
+class DetectedFaceMatch(BaseModel):
+    """A face found in a multi-face image and its best matches"""
+    box: List[int]
+    detection_confidence: float
+    quality_score: float
+    match_found: bool
+    employee_id: Optional[str]=None
+    full_name: Optional[str]=None
+    confidence: Optional[float]=None
+    candidates: List[MultiFaceCandidate]=[]
+    
+    
+class MultiFaceMatchResponse(BaseModel):
+    """Response for matching every face in one image"""
+    faces_detected: int
+    matches_found: int
+    faces: List[DetectedFaceMatch]
+    message: str
@@ -0,0 +1,226 @@
+#asyncio Redis cache with a shared connection pool and a circuit breaker
+
+import time
+import json
+import numpy as np
+from typing import Any,Awaitable,Callable,Dict,Iterable,List,Optional,Tuple
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.utils.redis_cache import (
+    EMBEDDING_KEY_PREFIX,
+    GALLERY_EMBEDDINGS_KEY,
+    GALLERY_META_KEY,
+    encode_embedding,
+    decode_embedding,
+)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and skips Redis for
+    `cooldown` seconds. Then it is half-open: exactly one trial call goes
+    through while the others keep failing fast, and that call either closes
+    the circuit or reopens it. A trial that never reports back (cancelled)
+    is replaced by a new one after another cooldown.
+    """
+
+    def __init__(self,threshold:int,cooldown:float):
+        self.threshold=max(1,threshold)
+        self.cooldown=cooldown
+        self.failures=0
+        self.opened_at:Optional[float]=None
+        self.probe_started:Optional[float]=None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic()-self.opened_at>=self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go to Redis now, claims the trial call when half-open"""
+        state=self.state
+        if state!="half_open":
+            return state=="closed"
+        now=time.monotonic()
+        if self.probe_started is not None and now-self.probe_started<self.cooldown:
+            return False
+        self.probe_started=now
+        return True
+
+    def record_success(self):
+        self.failures=0
+        self.opened_at=None
+        self.probe_started=None
+
+    def record_failure(self):
+        self.failures+=1
+        state=self.state
+        if state=="half_open" or (state=="closed" and self.failures>=self.threshold):
+            logger.warning(f"Redis circuit opened after {self.failures} failures")
+            self.opened_at=time.monotonic()
+            self.probe_started=None
+
+
+class AsyncRedisCacheService:
+    #commands per pipelined round trip / keys per SCAN step
+    BATCH_SIZE=1000
+
+    def __init__(self):
+        self.pool:Optional[aioredis.ConnectionPool]=None
+        self.client:Optional[aioredis.Redis]=None
+        self.breaker=CircuitBreaker(settings.REDIS_BREAKER_THRESHOLD,settings.REDIS_BREAKER_COOLDOWN)
+
+    async def connect(self) -> bool:
+        """Create the shared pool and check the server, called once at startup"""
+        if self.client is None:
+            self.pool=aioredis.ConnectionPool(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                db=settings.REDIS_DB,
+                password=settings.REDIS_PASSWORD,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+                health_check_interval=30
+            )
+            self.client=aioredis.Redis(connection_pool=self.pool)
+
+        ok=await self.call(lambda r:r.ping(),False)
+        if ok:
+            logger.info("Connected to Redis (async pool)")
+        else:
+            logger.warning("Redis unavailable at startup, cache calls will fall through")
+        return bool(ok)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            await self.pool.disconnect()
+            self.client=None
+            self.pool=None
+
+    def is_available(self) -> bool:
+        #informational, does not claim the half-open trial call
+        return self.client is not None and self.breaker.state!="open"
+
+    async def call(self,command:Callable[[aioredis.Redis],Awaitable[Any]],default:Any=None) -> Any:
+        """Run one command through the breaker, returning `default` when Redis is down"""
+        if self.client is None or not self.breaker.allow():
+            return default
+        try:
+            result=await command(self.client)
+        except Exception as e:
+            self.breaker.record_failure()
+            logger.error(f"Redis command failed: {e}")
+            return default
+        self.breaker.record_success()
+        return result
+
+    # ==================== Per-employee embeddings ====================
+
+    async def set_embedding(self,employee_id:str,embedding:np.ndarray,expire_seconds:int=3600) -> bool:
+        value=encode_embedding(embedding)
+        result=await self.call(
+            lambda r:r.setex(f"{EMBEDDING_KEY_PREFIX}{employee_id}",expire_seconds,value),
+            False
+        )
+        return bool(result)
+
+    async def get_embedding(self,employee_id:str) -> Optional[np.ndarray]:
+        value=await self.call(lambda r:r.get(f"{EMBEDDING_KEY_PREFIX}{employee_id}"))
+        return decode_embedding(value) if value else None
+
+    async def set_all_embeddings(self,embeddings:Dict[str,np.ndarray],expire_seconds:int=3600) -> bool:
+        items=list(embeddings.items())
+
+        async def write(r):
+            for start in range(0,len(items),self.BATCH_SIZE):
+                pipe=r.pipeline(transaction=False)
+                for employee_id,embedding in items[start:start+self.BATCH_SIZE]:
+                    pipe.setex(f"{EMBEDDING_KEY_PREFIX}{employee_id}",expire_seconds,encode_embedding(embedding))
+                await pipe.execute()
+            return True
+
+        return await self.call(write,False)
+
+    async def get_all_embeddings(self) -> Dict[str,np.ndarray]:
+        async def read(r):
+            keys=[key async for key in r.scan_iter(match=f"{EMBEDDING_KEY_PREFIX}*",count=self.BATCH_SIZE)]
+            embeddings={}
+            for start in range(0,len(keys),self.BATCH_SIZE):
+                batch=keys[start:start+self.BATCH_SIZE]
+                for key,value in zip(batch,await r.mget(batch)):
+                    if value:
+                        embeddings[key.decode()[len(EMBEDDING_KEY_PREFIX):]]=decode_embedding(value)
+            return embeddings
+
+        return await self.call(read,{})
+
+    async def delete_embedding(self,employee_id:str) -> bool:
+        result=await self.call(lambda r:r.delete(f"{EMBEDDING_KEY_PREFIX}{employee_id}"),0)
+        return bool(result)
+
+    # ==================== Shared gallery ====================
+
+    async def set_gallery_faces(self,faces:Iterable[Tuple[int,int,str,str,np.ndarray]]) -> bool:
+        faces=list(faces)
+
+        async def write(r):
+            for start in range(0,len(faces),self.BATCH_SIZE):
+                embeddings={}
+                meta={}
+                for face_id,user_id,employee_id,full_name,embedding in faces[start:start+self.BATCH_SIZE]:
+                    embeddings[face_id]=encode_embedding(embedding)
+                    meta[face_id]=json.dumps({
+                        "user_id":int(user_id),
+                        "employee_id":employee_id,
+                        "full_name":full_name
+                    })
+                pipe=r.pipeline(transaction=False)
+                pipe.hset(GALLERY_EMBEDDINGS_KEY,mapping=embeddings)
+                pipe.hset(GALLERY_META_KEY,mapping=meta)
+                await pipe.execute()
+            return True
+
+        if not faces:
+            return True
+        return await self.call(write,False)
+
+    async def remove_gallery_faces(self,face_ids:List[int]) -> bool:
+        if not face_ids:
+            return False
+
+        async def remove(r):
+            pipe=r.pipeline(transaction=False)
+            pipe.hdel(GALLERY_EMBEDDINGS_KEY,*face_ids)
+            pipe.hdel(GALLERY_META_KEY,*face_ids)
+            await pipe.execute()
+            return True
+
+        return await self.call(remove,False)
+
+    async def get_gallery_embeddings(self,face_ids:List[int]) -> Dict[int,np.ndarray]:
+        if not face_ids:
+            return {}
+        values=await self.call(lambda r:r.hmget(GALLERY_EMBEDDINGS_KEY,face_ids),[])
+        return {
+            int(face_id):decode_embedding(value)
+            for face_id,value in zip(face_ids,values) if value
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "pool_open":self.client is not None,
+            "circuit":self.breaker.state,
+            "consecutive_failures":self.breaker.failures,
+            "max_connections":settings.REDIS_MAX_CONNECTIONS
+        }
+
+
+#creating singleton instance, connected from the startup hook
+async_redis_cache=AsyncRedisCacheService()
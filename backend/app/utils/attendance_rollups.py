@@ -0,0 +1,115 @@
+#Incremental maintenance of the attendance rollup tables
+
+from datetime import date,datetime
+from typing import List,Optional
+from sqlalchemy import select,func,update,delete,cast,Date
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.attendance import Attendance,AttendanceStatus
+from app.models.attendance_rollup import AttendanceUserMonth,AttendanceOrgDay
+
+
+#rollup column counting each status
+STATUS_COLUMNS={
+    AttendanceStatus.PRESENT:"present",
+    AttendanceStatus.ABSENT:"absent",
+    AttendanceStatus.HALF_DAY:"half_day",
+    AttendanceStatus.LEAVE:"leave"
+}
+
+
+def month_start(day:date) -> date:
+    return day.replace(day=1)
+
+
+def _status_counts() -> list:
+    #one COUNT(*) FILTER per status plus the total, labelled like the rollup columns
+    return [
+        func.count().filter(Attendance.status==attendance_status).label(column)
+        for attendance_status,column in STATUS_COLUMNS.items()
+    ]+[func.count().label("total")]
+
+
+def _upsert(model,keys:dict,column:str,delta:int):
+    table=model.__table__
+    now=datetime.utcnow()
+    statement=pg_insert(table).values(**keys,**{column:delta,"total":delta},updated_at=now)
+    return statement.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={
+            column:table.c[column]+delta,
+            "total":table.c.total+delta,
+            "updated_at":now
+        }
+    )
+
+
+async def record_attendance(db:AsyncSession,user_id:int,day:date,attendance_status:AttendanceStatus,delta:int=1):
+    """
+    Count one attendance row in both rollups. Call it in the same transaction
+    that inserts (delta=1) or deletes (delta=-1) the row, so the rollups
+    commit or roll back together with it.
+    """
+    column=STATUS_COLUMNS[attendance_status]
+    await db.execute(_upsert(AttendanceUserMonth,{"user_id":user_id,"month":month_start(day)},column,delta))
+    await db.execute(_upsert(AttendanceOrgDay,{"date":day},column,delta))
+
+
+async def forget_user(db:AsyncSession,user_id:int):
+    """
+    Subtract a user's attendance from the org-day rollup before the user is
+    deleted. Their user-month rows go away with the user (ON DELETE CASCADE).
+    """
+    counts=(
+        select(Attendance.date.label("date"),*_status_counts())
+        .where(Attendance.user_id==user_id)
+        .group_by(Attendance.date)
+        .subquery()
+    )
+    await db.execute(
+        update(AttendanceOrgDay)
+        .where(AttendanceOrgDay.date==counts.c.date)
+        .values(
+            **{
+                column:getattr(AttendanceOrgDay,column)-counts.c[column]
+                for column in list(STATUS_COLUMNS.values())+["total"]
+            },
+            updated_at=datetime.utcnow()
+        )
+    )
+
+
+def rebuild_statements(since:Optional[date]=None) -> List:
+    """
+    Statements that recompute both rollups from attendances, for every month
+    from `since` (a month start) on, or for all history. Run them in one
+    transaction, see rebuild_attendance_rollups.py.
+    """
+    columns=list(STATUS_COLUMNS.values())+["total"]
+    month=cast(func.date_trunc("month",Attendance.date),Date)
+    #updated_at is naive UTC, like datetime.utcnow() in the models
+    now=func.timezone("utc",func.now())
+
+    user_month=(
+        select(Attendance.user_id,month.label("month"),*_status_counts(),now)
+        .group_by(Attendance.user_id,month)
+    )
+    org_day=(
+        select(Attendance.date,*_status_counts(),now)
+        .group_by(Attendance.date)
+    )
+    clear_user_month=delete(AttendanceUserMonth)
+    clear_org_day=delete(AttendanceOrgDay)
+    if since is not None:
+        user_month=user_month.where(Attendance.date>=since)
+        org_day=org_day.where(Attendance.date>=since)
+        clear_user_month=clear_user_month.where(AttendanceUserMonth.month>=since)
+        clear_org_day=clear_org_day.where(AttendanceOrgDay.date>=since)
+
+    return [
+        clear_user_month,
+        clear_org_day,
+        pg_insert(AttendanceUserMonth.__table__).from_select(["user_id","month"]+columns+["updated_at"],user_month),
+        pg_insert(AttendanceOrgDay.__table__).from_select(["date"]+columns+["updated_at"],org_day)
+    ]
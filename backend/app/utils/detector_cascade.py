@@ -0,0 +1,199 @@
+#Adaptive scheduling of the face detector backends
+
+import threading
+import time
+from typing import Dict,List
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.utils.onnx_backend import yunet_detector
+
+
+class BackendStats:
+    """Running latency / success / confidence statistics for one detector backend"""
+
+    def __init__(self,name:str,priority:int):
+        self.name=name
+        self.priority=priority  # position in the configured order, used as tie breaker
+        self.attempts=0
+        self.successes=0
+        self.errors=0
+        self.latency_ms=0.0  # exponentially weighted moving average
+        self.confidence=0.0  # EWMA over successful detections
+
+    @property
+    def success_rate(self) -> float:
+        return self.successes/self.attempts if self.attempts else 1.0
+
+    def record(self,latency_ms:float,success:bool,confidence:float,alpha:float,error:bool=False):
+        if self.attempts==0:
+            self.latency_ms=latency_ms
+        else:
+            self.latency_ms+=alpha*(latency_ms-self.latency_ms)
+        self.attempts+=1
+        if error:
+            self.errors+=1
+        if success:
+            if self.successes==0:
+                self.confidence=confidence
+            else:
+                self.confidence+=alpha*(confidence-self.confidence)
+            self.successes+=1
+
+    def to_dict(self) -> Dict:
+        return {
+            "backend":self.name,
+            "attempts":self.attempts,
+            "successes":self.successes,
+            "errors":self.errors,
+            "success_rate":round(self.success_rate,4),
+            "avg_latency_ms":round(self.latency_ms,2),
+            "avg_confidence":round(self.confidence,4)
+        }
+
+
+class DetectorCascade:
+    """
+    Decides which detector backends to try, in which order, for each request.
+
+    Backends are ranked by expected cost of getting a good detection:
+    latency / (success_rate * confidence). Until a backend has min_samples
+    attempts it keeps its configured position. Backends that almost never
+    succeed are skipped, except for one exploratory attempt every
+    explore_every requests so they can recover. A per-request time budget
+    stops the cascade early.
+    """
+
+    def __init__(
+        self,
+        backends:List[str],
+        time_budget_ms:float=settings.DETECTION_TIME_BUDGET_MS,
+        min_samples:int=20,
+        skip_below_success_rate:float=0.05,
+        explore_every:int=50,
+        alpha:float=0.2
+    ):
+        self.backends=list(backends)
+        self.time_budget_ms=time_budget_ms
+        self.min_samples=min_samples
+        self.skip_below_success_rate=skip_below_success_rate
+        self.explore_every=explore_every
+        self.alpha=alpha
+        self._lock=threading.Lock()
+        #worker processes keep a log of plans, attempts and budget stops so the parent can replay them
+        self.keep_log=False
+        self._log:List[tuple]=[]
+        self._requests=0
+        self._budget_exhausted=0
+        self._stats={name:BackendStats(name,i) for i,name in enumerate(self.backends)}
+
+    def _expected_cost(self,stats:BackendStats) -> float:
+        if stats.attempts<self.min_samples:
+            return -1.0  # not enough data yet, keep configured order at the front
+        quality=stats.success_rate*max(stats.confidence,0.01)
+        return stats.latency_ms/max(quality,1e-6)
+
+    def plan(self) -> List[str]:
+        """Backends to try for the next request, best first"""
+        with self._lock:
+            self._requests+=1
+            explore=self.explore_every>0 and self._requests%self.explore_every==0
+            ranked=sorted(self._stats.values(),key=lambda s:(self._expected_cost(s),s.priority))
+            order=[]
+            for stats in ranked:
+                unreliable=(
+                    stats.attempts>=self.min_samples
+                    and stats.success_rate<self.skip_below_success_rate
+                )
+                if unreliable and not explore:
+                    continue
+                order.append(stats.name)
+            if self.keep_log:
+                self._log.append(("plan",))
+        #never return an empty plan
+        return order or list(self.backends)
+
+    def record(self,backend:str,latency_ms:float,success:bool,confidence:float=0.0,error:bool=False):
+        with self._lock:
+            stats=self._stats.get(backend)
+            if stats is not None:
+                stats.record(latency_ms,success,confidence,self.alpha,error=error)
+            if self.keep_log:
+                self._log.append(("attempt",backend,latency_ms,success,confidence,error))
+
+    def record_budget_exhausted(self):
+        with self._lock:
+            self._budget_exhausted+=1
+            if self.keep_log:
+                self._log.append(("budget_exhausted",))
+
+    def drain_log(self) -> List[tuple]:
+        with self._lock:
+            log,self._log=self._log,[]
+        return log
+
+    def replay(self,log:List[tuple]):
+        """Merge the requests, attempts and budget stops recorded in another process into these stats"""
+        for event,*args in log:
+            if event=="attempt":
+                backend,latency_ms,success,confidence,error=args
+                self.record(backend,latency_ms,success,confidence,error=error)
+            elif event=="plan":
+                with self._lock:
+                    self._requests+=1
+            elif event=="budget_exhausted":
+                self.record_budget_exhausted()
+
+    def start(self) -> "CascadeRun":
+        return CascadeRun(self)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "requests":self._requests,
+                "budget_exhausted":self._budget_exhausted,
+                "time_budget_ms":self.time_budget_ms,
+                "current_order":[
+                    s.name for s in sorted(self._stats.values(),key=lambda s:(self._expected_cost(s),s.priority))
+                ],
+                "backends":[s.to_dict() for s in self._stats.values()]
+            }
+
+    def reset(self):
+        with self._lock:
+            self._requests=0
+            self._budget_exhausted=0
+            self._stats={name:BackendStats(name,i) for i,name in enumerate(self.backends)}
+
+
+class CascadeRun:
+    """Tracks the time budget of a single request"""
+
+    def __init__(self,cascade:DetectorCascade):
+        self.cascade=cascade
+        self.started=time.perf_counter()
+        self.backends=cascade.plan()
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter()-self.started)*1000
+
+    def budget_left(self) -> bool:
+        if self.cascade.time_budget_ms<=0 or self.elapsed_ms<self.cascade.time_budget_ms:
+            return True
+        self.cascade.record_budget_exhausted()
+        logger.warning(f"Detector time budget of {self.cascade.time_budget_ms}ms exhausted after {self.elapsed_ms:.0f}ms")
+        return False
+
+
+def _default_backends() -> List[str]:
+    #priority: retinaface (best) -> mtcnn -> ssd -> opencv (fallback)
+    backends=['retinaface','mtcnn','ssd','opencv']
+    if yunet_detector.available:
+        #YuNet on ONNX is far cheaper than the TensorFlow detectors, try it first
+        backends.insert(0,yunet_detector.name)
+    return backends
+
+
+#creating singleton instance
+detector_cascade=DetectorCascade(_default_backends())
@@ -0,0 +1,129 @@
+#Dynamic micro-batching in front of the recognition model
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable,Callable,Dict,List,Optional
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import logger
+
+
+class EmbeddingBatcher:
+    """
+    Collects aligned face crops from concurrent requests for up to
+    max_wait_ms or max_batch_size items, runs one batched forward pass
+    through run_batch and fans the embeddings back out to the callers.
+    """
+
+    def __init__(
+        self,
+        run_batch:Callable[[List[np.ndarray]],Awaitable[np.ndarray]],
+        max_batch_size:int=settings.BATCH_SIZE,
+        max_wait_ms:float=settings.BATCH_MAX_WAIT_MS
+    ):
+        self.run_batch=run_batch
+        self.max_batch_size=max(1,max_batch_size)
+        self.max_wait_ms=max_wait_ms
+        self._queue:Optional[asyncio.Queue]=None
+        self._collector:Optional[asyncio.Task]=None
+        self._in_flight:set=set()
+        #crops accepted by embed() and not yet handed to run_batch
+        self._waiting=0
+
+        #metrics
+        self._batches=0
+        self._items=0
+        self._batch_sizes:Dict[int,int]={}
+        self._queue_waits_ms=deque(maxlen=1000)
+        self._forward_ms=deque(maxlen=1000)
+
+    def _ensure_started(self):
+        if self._collector is None or self._collector.done():
+            self._queue=asyncio.Queue()
+            self._collector=asyncio.create_task(self._collect())
+
+    def batches_needed(self,extra:int=0) -> int:
+        """Forward passes the waiting crops (plus `extra` more) will take at most max_batch_size each"""
+        return -(-(self._waiting+extra)//self.max_batch_size)
+
+    async def embed(self,face:np.ndarray) -> np.ndarray:
+        """Queue one aligned crop and wait for its embedding"""
+        self._ensure_started()
+        future=asyncio.get_running_loop().create_future()
+        self._waiting+=1
+        self._queue.put_nowait((face,future,time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        loop=asyncio.get_running_loop()
+        while True:
+            batch=[await self._queue.get()]
+            deadline=loop.time()+self.max_wait_ms/1000
+            while len(batch)<self.max_batch_size:
+                timeout=deadline-loop.time()
+                if timeout<=0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(),timeout))
+                except asyncio.TimeoutError:
+                    break
+            #don't wait for the forward pass, start collecting the next batch right away
+            task=asyncio.create_task(self._run(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _run(self,batch:List[tuple]):
+        self._waiting-=len(batch)
+        started=time.perf_counter()
+        for _,_,queued_at in batch:
+            self._queue_waits_ms.append((started-queued_at)*1000)
+        self._batches+=1
+        self._items+=len(batch)
+        self._batch_sizes[len(batch)]=self._batch_sizes.get(len(batch),0)+1
+
+        try:
+            embeddings=await self.run_batch([face for face,_,_ in batch])
+        except Exception as e:
+            logger.error(f"Batched embedding of {len(batch)} faces failed: {e}")
+            for _,future,_ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self._forward_ms.append((time.perf_counter()-started)*1000)
+        for (_,future,_),embedding in zip(batch,embeddings):
+            if not future.done():
+                future.set_result(embedding)
+
+    def close(self):
+        if self._collector is not None:
+            self._collector.cancel()
+            self._collector=None
+        self._waiting=0
+
+    @staticmethod
+    def _summary(values) -> Dict:
+        if not values:
+            return {"avg":0.0,"p50":0.0,"p95":0.0,"max":0.0}
+        data=np.asarray(values)
+        return {
+            "avg":round(float(data.mean()),2),
+            "p50":round(float(np.percentile(data,50)),2),
+            "p95":round(float(np.percentile(data,95)),2),
+            "max":round(float(data.max()),2)
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "max_batch_size":self.max_batch_size,
+            "max_wait_ms":self.max_wait_ms,
+            "batches":self._batches,
+            "items":self._items,
+            "avg_batch_size":round(self._items/self._batches,2) if self._batches else 0.0,
+            "batch_size_histogram":dict(sorted(self._batch_sizes.items())),
+            "queue_wait_ms":self._summary(self._queue_waits_ms),
+            "forward_pass_ms":self._summary(self._forward_ms),
+            "queued":self._waiting
+        }
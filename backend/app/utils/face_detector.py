@@ -1,10 +1,14 @@
 #Face detection and quality assessment
 
 import cv2
+import time
 import numpy as np
-from typing import Optional,Dict,Tuple
+from typing import Optional,Dict,List,Tuple,Union
+from app.core.config import settings
 from app.core.logger import logger
-from deepface import DeepFace
+from app.utils.detector_cascade import detector_cascade
+from app.utils.model_registry import model_registry
+from app.utils.onnx_backend import yunet_detector
 
 class FaceDetector:
     """Detects faces in image and accesses quality using modern deep learning models"""
@@ -12,7 +16,9 @@ class FaceDetector:
     def __init__(self):
         # Use multiple detector backends for robustness
         # Priority: retinaface (best) -> mtcnn -> ssd -> opencv (fallback)
-        self.detector_backends = ['retinaface', 'mtcnn', 'ssd', 'opencv']
+        # The cascade reorders/skips them at runtime based on observed latency and success
+        self.cascade = detector_cascade
+        self.detector_backends = self.cascade.backends
         logger.info(f"Initialized FaceDetector with backends: {self.detector_backends}")
         
     def detect_face(self,image_path:str) ->Optional[Dict]:
@@ -20,65 +26,99 @@ class FaceDetector:
         Detect face using DeepFace with multiple backend detectors.
         Tries modern detectors first (RetinaFace, MTCNN) then falls back to simpler ones.
         """
+        face_info=self.detect_and_align(image_path)
+        if face_info:
+            face_info.pop("aligned_face")
+        return face_info
+    
+    @staticmethod
+    def extract_faces(img:np.ndarray, backend:str, target_size:Tuple[int,int]) -> list:
+        """Run one detector backend, YuNet on OpenCV/ONNX or any DeepFace backend"""
+        if backend == yunet_detector.name:
+            return yunet_detector.extract_faces(img, target_size=target_size)
+        # Use DeepFace to detect and extract face
+        return model_registry.deepface.extract_faces(
+            img_path=img,
+            target_size=target_size,
+            detector_backend=backend,
+            enforce_detection=False,
+            align=True
+        )
+    
+    @staticmethod
+    def load_image(image:Union[str,bytes,np.ndarray]) -> Optional[np.ndarray]:
+        """Return a BGR array for a file path, encoded image bytes or an array"""
+        if isinstance(image,np.ndarray):
+            return image
+        if isinstance(image,(bytes,bytearray,memoryview)):
+            #decode in memory, uploads never have to touch the disk
+            buffer=np.frombuffer(image,dtype=np.uint8)
+            return cv2.imdecode(buffer,cv2.IMREAD_COLOR) if buffer.size else None
+        return cv2.imread(image)
+    
+    def detect_and_align(
+        self,
+        image:Union[str,bytes,np.ndarray],
+        target_size:Tuple[int,int]=(224,224)
+    ) ->Optional[Dict]:
+        """
+        Single detector pass returning box, confidence and quality metrics plus
+        the aligned face crop ("aligned_face", RGB float in [0,1] at target_size)
+        so it can be fed straight into the recognition model.
+        """
         try:
-            #read image
-            img=cv2.imread(image_path)
+            #read image once, the decoded array is handed to every backend
+            img=self.load_image(image)
             if img is None:
-                logger.error(f"Failed to load image:{image_path}")
+                logger.error(f"Failed to load image:{image if isinstance(image,str) else type(image).__name__}")
                 return None
             
-            # Try each detector backend until one succeeds
-            for backend in self.detector_backends:
+            gray=cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            
+            # Backends in the order the cascade currently thinks is cheapest
+            run = self.cascade.start()
+            fallback = None  # best low-confidence detection seen so far
+            
+            for backend in run.backends:
+                if not run.budget_left():
+                    break
+                
+                started = time.perf_counter()
                 try:
                     logger.info(f"Trying face detection with backend: {backend}")
                     
-                    # Use DeepFace to detect and extract face
-                    face_objs = DeepFace.extract_faces(
-                        img_path=image_path,
-                        detector_backend=backend,
-                        enforce_detection=False,
-                        align=True
-                    )
-                    
-                    if not face_objs or len(face_objs) == 0:
-                        logger.debug(f"No face detected with {backend}")
-                        continue
-                    
-                    # Get the face with highest confidence
-                    best_face = max(face_objs, key=lambda x: x.get('confidence', 0))
-                    
-                    # Check if confidence is reasonable (even with enforce_detection=False)
-                    confidence = best_face.get('confidence', 0)
-                    if confidence < 0.5:
-                        logger.debug(f"Low confidence ({confidence}) with {backend}")
-                        continue
-                    
-                    facial_area = best_face['facial_area']
-                    x = facial_area['x']
-                    y = facial_area['y']
-                    w = facial_area['w']
-                    h = facial_area['h']
-                    
-                    logger.info(f"Face detected successfully with {backend}! Confidence: {confidence:.2f}, Box: ({x},{y},{w},{h})")
-                    
-                    # Extract face region for quality assessment
-                    face_roi = img[y:y+h, x:x+w]
-                    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                    face_gray = gray[y:y+h, x:x+w]
-                    
-                    # Calculate quality metrics
-                    quality_metrics = self._assess_quality(face_roi, face_gray)
-                    
-                    return {
-                        "box": [int(x), int(y), int(w), int(h)],
-                        "confidence": float(confidence),
-                        "detector": backend,
-                        **quality_metrics
-                    }
-                    
+                    face_objs = self.extract_faces(img, backend, target_size)
                 except Exception as e:
+                    self.cascade.record(backend, (time.perf_counter()-started)*1000, False, error=True)
                     logger.debug(f"Backend {backend} failed: {str(e)}")
                     continue
+                
+                latency_ms = (time.perf_counter()-started)*1000
+                
+                if not face_objs or len(face_objs) == 0:
+                    self.cascade.record(backend, latency_ms, False)
+                    logger.debug(f"No face detected with {backend}")
+                    continue
+                
+                # Get the face with highest confidence
+                best_face = max(face_objs, key=lambda x: x.get('confidence', 0))
+                
+                # Check if confidence is reasonable (even with enforce_detection=False)
+                confidence = best_face.get('confidence', 0)
+                if confidence < 0.5:
+                    self.cascade.record(backend, latency_ms, False, confidence)
+                    logger.debug(f"Low confidence ({confidence}) with {backend}")
+                    if fallback is None or confidence > fallback[1].get('confidence', 0):
+                        fallback = (backend, best_face)
+                    continue
+                
+                self.cascade.record(backend, latency_ms, True, confidence)
+                return self._build_result(img, gray, backend, best_face)
+            
+            # Nothing confident, return the best result found so far if it is usable
+            if fallback and fallback[1].get('confidence', 0) >= settings.DETECTION_FALLBACK_CONFIDENCE:
+                logger.info(f"Using best low-confidence detection from {fallback[0]}")
+                return self._build_result(img, gray, *fallback)
             
             # If all backends failed
             logger.warning(f"No face detected with any backend. Image size: {img.shape}")
@@ -87,6 +127,82 @@ class FaceDetector:
         except Exception as e:
             logger.error(f"Error detecting face: {e}", exc_info=True)
             return None
+    
+    def detect_all_and_align(
+        self,
+        image:Union[str,bytes,np.ndarray],
+        target_size:Tuple[int,int]=(224,224),
+        min_confidence:float=0.5,
+        max_faces:int=20
+    ) -> List[Dict]:
+        """
+        Like detect_and_align but keeps every face at or above min_confidence
+        (largest first, at most max_faces) from the first backend that finds any,
+        for group photos and entrance cameras.
+        """
+        try:
+            img=self.load_image(image)
+            if img is None:
+                logger.error(f"Failed to load image:{image if isinstance(image,str) else type(image).__name__}")
+                return []
+
+            gray=cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            run = self.cascade.start()
+
+            for backend in run.backends:
+                if not run.budget_left():
+                    break
+
+                started = time.perf_counter()
+                try:
+                    face_objs = self.extract_faces(img, backend, target_size)
+                except Exception as e:
+                    self.cascade.record(backend, (time.perf_counter()-started)*1000, False, error=True)
+                    logger.debug(f"Backend {backend} failed: {str(e)}")
+                    continue
+
+                latency_ms = (time.perf_counter()-started)*1000
+                confident = [face for face in face_objs or [] if face.get('confidence', 0) >= min_confidence]
+                if not confident:
+                    self.cascade.record(backend, latency_ms, False)
+                    continue
+
+                self.cascade.record(backend, latency_ms, True, max(face['confidence'] for face in confident))
+                confident.sort(key=lambda face: face['facial_area']['w']*face['facial_area']['h'], reverse=True)
+                logger.info(f"Detected {len(confident)} faces with {backend}")
+                return [self._build_result(img, gray, backend, face) for face in confident[:max_faces]]
+
+            logger.warning(f"No faces detected with any backend. Image size: {img.shape}")
+            return []
+
+        except Exception as e:
+            logger.error(f"Error detecting faces: {e}", exc_info=True)
+            return []
+
+    def _build_result(self, img:np.ndarray, gray:np.ndarray, backend:str, face_obj:Dict) -> Dict:
+        facial_area = face_obj['facial_area']
+        x = facial_area['x']
+        y = facial_area['y']
+        w = facial_area['w']
+        h = facial_area['h']
+        confidence = face_obj.get('confidence', 0)
+        
+        logger.info(f"Face detected successfully with {backend}! Confidence: {confidence:.2f}, Box: ({x},{y},{w},{h})")
+        
+        # Extract face region for quality assessment
+        face_roi = img[y:y+h, x:x+w]
+        face_gray = gray[y:y+h, x:x+w]
+        
+        # Calculate quality metrics
+        quality_metrics = self._assess_quality(face_roi, face_gray)
+        
+        return {
+            "box": [int(x), int(y), int(w), int(h)],
+            "confidence": float(confidence),
+            "detector": backend,
+            "aligned_face": face_obj["face"],
+            **quality_metrics
+        }
         
     def _assess_quality(self,face_rgb:np.ndarray,face_gray:np.ndarray)-> Dict:
         laplacian_var=cv2.Laplacian(face_gray,cv2.CV_64F).var()
@@ -1,30 +1,59 @@
 """Face embedding extraction using deepface"""
 
 import numpy as np
-from deepface import DeepFace
-from typing import Optional
+from typing import Optional,List,Tuple,NamedTuple
 import pickle
+import struct
+from app.core.config import settings
 from app.core.logger import logger
+from app.utils.detector_cascade import detector_cascade
+from app.utils.model_registry import model_registry
+from app.utils.onnx_backend import onnx_arcface
+
+
+# Binary embedding format (version 1), replaces pickled float64 arrays:
+#   magic "FMEB" | version u8 | flags u8 | dim u16 | name_len u8 | model name | pad to 4
+#   followed by dim float32 values, little endian
+EMBEDDING_MAGIC=b"FMEB"
+EMBEDDING_FORMAT_VERSION=1
+EMBEDDING_FLAG_NORMALIZED=0x01
+_EMBEDDING_HEADER=struct.Struct("<4sBBHB")
+
+
+class EmbeddingHeader(NamedTuple):
+    version:int
+    normalized:bool
+    dim:int
+    model_name:str
+    offset:int  # where the float32 payload starts
+
 
 class FaceEncoder:
     """to extract face embedding usin g Arcface model"""
-    def __init__(self,model_name:str="ArcFace"):
+    def __init__(self,model_name:str="ArcFace",backend:Optional[str]=None):
         self.model_name=model_name
-        logger.info(f"Initialised FaceEncoder with {model_name} model")
+        #"onnx" runs the exported ArcFace on ONNX Runtime, "deepface" the Keras model
+        if backend is None:
+            backend="onnx" if model_name=="ArcFace" and onnx_arcface.available else "deepface"
+        self.backend=backend
+        logger.info(f"Initialised FaceEncoder with {model_name} model ({backend} backend)")
         
     def extract_embedding(self,image_path:str)-> Optional[np.ndarray]:
         """
         Extract face embedding using DeepFace with multiple detector backends for robustness.
         Tries modern detectors that work with glasses, different lighting, etc.
         """
-        # Try multiple detector backends for better robustness
-        detector_backends = ['retinaface', 'mtcnn', 'ssd', 'opencv']
+        # Try multiple detector backends for better robustness,
+        # in the order and within the time budget the cascade decides
+        run = detector_cascade.start()
         
-        for backend in detector_backends:
+        for backend in run.backends:
+            if not run.budget_left():
+                break
             try:
                 logger.info(f"Trying embedding extraction with detector: {backend}")
                 
-                embedding_objs = DeepFace.represent(
+                embedding_objs = model_registry.deepface.represent(
                     img_path=image_path,
                     model_name=self.model_name,
                     enforce_detection=False,
@@ -48,16 +77,89 @@ class FaceEncoder:
         # If all backends failed
         logger.error("Failed to extract embedding with all detector backends")
         return None
+    
+    @property
+    def target_size(self) -> Tuple[int,int]:
+        #input size of the recognition model, (112,112) for ArcFace
+        if self.backend=="onnx":
+            return onnx_arcface.input_size
+        return model_registry.functions.find_target_size(model_name=self.model_name)
+    
+    def embed_aligned_faces(self,faces:List[np.ndarray]) -> np.ndarray:
+        """
+        Embed already detected and aligned face crops (as returned by
+        FaceDetector.detect_and_align) in one forward pass, skipping detection.
+        Returns an (N, embedding_size) array.
+        """
+        #extract_faces hands out RGB crops, the model was trained on BGR input
+        batch=np.stack([np.asarray(face,dtype=np.float32)[:,:,::-1] for face in faces])
+        if self.backend=="onnx":
+            #"base" normalization is the identity, nothing else to do for the exported graph
+            return onnx_arcface.predict(batch)
+        model=model_registry.recognition_model(self.model_name)
+        batch=model_registry.functions.normalize_input(img=batch,normalization="base")
+        return np.asarray(model.predict(batch,verbose=0))
+    
+    def embed_aligned_face(self,face:np.ndarray) -> Optional[np.ndarray]:
+        try:
+            embedding=self.embed_aligned_faces([face])[0]
+            logger.info(f"Extracted embedding of shape {embedding.shape} from aligned face")
+            return embedding
+        except Exception as e:
+            logger.error(f"Failed to embed aligned face: {e}")
+            return None
         
     @staticmethod
-    def serialize_embedding(embedding: np.ndarray) -> bytes:
-        #converting fom numpy array to byres
-        return pickle.dumps(embedding)
+    def serialize_embedding(
+        embedding: np.ndarray,
+        model_name: str = "",
+        normalize: bool = False
+    ) -> bytes:
+        #converting from numpy array to versioned raw float32 bytes
+        vector=np.asarray(embedding,dtype="<f4").reshape(-1)
+        if normalize:
+            norm=np.linalg.norm(vector)
+            if norm>0:
+                vector=(vector/norm).astype("<f4")
+        name=model_name.encode("ascii",errors="ignore")[:255]
+        header=_EMBEDDING_HEADER.pack(
+            EMBEDDING_MAGIC,
+            EMBEDDING_FORMAT_VERSION,
+            EMBEDDING_FLAG_NORMALIZED if normalize else 0,
+            vector.shape[0],
+            len(name)
+        )+name
+        #pad so the payload is 4 byte aligned for np.frombuffer
+        header+=b"\0"*(-len(header)%4)
+        return header+vector.tobytes()
+    
+    @staticmethod
+    def is_legacy_embedding(embedding_bytes:bytes) -> bool:
+        return bytes(embedding_bytes[:4])!=EMBEDDING_MAGIC
+    
+    @staticmethod
+    def read_embedding_header(embedding_bytes:bytes) -> EmbeddingHeader:
+        magic,version,flags,dim,name_len=_EMBEDDING_HEADER.unpack_from(embedding_bytes,0)
+        if magic!=EMBEDDING_MAGIC:
+            raise ValueError("Not a binary embedding")
+        if version!=EMBEDDING_FORMAT_VERSION:
+            raise ValueError(f"Unsupported embedding format version {version}")
+        name_start=_EMBEDDING_HEADER.size
+        model_name=bytes(embedding_bytes[name_start:name_start+name_len]).decode("ascii")
+        offset=name_start+name_len
+        offset+=-offset%4
+        return EmbeddingHeader(version,bool(flags&EMBEDDING_FLAG_NORMALIZED),dim,model_name,offset)
     
     @staticmethod
     def deserialize_embedding(embedding_bytes:bytes) -> np.ndarray:
-        #convertn=ing again from bytes tonumpy array
-        return pickle.loads(embedding_bytes)
+        #convert bytes back to a numpy array, zero-copy for the binary format
+        if FaceEncoder.is_legacy_embedding(embedding_bytes):
+            #pickled rows written before the binary format, until migrate_embeddings.py has run
+            if not settings.ALLOW_PICKLE_EMBEDDINGS:
+                raise ValueError("Legacy pickled embedding found and ALLOW_PICKLE_EMBEDDINGS is disabled")
+            return pickle.loads(embedding_bytes)
+        header=FaceEncoder.read_embedding_header(embedding_bytes)
+        return np.frombuffer(embedding_bytes,dtype="<f4",count=header.dim,offset=header.offset)
     
     @staticmethod
     def cosine_similarity(embedding1: np.ndarray,embedding2:np.ndarray) ->float:
@@ -0,0 +1,775 @@
+#In-memory face gallery used for 1:N matching
+
+import asyncio
+import threading
+import numpy as np
+from typing import Dict,List,Optional,Tuple
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.utils.gallery_loader import load_gallery_arrays,load_gallery_codes,load_gallery_digest,gallery_digest
+from app.utils.quantization import quantize_int8,int8_scores
+from app.utils.async_redis_cache import async_redis_cache
+from app.utils.face_index import FaceIndex,faiss
+
+
+class FaceGallery:
+    """
+    Process-resident gallery of enrolled faces.
+    Keeps one pre-normalized float32 matrix plus parallel arrays of
+    face_id / user_id / employee_id / full_name so a query is a single
+    matrix-vector product instead of a Python loop over every row.
+    """
+
+    #subclasses that keep vectors in an external index set this to False
+    stores_vectors=True
+
+    #per-row arrays, moved together on grow and swap-remove
+    row_array_names=("_matrix","_face_ids","_user_ids","_employee_ids","_full_names")
+
+    def __init__(self,dim:int=settings.EMBEDDING_SIZE,initial_capacity:int=1024):
+        self.dim=dim
+        self._lock=threading.RLock()
+        self._load_lock:Optional[asyncio.Lock]=None
+        self._loaded=False
+        #changes made while a load is reading rows, replayed onto its snapshot
+        self._journals:List[list]=[]
+        self._reset(initial_capacity)
+
+    def _reset(self,capacity:int):
+        #rows [0,_size) are live, the rest is spare capacity for cheap appends
+        self._size=0
+        self._matrix=np.zeros((capacity,self.dim if self.stores_vectors else 0),dtype=np.float32)
+        self._face_ids=np.zeros(capacity,dtype=np.int64)
+        self._user_ids=np.zeros(capacity,dtype=np.int64)
+        self._employee_ids=np.empty(capacity,dtype=object)
+        self._full_names=np.empty(capacity,dtype=object)
+        self._row_of:Dict[int,int]={}
+
+    def _row_arrays(self) -> tuple:
+        return tuple(getattr(self,name) for name in self.row_array_names)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _normalize(embedding:np.ndarray) -> np.ndarray:
+        vector=np.asarray(embedding,dtype=np.float32).reshape(-1)
+        norm=np.linalg.norm(vector)
+        if norm>0:
+            vector=vector/norm
+        return vector
+
+    @staticmethod
+    def _normalize_batch(embeddings:List[np.ndarray]) -> np.ndarray:
+        queries=np.asarray(embeddings,dtype=np.float32).reshape(len(embeddings),-1)
+        norms=np.linalg.norm(queries,axis=1,keepdims=True)
+        return np.divide(queries,norms,out=np.zeros_like(queries),where=norms>0)
+
+    @staticmethod
+    def _top_k_matrix(scores:np.ndarray,k:int) -> Tuple[np.ndarray,np.ndarray]:
+        #row-wise top k of a (Q, n) score matrix, best first
+        top=np.argpartition(-scores,k-1,axis=1)[:,:k]
+        top_scores=np.take_along_axis(scores,top,axis=1)
+        order=np.argsort(-top_scores,axis=1)
+        return np.take_along_axis(top,order,axis=1),np.take_along_axis(top_scores,order,axis=1)
+
+    def _grow(self,min_capacity:int):
+        capacity=max(min_capacity,self._face_ids.shape[0]*2)
+        for name in self.row_array_names:
+            old=getattr(self,name)
+            new=np.empty((capacity,)+old.shape[1:],dtype=old.dtype)
+            new[:self._size]=old[:self._size]
+            setattr(self,name,new)
+
+    # ---------------------------------------------------------------
+    # Loading
+    # ---------------------------------------------------------------
+
+    async def ensure_loaded(self):
+        """Load the gallery on first use"""
+        if self._loaded:
+            return
+        if self._load_lock is None:
+            self._load_lock=asyncio.Lock()
+        async with self._load_lock:
+            if not self._loaded:
+                await self._load()
+
+    async def _load(self):
+        await self.reload()
+
+    async def _fetch_rows(self) -> Tuple[np.ndarray,np.ndarray,np.ndarray,np.ndarray,np.ndarray]:
+        """Read every active face from the database as parallel arrays"""
+        return tuple(await load_gallery_arrays(dim=self.dim))
+
+    async def reload(self):
+        """Rebuild the whole gallery from the encodings table"""
+        journal=self._start_journal()
+        try:
+            vectors,face_ids,user_ids,employee_ids,full_names=await self._fetch_rows()
+            vectors=await self._prepare_vectors(vectors,face_ids)
+            with self._lock:
+                self._rebuild(vectors,face_ids,user_ids,employee_ids,full_names)
+                self._replay(journal)
+                self._loaded=True
+        finally:
+            self._stop_journal(journal)
+        if journal:
+            self._changed()
+        logger.info(f"Loaded {self._size} faces into the in-memory gallery")
+
+    def _start_journal(self) -> list:
+        journal=[]
+        with self._lock:
+            self._journals.append(journal)
+        return journal
+
+    def _stop_journal(self,journal:list):
+        with self._lock:
+            self._journals.remove(journal)
+
+    def _record(self,*change):
+        #called under the lock
+        for journal in self._journals:
+            journal.append(change)
+
+    def _replay(self,journal:list):
+        #a face added or removed while the rows were read may be missing from (or back in) the snapshot
+        for kind,*args in journal:
+            if kind=="add":
+                self._append(*args)
+            elif kind=="remove_face":
+                self._remove_face(*args)
+            else:
+                self._remove_user(*args)
+
+    def _rebuild(self,vectors,face_ids,user_ids,employee_ids,full_names):
+        count=len(face_ids)
+        self._reset(max(count,1))
+        self._store_vectors(vectors,face_ids)
+        self._face_ids[:count]=face_ids
+        self._user_ids[:count]=user_ids
+        self._employee_ids[:count]=employee_ids
+        self._full_names[:count]=full_names
+        self._row_of={int(face_id):row for row,face_id in enumerate(face_ids)}
+        self._size=count
+
+    # ---------------------------------------------------------------
+    # Vector storage hooks (overridden by index-backed galleries)
+    # ---------------------------------------------------------------
+
+    async def _prepare_vectors(self,vectors:np.ndarray,face_ids:np.ndarray):
+        #runs before the lock is taken, for work too slow to do while searches wait
+        return vectors
+
+    def _store_vectors(self,vectors:np.ndarray,face_ids:np.ndarray):
+        self._matrix[:len(vectors)]=vectors
+
+    def _put_vector(self,row:int,face_id:int,vector:np.ndarray):
+        self._matrix[row]=vector
+
+    def _drop_vectors(self,face_ids:List[int]):
+        pass
+
+    def _top_rows(self,query:np.ndarray,k:int) -> Tuple[np.ndarray,np.ndarray]:
+        scores=self._matrix[:self._size]@query
+        top=np.argpartition(-scores,k-1)[:k]
+        top=top[np.argsort(-scores[top])]
+        return top,scores[top]
+
+    def _top_rows_batch(self,queries:np.ndarray,k:int) -> List[Tuple[np.ndarray,np.ndarray]]:
+        #one matrix-matrix product for all queries
+        rows,scores=self._top_k_matrix(queries@self._matrix[:self._size].T,k)
+        return list(zip(rows,scores))
+
+    def _changed(self):
+        pass
+
+    # ---------------------------------------------------------------
+    # Incremental updates
+    # ---------------------------------------------------------------
+
+    def _append(self,face_id:int,user_id:int,employee_id:str,full_name:str,embedding:np.ndarray):
+        if face_id in self._row_of:
+            row=self._row_of[face_id]
+        else:
+            if self._size>=self._face_ids.shape[0]:
+                self._grow(self._size+1)
+            row=self._size
+            self._size+=1
+            self._row_of[face_id]=row
+
+        self._put_vector(row,face_id,self._normalize(embedding))
+        self._face_ids[row]=face_id
+        self._user_ids[row]=user_id
+        self._employee_ids[row]=employee_id
+        self._full_names[row]=full_name
+
+    def _remove_row(self,row:int):
+        #swap the last live row into the hole so the live block stays contiguous
+        last=self._size-1
+        removed_face_id=int(self._face_ids[row])
+        if row!=last:
+            for array in self._row_arrays():
+                array[row]=array[last]
+            self._row_of[int(self._face_ids[row])]=row
+        self._employee_ids[last]=None
+        self._full_names[last]=None
+        del self._row_of[removed_face_id]
+        self._size=last
+
+    def add(self,face_id:int,user_id:int,employee_id:str,full_name:str,embedding:np.ndarray):
+        """Add (or replace) a single face. Only journalled for a running load until the gallery is loaded."""
+        with self._lock:
+            self._record("add",face_id,user_id,employee_id,full_name,embedding)
+            if not self._loaded:
+                return
+            self._append(face_id,user_id,employee_id,full_name,embedding)
+        self._changed()
+        logger.info(f"Gallery: added face {face_id} for employee {employee_id}")
+
+    def _remove_face(self,face_id:int) -> bool:
+        row=self._row_of.get(face_id)
+        if row is None:
+            return False
+        self._drop_vectors([face_id])
+        self._remove_row(row)
+        return True
+
+    def _remove_user(self,user_id:int) -> int:
+        rows=np.flatnonzero(self._user_ids[:self._size]==user_id)
+        self._drop_vectors([int(self._face_ids[row]) for row in rows])
+        #remove from the back so swapped-in rows are never ones we still need to delete
+        for row in sorted(rows.tolist(),reverse=True):
+            self._remove_row(row)
+        return len(rows)
+
+    def remove_face(self,face_id:int) -> bool:
+        with self._lock:
+            self._record("remove_face",face_id)
+            if not self._remove_face(face_id):
+                return False
+        self._changed()
+        logger.info(f"Gallery: removed face {face_id}")
+        return True
+
+    def remove_user(self,user_id:int) -> int:
+        with self._lock:
+            self._record("remove_user",user_id)
+            removed=self._remove_user(user_id)
+        if removed:
+            self._changed()
+            logger.info(f"Gallery: removed {removed} faces for user {user_id}")
+        return removed
+
+    # ---------------------------------------------------------------
+    # Search
+    # ---------------------------------------------------------------
+
+    def search(self,embedding:np.ndarray,top_k:int=5,threshold:float=0.0) -> List[Dict]:
+        """
+        Return up to top_k best matching faces, best first.
+        Similarity uses the same 0-1 scale as FaceEncoder.cosine_similarity.
+        """
+        query=self._normalize(embedding)
+        with self._lock:
+            if self._size==0:
+                return []
+            rows,scores=self._top_rows(query,min(top_k,self._size))
+            hits=self._hits(rows,scores)
+        return self._matches(hits,threshold)
+
+    def search_batch(self,embeddings:List[np.ndarray],top_k:int=5,threshold:float=0.0) -> List[List[Dict]]:
+        """search() for several query faces at once (e.g. every face in a group photo)"""
+        if len(embeddings)==0:
+            return []
+        queries=self._normalize_batch(embeddings)
+        with self._lock:
+            if self._size==0:
+                return [[] for _ in queries]
+            hits=[
+                self._hits(rows,scores)
+                for rows,scores in self._top_rows_batch(queries,min(top_k,self._size))
+            ]
+        return [self._matches(query_hits,threshold) for query_hits in hits]
+
+    def _hits(self,rows:np.ndarray,scores:np.ndarray) -> List[tuple]:
+        #copy the row metadata out while the lock is held
+        return [
+            (float(score),int(self._face_ids[row]),int(self._user_ids[row]),self._employee_ids[row],self._full_names[row])
+            for row,score in zip(rows,scores)
+        ]
+
+    @staticmethod
+    def _matches(hits:List[tuple],threshold:float) -> List[Dict]:
+        matches=[]
+        for score,face_id,user_id,employee_id,full_name in hits:
+            similarity=float((score+1)/2)
+            if similarity<threshold:
+                break
+            matches.append({
+                "face_id":face_id,
+                "user_id":user_id,
+                "employee_id":employee_id,
+                "full_name":full_name,
+                "similarity":similarity
+            })
+        return matches
+
+    async def search_async(self,embedding:np.ndarray,top_k:int=5,threshold:float=0.0) -> List[Dict]:
+        """Async entry point used by the endpoints, galleries that rerank from an external store override it"""
+        return self.search(embedding,top_k=top_k,threshold=threshold)
+
+    async def search_batch_async(self,embeddings:List[np.ndarray],top_k:int=5,threshold:float=0.0) -> List[List[Dict]]:
+        return self.search_batch(embeddings,top_k=top_k,threshold=threshold)
+
+    async def close(self):
+        """Flush any pending state on shutdown"""
+        pass
+
+
+class TemplateFaceGallery(FaceGallery):
+    """
+    FaceGallery that also keeps one normalized centroid per user.
+    A query is scored against the centroids first and only the faces of the
+    best `top_users` users are rescored, so with up to 5 faces per employee
+    the number of vectors scanned drops by up to 5x.
+    """
+
+    def __init__(self,top_users:int=settings.GALLERY_TEMPLATE_TOP_USERS,**kwargs):
+        self.top_users=max(1,top_users)
+        super().__init__(**kwargs)
+
+    def _reset(self,capacity:int):
+        super()._reset(capacity)
+        self._reset_templates(capacity)
+
+    def _reset_templates(self,capacity:int):
+        #rows [0,_n_users) of _centroids are live, same layout as the face arrays
+        self._n_users=0
+        self._centroids=np.zeros((capacity,self.dim),dtype=np.float32)
+        self._centroid_users=np.zeros(capacity,dtype=np.int64)
+        self._centroid_row:Dict[int,int]={}
+        self._faces_of_user:Dict[int,set]={}
+
+    # ---------------- template maintenance ----------------
+
+    def _refresh_template(self,user_id:int):
+        #recomputed from the member faces (at most a handful), so no drift builds up
+        face_ids=self._faces_of_user.get(user_id)
+        row=self._centroid_row.get(user_id)
+
+        if not face_ids:
+            self._faces_of_user.pop(user_id,None)
+            if row is not None:
+                last=self._n_users-1
+                if row!=last:
+                    self._centroids[row]=self._centroids[last]
+                    self._centroid_users[row]=self._centroid_users[last]
+                    self._centroid_row[int(self._centroid_users[row])]=row
+                del self._centroid_row[user_id]
+                self._n_users=last
+            return
+
+        if row is None:
+            if self._n_users>=self._centroids.shape[0]:
+                capacity=max(self._n_users+1,self._centroids.shape[0]*2)
+                centroids=np.zeros((capacity,self.dim),dtype=np.float32)
+                users=np.zeros(capacity,dtype=np.int64)
+                centroids[:self._n_users]=self._centroids[:self._n_users]
+                users[:self._n_users]=self._centroid_users[:self._n_users]
+                self._centroids,self._centroid_users=centroids,users
+            row=self._n_users
+            self._n_users+=1
+            self._centroid_row[user_id]=row
+            self._centroid_users[row]=user_id
+
+        rows=[self._row_of[face_id] for face_id in face_ids]
+        self._centroids[row]=self._normalize(self._matrix[rows].sum(axis=0))
+
+    def _rebuild(self,vectors,face_ids,user_ids,employee_ids,full_names):
+        super()._rebuild(vectors,face_ids,user_ids,employee_ids,full_names)
+        size=self._size
+        users,inverse=np.unique(self._user_ids[:size],return_inverse=True)
+
+        #sum every user's faces in one pass, then normalize the sums
+        sums=np.zeros((len(users),self.dim),dtype=np.float32)
+        np.add.at(sums,inverse,self._matrix[:size])
+        norms=np.linalg.norm(sums,axis=1,keepdims=True)
+        np.divide(sums,norms,out=sums,where=norms>0)
+
+        self._reset_templates(max(len(users),1))
+        self._centroids[:len(users)]=sums
+        self._centroid_users[:len(users)]=users
+        self._centroid_row={int(user_id):row for row,user_id in enumerate(users)}
+        for face_id,index in zip(self._face_ids[:size],inverse):
+            self._faces_of_user.setdefault(int(users[index]),set()).add(int(face_id))
+        self._n_users=len(users)
+
+    def _append(self,face_id:int,user_id:int,employee_id:str,full_name:str,embedding:np.ndarray):
+        previous_user=None
+        if face_id in self._row_of:
+            previous_user=int(self._user_ids[self._row_of[face_id]])
+            self._faces_of_user.get(previous_user,set()).discard(face_id)
+
+        super()._append(face_id,user_id,employee_id,full_name,embedding)
+        self._faces_of_user.setdefault(int(user_id),set()).add(face_id)
+        self._refresh_template(int(user_id))
+        if previous_user is not None and previous_user!=user_id:
+            self._refresh_template(previous_user)
+
+    def _remove_row(self,row:int):
+        face_id=int(self._face_ids[row])
+        user_id=int(self._user_ids[row])
+        self._faces_of_user.get(user_id,set()).discard(face_id)
+        super()._remove_row(row)
+        self._refresh_template(user_id)
+
+    # ---------------- search ----------------
+
+    def _top_rows(self,query:np.ndarray,k:int) -> Tuple[np.ndarray,np.ndarray]:
+        n_users=min(max(self.top_users,k),self._n_users)
+        user_scores=self._centroids[:self._n_users]@query
+        best=np.argpartition(-user_scores,n_users-1)[:n_users]
+        return self._rescore_users(query,best,k)
+
+    def _top_rows_batch(self,queries:np.ndarray,k:int) -> List[Tuple[np.ndarray,np.ndarray]]:
+        #centroids are scored for all queries at once, the shortlists differ per query
+        n_users=min(max(self.top_users,k),self._n_users)
+        user_scores=queries@self._centroids[:self._n_users].T
+        best=np.argpartition(-user_scores,n_users-1,axis=1)[:,:n_users]
+        return [self._rescore_users(query,users,k) for query,users in zip(queries,best)]
+
+    def _rescore_users(self,query:np.ndarray,best:np.ndarray,k:int) -> Tuple[np.ndarray,np.ndarray]:
+        rows=np.fromiter(
+            (
+                self._row_of[face_id]
+                for user_id in self._centroid_users[best]
+                for face_id in self._faces_of_user[int(user_id)]
+            ),
+            dtype=np.int64
+        )
+        scores=self._matrix[rows]@query
+        k=min(k,len(rows))
+        top=np.argpartition(-scores,k-1)[:k]
+        top=top[np.argsort(-scores[top])]
+        return rows[top],scores[top]
+
+
+class QuantizedFaceGallery(FaceGallery):
+    """
+    Two-stage gallery for large deployments. Only int8 codes (a quarter of
+    the float32 size) are kept in RAM and scanned in stage one; the top
+    `rerank_candidates` are then rescored with their exact float32 vectors,
+    fetched from the shared Redis gallery tier or, on a miss, from Postgres.
+    """
+
+    stores_vectors=False
+    row_array_names=FaceGallery.row_array_names+("_codes","_scales")
+
+    def __init__(self,rerank_candidates:int=settings.GALLERY_RERANK_CANDIDATES,**kwargs):
+        self.rerank_candidates=max(1,rerank_candidates)
+        super().__init__(**kwargs)
+
+    def _reset(self,capacity:int):
+        super()._reset(capacity)
+        self._codes=np.zeros((capacity,self.dim),dtype=np.int8)
+        self._scales=np.ones(capacity,dtype=np.float32)
+
+    async def _fetch_rows(self) -> Tuple[tuple,np.ndarray,np.ndarray,np.ndarray,np.ndarray]:
+        #"vectors" are (codes, scales) pairs here, see _store_vectors
+        arrays=await load_gallery_codes(dim=self.dim)
+        return (arrays.codes,arrays.scales),arrays.face_ids,arrays.user_ids,arrays.employee_ids,arrays.full_names
+
+    def _store_vectors(self,vectors:tuple,face_ids:np.ndarray):
+        codes,scales=vectors
+        self._codes[:len(codes)]=codes
+        self._scales[:len(scales)]=scales
+
+    def _put_vector(self,row:int,face_id:int,vector:np.ndarray):
+        codes,scales=quantize_int8(vector)
+        self._codes[row]=codes[0]
+        self._scales[row]=scales[0]
+
+    def _top_rows(self,query:np.ndarray,k:int) -> Tuple[np.ndarray,np.ndarray]:
+        #stage one only, approximate scores
+        scores=int8_scores(self._codes[:self._size],self._scales,query)
+        top=np.argpartition(-scores,k-1)[:k]
+        top=top[np.argsort(-scores[top])]
+        return top,scores[top]
+
+    def _top_rows_batch(self,queries:np.ndarray,k:int) -> List[Tuple[np.ndarray,np.ndarray]]:
+        scores=int8_scores(self._codes[:self._size],self._scales,queries)
+        rows,scores=self._top_k_matrix(scores.T,k)
+        return list(zip(rows,scores))
+
+    async def _exact_vectors(self,face_ids:List[int]) -> Dict[int,np.ndarray]:
+        vectors=await async_redis_cache.get_gallery_embeddings(face_ids)
+        missing=[face_id for face_id in face_ids if face_id not in vectors]
+        if missing:
+            arrays=await load_gallery_arrays(dim=self.dim,face_ids=missing)
+            vectors.update(zip(arrays.face_ids.tolist(),arrays.vectors))
+            #warm the shared tier so the next worker doesn't hit Postgres
+            await async_redis_cache.set_gallery_faces(zip(
+                arrays.face_ids.tolist(),arrays.user_ids.tolist(),
+                arrays.employee_ids,arrays.full_names,arrays.vectors
+            ))
+        return vectors
+
+    async def search_async(self,embedding:np.ndarray,top_k:int=5,threshold:float=0.0) -> List[Dict]:
+        return (await self.search_batch_async([embedding],top_k=top_k,threshold=threshold))[0]
+
+    async def search_batch_async(self,embeddings:List[np.ndarray],top_k:int=5,threshold:float=0.0) -> List[List[Dict]]:
+        if len(embeddings)==0:
+            return []
+        queries=self._normalize_batch(embeddings)
+        with self._lock:
+            if self._size==0:
+                return [[] for _ in queries]
+            candidates=[
+                self._hits(rows,approx)
+                for rows,approx in self._top_rows_batch(queries,min(max(self.rerank_candidates,top_k),self._size))
+            ]
+
+        #stage two: exact rescoring, one vector fetch for the candidates of every query,
+        #faces we can't fetch keep their approximate score
+        vectors=await self._exact_vectors(list({hit[1] for hits in candidates for hit in hits}))
+        vectors={face_id:self._normalize(vector) for face_id,vector in vectors.items()}
+
+        results=[]
+        for query,hits in zip(queries,candidates):
+            scored=[
+                (float(vectors[face_id]@query) if face_id in vectors else score,face_id,user_id,employee_id,full_name)
+                for score,face_id,user_id,employee_id,full_name in hits
+            ]
+            scored.sort(key=lambda item:item[0],reverse=True)
+            results.append(self._matches(scored[:top_k],threshold))
+        return results
+
+
+class FaissFaceGallery(FaceGallery):
+    """
+    FaceGallery whose vectors live in a FaceIndex instead of a numpy matrix.
+    The index is persisted to FAISS_INDEX_PATH and reloaded on startup,
+    only falling back to a full database scan when it is missing or stale.
+    """
+
+    stores_vectors=False
+
+    #seconds to wait after a change before writing the index to disk
+    SAVE_DELAY=5.0
+
+    def __init__(self,**kwargs):
+        self.face_index=FaceIndex(dim=kwargs.get("dim",settings.EMBEDDING_SIZE))
+        self._save_handle:Optional[asyncio.TimerHandle]=None
+        self._save_task:Optional[asyncio.Task]=None
+        self._upgrade_task:Optional[asyncio.Task]=None
+        self._dirty=False
+        super().__init__(**kwargs)
+
+    # ---------------- storage hooks ----------------
+
+    async def _prepare_vectors(self,vectors:np.ndarray,face_ids:np.ndarray):
+        #training IVF takes seconds at 50k+ faces, keep it off the event loop and the lock
+        return await asyncio.to_thread(self.face_index.build_index,face_ids,vectors)
+
+    def _store_vectors(self,index,face_ids:np.ndarray):
+        #"vectors" is the index built by _prepare_vectors here
+        self.face_index.set_index(index)
+
+    def _put_vector(self,row:int,face_id:int,vector:np.ndarray):
+        self.face_index.add([face_id],vector)
+
+    def _drop_vectors(self,face_ids:List[int]):
+        self.face_index.remove(face_ids)
+
+    def _top_rows(self,query:np.ndarray,k:int) -> Tuple[np.ndarray,np.ndarray]:
+        ids,scores=self.face_index.search(query,k)
+        rows=[]
+        kept=[]
+        for face_id,score in zip(ids[0],scores[0]):
+            row=self._row_of.get(int(face_id))
+            if row is not None:
+                rows.append(row)
+                kept.append(score)
+        return np.asarray(rows,dtype=np.int64),np.asarray(kept,dtype=np.float32)
+
+    def _top_rows_batch(self,queries:np.ndarray,k:int) -> List[Tuple[np.ndarray,np.ndarray]]:
+        ids,scores=self.face_index.search(queries,k)
+        results=[]
+        for query_ids,query_scores in zip(ids,scores):
+            rows=[]
+            kept=[]
+            for face_id,score in zip(query_ids,query_scores):
+                row=self._row_of.get(int(face_id))
+                if row is not None:
+                    rows.append(row)
+                    kept.append(score)
+            results.append((np.asarray(rows,dtype=np.int64),np.asarray(kept,dtype=np.float32)))
+        return results
+
+    # ---------------- persistence ----------------
+
+    def _metadata(self) -> Dict:
+        #describes exactly the rows in memory (and so in the index), called under the lock
+        size=self._size
+        faces=[
+            [int(face_id),int(user_id),employee_id,full_name]
+            for face_id,user_id,employee_id,full_name in zip(
+                self._face_ids[:size],self._user_ids[:size],
+                self._employee_ids[:size],self._full_names[:size]
+            )
+        ]
+        return {"digest":gallery_digest(faces),"faces":faces}
+
+    async def _load(self):
+        #try the persisted index first, it is much cheaper than scanning Postgres
+        journal=self._start_journal()
+        try:
+            metadata=await asyncio.to_thread(self.face_index.load)
+            if metadata is not None:
+                faces=metadata.get("faces",[])
+                #fresh only if the database still holds exactly the faces the index was saved with
+                fresh=(
+                    self.face_index.ntotal==len(faces)
+                    and metadata.get("digest")==gallery_digest(faces)==await load_gallery_digest()
+                )
+                if fresh:
+                    with self._lock:
+                        count=len(faces)
+                        self._reset(max(count,1))
+                        for row,(face_id,user_id,employee_id,full_name) in enumerate(faces):
+                            self._face_ids[row]=face_id
+                            self._user_ids[row]=user_id
+                            self._employee_ids[row]=employee_id
+                            self._full_names[row]=full_name
+                            self._row_of[face_id]=row
+                        self._size=count
+                        self._replay(journal)
+                        self._loaded=True
+                    if journal:
+                        self._changed()
+                    self._upgrade_if_needed()
+                    logger.info(f"Loaded {count} faces into the gallery from the persisted index")
+                    return
+                logger.info("Persisted FAISS index is stale, rebuilding from the database")
+        finally:
+            self._stop_journal(journal)
+        await self.reload()
+
+    async def reload(self):
+        await super().reload()
+        await self.save()
+
+    async def save(self):
+        with self._lock:
+            metadata=self._metadata()
+            data=self.face_index.snapshot()
+            self._dirty=False
+        await asyncio.to_thread(self.face_index.save,metadata,data)
+
+    def _changed(self):
+        #debounce writes, a burst of registrations is saved once
+        self._dirty=True
+        try:
+            loop=asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._save_handle is None or self._save_handle.cancelled():
+            self._save_handle=loop.call_later(self.SAVE_DELAY,self._save_soon)
+        self._upgrade_if_needed()
+
+    # ---------------- Flat -> IVF upgrade ----------------
+
+    def _upgrade_if_needed(self):
+        if not self.face_index.needs_upgrade:
+            return
+        if self._upgrade_task is not None and not self._upgrade_task.done():
+            return
+        try:
+            self._upgrade_task=asyncio.get_running_loop().create_task(self._upgrade_index())
+        except RuntimeError:
+            pass
+
+    async def _upgrade_index(self):
+        """
+        Retrain a Flat index that has grown large enough as IVF. The vectors
+        are copied out under the lock, the new index is trained in a thread
+        and swapped in afterwards with the changes made meanwhile applied.
+        """
+        journal=self._start_journal()
+        try:
+            with self._lock:
+                source=self.face_index.index
+                face_ids,vectors=self.face_index.contents()
+            index=await asyncio.to_thread(self.face_index.build_index,face_ids,vectors)
+            with self._lock:
+                if self.face_index.index is not source:
+                    #a full reload swapped in a fresh index meanwhile
+                    return
+                self.face_index.set_index(index)
+                self._replay_vectors(face_ids,journal)
+        except Exception as e:
+            logger.error(f"Failed to upgrade the FAISS index to IVF: {e}")
+            return
+        finally:
+            self._stop_journal(journal)
+        self._changed()
+
+    def _replay_vectors(self,face_ids:np.ndarray,journal:list):
+        #the rows are current, only the new index misses what changed while it was trained
+        self.face_index.remove([face_id for face_id in face_ids.tolist() if face_id not in self._row_of])
+        for kind,*args in journal:
+            if kind=="add" and args[0] in self._row_of:
+                self.face_index.add([args[0]],self._normalize(args[4]))
+
+    def _save_soon(self):
+        self._save_handle=None
+        if self._save_task is not None and not self._save_task.done():
+            #the previous save is still writing, try again after another delay
+            self._save_handle=asyncio.get_running_loop().call_later(self.SAVE_DELAY,self._save_soon)
+            return
+        #keep a reference, the loop only holds tasks weakly
+        self._save_task=asyncio.create_task(self._save_quietly())
+
+    async def _save_quietly(self):
+        try:
+            await self.save()
+        except Exception as e:
+            logger.error(f"Failed to persist FAISS index: {e}")
+
+    async def close(self):
+        if self._upgrade_task is not None:
+            self._upgrade_task.cancel()
+            self._upgrade_task=None
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle=None
+        if self._save_task is not None:
+            await self._save_task
+            self._save_task=None
+        if self._dirty:
+            await self._save_quietly()
+
+
+def _create_gallery() -> FaceGallery:
+    #the quantized and template galleries keep their own vectors in numpy
+    if settings.GALLERY_QUANTIZED:
+        return QuantizedFaceGallery()
+    if settings.GALLERY_TEMPLATE_MODE:
+        return TemplateFaceGallery()
+    #use the FAISS index when it is enabled and installed, plain numpy otherwise
+    if settings.FAISS_ENABLED:
+        if faiss is not None:
+            return FaissFaceGallery()
+        logger.warning("FAISS_ENABLED is set but faiss is not installed, using numpy gallery")
+    return FaceGallery()
+
+
+#creating singleton instance
+face_gallery=_create_gallery()
@@ -0,0 +1,183 @@
+#FAISS backed approximate nearest neighbour index for face embeddings
+
+import json
+import math
+import os
+import struct
+import tempfile
+import numpy as np
+from typing import Dict,List,Optional,Tuple
+
+from app.core.config import settings
+from app.core.logger import logger
+
+try:
+    import faiss
+except ImportError:  # faiss is optional, the numpy gallery is used without it
+    faiss=None
+
+
+#faiss warns below ~39 training points per IVF cell
+MIN_POINTS_PER_CELL=39
+
+#file layout: magic, metadata length, metadata json, serialized index
+FILE_MAGIC=b"FMIX"
+HEADER=struct.Struct("<4sI")
+
+
+class FaceIndex:
+    """
+    Inner-product index over normalized ArcFace embeddings, keyed by face_id.
+    Uses IndexFlatIP (exact) or IndexIVFFlat (sublinear) depending on
+    FAISS_INDEX_TYPE. IVF falls back to Flat until there is enough data to train it.
+    """
+
+    def __init__(
+        self,
+        dim:int=settings.EMBEDDING_SIZE,
+        index_type:str=settings.FAISS_INDEX_TYPE,
+        nprobe:int=settings.FAISS_NPROBE,
+        nlist:int=settings.FAISS_NLIST,
+        index_path:str=settings.FAISS_INDEX_PATH
+    ):
+        if faiss is None:
+            raise RuntimeError("faiss is not installed")
+        self.dim=dim
+        self.index_type=index_type.upper()
+        self.nprobe=nprobe
+        self.nlist=nlist
+        self.index_path=index_path
+        self.index=self._new_flat()
+
+    @property
+    def ntotal(self) -> int:
+        return int(self.index.ntotal)
+
+    @property
+    def is_ivf(self) -> bool:
+        return faiss.try_extract_index_ivf(self.index) is not None
+
+    def _new_flat(self):
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+
+    def _nlist_for(self,count:int) -> int:
+        return self.nlist or max(1,int(4*math.sqrt(count)))
+
+    def _wants_ivf(self,count:int) -> bool:
+        return self.index_type=="IVF" and count>=self._nlist_for(count)*MIN_POINTS_PER_CELL
+
+    @property
+    def needs_upgrade(self) -> bool:
+        """A Flat index that has grown large enough to be retrained as IVF"""
+        return not self.is_ivf and self._wants_ivf(self.ntotal)
+
+    def build_index(self,face_ids:np.ndarray,vectors:np.ndarray):
+        """
+        Return a new index holding the given vectors, leaving the current one
+        untouched. Training IVF takes seconds on a large gallery, so callers
+        run this in a thread and swap the result in with set_index.
+        """
+        vectors=np.ascontiguousarray(vectors,dtype=np.float32)
+        face_ids=np.ascontiguousarray(face_ids,dtype=np.int64)
+        count=len(face_ids)
+
+        if self._wants_ivf(count):
+            nlist=self._nlist_for(count)
+            quantizer=faiss.IndexFlatIP(self.dim)
+            index=faiss.IndexIVFFlat(quantizer,self.dim,nlist,faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+            index.nprobe=min(self.nprobe,nlist)
+            logger.info(f"Built IVF index with {nlist} lists (nprobe={index.nprobe}) over {count} faces")
+        else:
+            if self.index_type=="IVF":
+                logger.info(f"Only {count} faces, using Flat index until there is enough data to train IVF")
+            index=self._new_flat()
+
+        if count:
+            index.add_with_ids(vectors,face_ids)
+        return index
+
+    def set_index(self,index):
+        self.index=index
+
+    def build(self,face_ids:np.ndarray,vectors:np.ndarray):
+        """Replace the index contents with the given vectors"""
+        self.set_index(self.build_index(face_ids,vectors))
+
+    def contents(self) -> Tuple[np.ndarray,np.ndarray]:
+        """(face_ids, vectors) held by a Flat index, the input for an IVF upgrade"""
+        face_ids=faiss.vector_to_array(self.index.id_map).astype(np.int64)
+        vectors=self.index.index.reconstruct_n(0,self.ntotal)
+        return face_ids,vectors
+
+    def add(self,face_ids:List[int],vectors:np.ndarray):
+        face_ids=np.asarray(face_ids,dtype=np.int64)
+        #add_with_ids does not overwrite, so drop any previous vector first
+        self.index.remove_ids(face_ids)
+        self.index.add_with_ids(np.ascontiguousarray(vectors,dtype=np.float32).reshape(-1,self.dim),face_ids)
+
+    def remove(self,face_ids:List[int]) -> int:
+        if not len(face_ids):
+            return 0
+        return int(self.index.remove_ids(np.asarray(face_ids,dtype=np.int64)))
+
+    def search(self,query:np.ndarray,k:int) -> Tuple[np.ndarray,np.ndarray]:
+        """Return (face_ids, inner products) of the k nearest vectors, -1 padded"""
+        queries=np.ascontiguousarray(query,dtype=np.float32).reshape(-1,self.dim)
+        scores,ids=self.index.search(queries,k)
+        return ids,scores
+
+    def snapshot(self) -> np.ndarray:
+        """Serialize the index in memory so it can be written without holding locks"""
+        return faiss.serialize_index(self.index)
+
+    def save(self,metadata:Dict,data:Optional[np.ndarray]=None):
+        """
+        Write the index and its metadata as one file. Several workers share
+        index_path, so each writes its own temp file and swaps it in with a
+        single os.replace: a reader sees one complete save, never a mix of two.
+        """
+        if data is None:
+            data=self.snapshot()
+        directory=os.path.dirname(self.index_path) or "."
+        os.makedirs(directory,exist_ok=True)
+        meta=json.dumps({"index_type":self.index_type,"dim":self.dim,**metadata}).encode("utf-8")
+
+        fd,tmp_path=tempfile.mkstemp(dir=directory,prefix=f"{os.path.basename(self.index_path)}.",suffix=".tmp")
+        try:
+            with os.fdopen(fd,"wb") as f:
+                f.write(HEADER.pack(FILE_MAGIC,len(meta)))
+                f.write(meta)
+                f.write(np.ascontiguousarray(data,dtype=np.uint8).tobytes())
+            os.replace(tmp_path,self.index_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info(f"Saved FAISS index with {len(metadata.get('faces',()))} faces to {self.index_path}")
+
+    def load(self) -> Optional[Dict]:
+        """Load a persisted index, returning its metadata or None when unusable"""
+        if not os.path.exists(self.index_path):
+            return None
+        try:
+            with open(self.index_path,"rb") as f:
+                raw=f.read()
+            magic,meta_length=HEADER.unpack_from(raw)
+            if magic!=FILE_MAGIC:
+                logger.info("Persisted FAISS index has an old layout, ignoring it")
+                return None
+            metadata=json.loads(raw[HEADER.size:HEADER.size+meta_length].decode("utf-8"))
+            if metadata.get("dim")!=self.dim or metadata.get("index_type")!=self.index_type:
+                logger.info("Persisted FAISS index was built with different settings, ignoring it")
+                return None
+            data=np.frombuffer(raw,dtype=np.uint8,offset=HEADER.size+meta_length)
+            index=faiss.deserialize_index(data)
+            if hasattr(index,"nprobe"):
+                index.nprobe=min(self.nprobe,index.nlist)
+            self.index=index
+            logger.info(f"Loaded FAISS index with {self.ntotal} faces from {self.index_path}")
+            return metadata
+        except Exception as e:
+            logger.error(f"Failed to load FAISS index: {e}")
+            return None
@@ -0,0 +1,51 @@
+#Model warm-up for the detect -> align -> embed stage
+
+import time
+import numpy as np
+
+from app.core.logger import logger
+from app.utils.face_detector import face_detector
+from app.utils.face_encoder import face_encoder
+from app.utils.onnx_backend import yunet_detector
+
+
+class FacePipeline:
+    """
+    Builds the detector and recognition models of a process up front.
+    Detection and embedding themselves run through InferenceExecutor.
+    """
+
+    def __init__(self):
+        self.is_warm=False
+
+    def warm_up(self):
+        """
+        Build the recognition and detector models and push one dummy input
+        through each, so graph building/tracing happens here instead of in
+        the first request. Safe to call repeatedly.
+        """
+        if self.is_warm:
+            return
+        started=time.perf_counter()
+        target_size=face_encoder.target_size
+        face_encoder.embed_aligned_faces([np.zeros((*target_size,3),dtype=np.float32)])
+
+        #called directly rather than through detect_and_align so the cascade stats stay clean
+        dummy=np.full((240,320,3),127,dtype=np.uint8)
+        backends=face_detector.detector_backends
+        if face_encoder.backend=="onnx" and yunet_detector.name in backends:
+            #all-ONNX setup: leave TensorFlow out, its detectors load on the first fallback
+            backends=[yunet_detector.name]
+        for backend in backends:
+            try:
+                face_detector.extract_faces(dummy,backend,target_size)
+            except Exception as e:
+                logger.warning(f"Could not warm up detector {backend}: {e}")
+
+        self.is_warm=True
+        logger.info(f"Face models loaded and warmed up in {time.perf_counter()-started:.1f}s")
+
+
+#creating singleton instance
+face_pipeline=FacePipeline()
+
@@ -0,0 +1,117 @@
+#IoU face tracker for continuous (video) recognition
+
+from typing import Dict,List,Optional,Tuple
+
+from app.core.config import settings
+
+
+def box_iou(a:List[int],b:List[int]) -> float:
+    """Intersection over union of two (x, y, w, h) boxes"""
+    ax,ay,aw,ah=a
+    bx,by,bw,bh=b
+    iw=min(ax+aw,bx+bw)-max(ax,bx)
+    ih=min(ay+ah,by+bh)-max(ay,by)
+    if iw<=0 or ih<=0:
+        return 0.0
+    inter=iw*ih
+    return inter/float(aw*ah+bw*bh-inter)
+
+
+class Track:
+    """One face followed across frames"""
+
+    def __init__(self,track_id:int,box:List[int]):
+        self.track_id=track_id
+        self.box=box
+        self.missed=0
+        self.frames=1
+        #quality of the crop the current match was computed from, None until embedded
+        self.embedded_quality:Optional[float]=None
+        self.match:Optional[Dict]=None
+
+    def to_dict(self) -> Dict:
+        match=self.match or {}
+        return {
+            "track_id":self.track_id,
+            "box":self.box,
+            "match_found":bool(match.get("match_found")),
+            "employee_id":match.get("employee_id"),
+            "full_name":match.get("full_name"),
+            "confidence":match.get("confidence")
+        }
+
+
+class FaceTracker:
+    """
+    Greedy IoU tracker: each detection is assigned to the unclaimed track
+    it overlaps most (above iou_threshold), unmatched detections start new
+    tracks and tracks unseen for more than max_missed processed frames end.
+    Cheap enough to run on every frame, so the recognition model only has to
+    look at faces it has not identified yet.
+    """
+
+    def __init__(
+        self,
+        iou_threshold:float=settings.STREAM_TRACK_IOU,
+        max_missed:int=settings.STREAM_TRACK_MAX_MISSED,
+        quality_gain:float=settings.STREAM_REEMBED_QUALITY_GAIN
+    ):
+        self.iou_threshold=iou_threshold
+        self.max_missed=max_missed
+        self.quality_gain=quality_gain
+        self.tracks:Dict[int,Track]={}
+        self._next_id=1
+
+    def update(self,detections:List[Dict]) -> Tuple[List[Tuple[Track,Dict]],List[Track]]:
+        """
+        Match this frame's detections (face_info dicts with "box") to tracks.
+        Returns ([(track, face_info)] for every detection, [tracks that ended]).
+        """
+        pairs=sorted(
+            (
+                (box_iou(track.box,face_info["box"]),track_id,index)
+                for track_id,track in self.tracks.items()
+                for index,face_info in enumerate(detections)
+            ),
+            reverse=True
+        )
+
+        assigned:Dict[int,Track]={}
+        claimed=set()
+        for iou,track_id,index in pairs:
+            if iou<self.iou_threshold:
+                break
+            if track_id in claimed or index in assigned:
+                continue
+            claimed.add(track_id)
+            assigned[index]=self.tracks[track_id]
+
+        matched=[]
+        for index,face_info in enumerate(detections):
+            track=assigned.get(index)
+            if track is None:
+                track=Track(self._next_id,face_info["box"])
+                self._next_id+=1
+                self.tracks[track.track_id]=track
+            else:
+                track.box=face_info["box"]
+                track.missed=0
+                track.frames+=1
+            matched.append((track,face_info))
+
+        seen={track.track_id for track,_ in matched}
+        ended=[]
+        for track_id in list(self.tracks):
+            if track_id in seen:
+                continue
+            track=self.tracks[track_id]
+            track.missed+=1
+            if track.missed>self.max_missed:
+                ended.append(self.tracks.pop(track_id))
+        return matched,ended
+
+    def needs_embedding(self,track:Track,quality:float) -> bool:
+        """New tracks are embedded once, after that only a clearly better crop is worth it"""
+        if track.embedded_quality is None:
+            return True
+        return quality>=track.embedded_quality+self.quality_gain
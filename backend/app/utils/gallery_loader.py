@@ -0,0 +1,214 @@
+#Streams the face gallery out of Postgres into contiguous numpy arrays
+
+import hashlib
+import json
+import numpy as np
+from typing import AsyncIterator,Iterable,List,NamedTuple,Optional
+from sqlalchemy import select,func,case
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.db.session import AsyncSessionLocal
+from app.models.encoding import Encoding
+from app.models.face import Face
+from app.models.user import User
+from app.utils.face_encoder import FaceEncoder
+from app.utils.quantization import pack_int8,unpack_int8
+
+
+class GalleryArrays(NamedTuple):
+    vectors:np.ndarray  # (N, dim) float32, L2 normalized
+    face_ids:np.ndarray
+    user_ids:np.ndarray
+    employee_ids:np.ndarray
+    full_names:np.ndarray
+
+
+class GalleryCodes(NamedTuple):
+    codes:np.ndarray  # (N, dim) int8, vector ~= code * scale
+    scales:np.ndarray  # (N,) float32
+    face_ids:np.ndarray
+    user_ids:np.ndarray
+    employee_ids:np.ndarray
+    full_names:np.ndarray
+
+
+def _allocate(count:int,dim:int) -> GalleryArrays:
+    return GalleryArrays(
+        np.zeros((count,dim),dtype=np.float32),
+        np.zeros(count,dtype=np.int64),
+        np.zeros(count,dtype=np.int64),
+        np.empty(count,dtype=object),
+        np.empty(count,dtype=object)
+    )
+
+
+def _allocate_codes(count:int,dim:int) -> GalleryCodes:
+    return GalleryCodes(
+        np.zeros((count,dim),dtype=np.int8),
+        np.ones(count,dtype=np.float32),
+        np.zeros(count,dtype=np.int64),
+        np.zeros(count,dtype=np.int64),
+        np.empty(count,dtype=object),
+        np.empty(count,dtype=object)
+    )
+
+
+def _grow(arrays:NamedTuple,capacity:int) -> NamedTuple:
+    size=len(arrays.face_ids)
+    grown=[]
+    for old in arrays:
+        new=np.empty((capacity,)+old.shape[1:],dtype=old.dtype)
+        new[:size]=old
+        grown.append(new)
+    return type(arrays)(*grown)
+
+
+def _trim(arrays:NamedTuple,size:int) -> NamedTuple:
+    if size==len(arrays.face_ids):
+        return arrays
+    return type(arrays)(*(array[:size] for array in arrays))
+
+
+def _gallery_filter(query,face_ids:Optional[List[int]]):
+    query=(
+        query.join(Face,Encoding.face_id==Face.id)
+        .join(User,Face.user_id==User.id)
+        .where(User.is_active==True)
+    )
+    if face_ids is not None:
+        query=query.where(Encoding.face_id.in_(face_ids))
+    return query
+
+
+async def _stream_rows(db,payload,chunk_size:int,face_ids:Optional[List[int]]) -> AsyncIterator[list]:
+    """Yield chunks of (payload, face_id, user_id, employee_id, full_name) rows"""
+    query=_gallery_filter(
+        select(
+            payload,
+            Encoding.face_id,
+            Face.user_id,
+            User.employee_id,
+            User.full_name
+        ),
+        face_ids
+    ).order_by(Encoding.face_id).execution_options(yield_per=chunk_size)
+
+    result=await db.stream(query)
+    async for chunk in result.partitions(chunk_size):
+        yield chunk
+
+
+async def _count_rows(db,face_ids:Optional[List[int]]) -> int:
+    #size the arrays up front; rows added meanwhile are handled by growing
+    return int(await db.scalar(_gallery_filter(select(func.count(Encoding.id)),face_ids)) or 0)
+
+
+async def load_gallery_arrays(
+    dim:int=settings.EMBEDDING_SIZE,
+    chunk_size:int=settings.GALLERY_LOAD_CHUNK_SIZE,
+    face_ids:Optional[List[int]]=None
+) -> GalleryArrays:
+    """
+    Select only the columns matching needs and stream them with a server-side
+    cursor, filling a preallocated matrix chunk by chunk. No ORM objects are
+    built, so a 100k face rebuild doesn't allocate 100k Encoding/Face/User rows.
+    Pass face_ids to load just those faces.
+    """
+    async with AsyncSessionLocal() as db:
+        arrays=_allocate(await _count_rows(db,face_ids),dim)
+
+        size=0
+        async for chunk in _stream_rows(db,Encoding.embedding,chunk_size,face_ids):
+            end=size+len(chunk)
+            if end>len(arrays.face_ids):
+                arrays=_grow(arrays,max(end,len(arrays.face_ids)*2))
+
+            block=arrays.vectors[size:end]
+            for i,(embedding,face_id,user_id,employee_id,full_name) in enumerate(chunk):
+                block[i]=FaceEncoder.deserialize_embedding(embedding)
+                arrays.face_ids[size+i]=face_id
+                arrays.user_ids[size+i]=user_id
+                arrays.employee_ids[size+i]=employee_id
+                arrays.full_names[size+i]=full_name
+
+            #normalize the whole chunk in one vectorized pass
+            norms=np.linalg.norm(block,axis=1,keepdims=True)
+            np.divide(block,norms,out=block,where=norms>0)
+            size=end
+
+    arrays=_trim(arrays,size)
+    logger.info(f"Streamed {size} gallery rows from the database")
+    return arrays
+
+
+async def load_gallery_codes(
+    dim:int=settings.EMBEDDING_SIZE,
+    chunk_size:int=settings.GALLERY_LOAD_CHUNK_SIZE,
+    face_ids:Optional[List[int]]=None
+) -> GalleryCodes:
+    """
+    Like load_gallery_arrays but reads the int8 codes column, so only a
+    quarter of the bytes cross the wire and stay resident. Rows that have no
+    code yet (not migrated) send their float32 embedding and are quantized here.
+    """
+    payload=case(
+        (Encoding.embedding_int8.is_(None),Encoding.embedding),
+        else_=Encoding.embedding_int8
+    )
+    async with AsyncSessionLocal() as db:
+        arrays=_allocate_codes(await _count_rows(db,face_ids),dim)
+
+        size=0
+        quantized_here=0
+        async for chunk in _stream_rows(db,payload,chunk_size,face_ids):
+            end=size+len(chunk)
+            if end>len(arrays.face_ids):
+                arrays=_grow(arrays,max(end,len(arrays.face_ids)*2))
+
+            for i,(data,face_id,user_id,employee_id,full_name) in enumerate(chunk):
+                row=size+i
+                #a packed code is exactly dim+4 bytes with no FMEB header
+                if len(data)==dim+4 and FaceEncoder.is_legacy_embedding(data):
+                    arrays.codes[row],arrays.scales[row]=unpack_int8(data)
+                else:
+                    code=pack_int8(FaceEncoder.deserialize_embedding(data))
+                    arrays.codes[row],arrays.scales[row]=unpack_int8(code)
+                    quantized_here+=1
+                arrays.face_ids[row]=face_id
+                arrays.user_ids[row]=user_id
+                arrays.employee_ids[row]=employee_id
+                arrays.full_names[row]=full_name
+            size=end
+
+    arrays=_trim(arrays,size)
+    logger.info(f"Streamed {size} quantized gallery rows ({quantized_here} without stored codes)")
+    return arrays
+
+
+def gallery_digest(rows:Iterable[tuple]) -> str:
+    """
+    sha256 over (face_id, user_id, employee_id, full_name) rows in face_id
+    order. Changes with any added or removed face, a delete followed by an
+    insert, a deactivated user or a renamed employee.
+    """
+    digest=hashlib.sha256()
+    for face_id,user_id,employee_id,full_name in sorted(rows,key=lambda row:int(row[0])):
+        digest.update(json.dumps([int(face_id),int(user_id),employee_id,full_name]).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+async def load_gallery_digest(chunk_size:int=settings.GALLERY_LOAD_CHUNK_SIZE) -> str:
+    """gallery_digest of the faces load_gallery_arrays would return, without reading any vectors"""
+    query=_gallery_filter(
+        select(Encoding.face_id,Face.user_id,User.employee_id,User.full_name),
+        None
+    ).order_by(Encoding.face_id).execution_options(yield_per=chunk_size)
+
+    rows=[]
+    async with AsyncSessionLocal() as db:
+        result=await db.stream(query)
+        async for chunk in result.partitions(chunk_size):
+            rows.extend(tuple(row) for row in chunk)
+    return gallery_digest(rows)
@@ -0,0 +1,178 @@
+#Keeps the in-memory galleries of every worker in sync over Redis pub/sub
+
+import asyncio
+import json
+import os
+import socket
+import uuid
+from typing import Dict,List,Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.utils.async_redis_cache import async_redis_cache
+from app.utils.face_gallery import FaceGallery,face_gallery
+from app.utils.gallery_loader import load_gallery_arrays
+
+
+VERSION_KEY="face:gallery:version"
+EVENTS_CHANNEL="face:gallery:events"
+
+#bump the version and publish in one atomic step so messages arrive in version order
+PUBLISH_SCRIPT="""
+local version=redis.call('INCR',KEYS[1])
+redis.call('PUBLISH',ARGV[1],version..'|'..ARGV[2])
+return version
+"""
+
+
+class GallerySync:
+    """
+    Every gallery change bumps a monotonically increasing version in Redis
+    and publishes the added/removed face_ids. Each worker applies those
+    deltas to its own gallery; when it notices a gap in the versions (missed
+    messages, Redis restart) it falls back to a full reload.
+    """
+
+    #seconds between reconnect attempts when the subscription drops
+    RETRY_DELAY=5.0
+
+    def __init__(self,gallery:FaceGallery):
+        self.gallery=gallery
+        self.origin=f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.version=0
+        self._script=None
+        self._task:Optional[asyncio.Task]=None
+        self._applied=0
+        self._reloads=0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.GALLERY_SYNC_ENABLED and async_redis_cache.client is not None
+
+    async def _current_version(self) -> Optional[int]:
+        #None when Redis can't be reached
+        value=await async_redis_cache.call(lambda r:r.get(VERSION_KEY),False)
+        if value is False:
+            return None
+        return int(value or 0)
+
+    async def start(self):
+        """Record the current version and start listening, call before loading the gallery"""
+        if not self.enabled or self._task is not None:
+            return
+        self.version=await self._current_version() or 0
+        self._task=asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task=None
+
+    # ---------------------------------------------------------------
+    # Publishing
+    # ---------------------------------------------------------------
+
+    async def publish(self,added:Optional[List[int]]=None,removed:Optional[List[int]]=None):
+        """Tell the other workers which faces changed, this worker has already applied it"""
+        if not self.enabled or not (added or removed):
+            return
+        payload=json.dumps({
+            "origin":self.origin,
+            "added":[int(face_id) for face_id in added or []],
+            "removed":[int(face_id) for face_id in removed or []]
+        })
+
+        async def run(r):
+            if self._script is None:
+                self._script=r.register_script(PUBLISH_SCRIPT)
+            return await self._script(keys=[VERSION_KEY],args=[EVENTS_CHANNEL,payload])
+
+        version=await async_redis_cache.call(run)
+        if version is not None:
+            #our own message will come back to us; bumping here keeps it from looking like a gap
+            if int(version)==self.version+1:
+                self.version=int(version)
+
+    # ---------------------------------------------------------------
+    # Subscribing
+    # ---------------------------------------------------------------
+
+    async def _listen(self):
+        while True:
+            pubsub=None
+            try:
+                pubsub=async_redis_cache.client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(EVENTS_CHANNEL)
+                #messages published while we were not subscribed are lost, catch up first
+                await self._catch_up()
+                while True:
+                    message=await pubsub.get_message(timeout=1.0)
+                    if message is not None and message["type"]=="message":
+                        await self._handle(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Gallery sync subscription failed: {e}")
+                await asyncio.sleep(self.RETRY_DELAY)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+    async def _catch_up(self):
+        current=await self._current_version()
+        if current is not None and current!=self.version:
+            await self._full_reload(current)
+
+    async def _handle(self,data:bytes):
+        raw_version,_,raw_payload=data.decode().partition("|")
+        version=int(raw_version)
+        if version<=self.version:
+            return
+
+        payload=json.loads(raw_payload)
+        if version!=self.version+1:
+            logger.warning(f"Gallery version jumped from {self.version} to {version}, reloading")
+            await self._full_reload(version)
+            return
+
+        if payload.get("origin")!=self.origin:
+            await self._apply(payload.get("added",[]),payload.get("removed",[]))
+        self.version=version
+
+    async def _apply(self,added:List[int],removed:List[int]):
+        await self.gallery.ensure_loaded()
+        for face_id in removed:
+            self.gallery.remove_face(face_id)
+        #a rerank on this worker may have put the vector back into the shared tier since the delete
+        await async_redis_cache.remove_gallery_faces(removed)
+        if added:
+            arrays=await load_gallery_arrays(dim=self.gallery.dim,face_ids=added)
+            for vector,face_id,user_id,employee_id,full_name in zip(*arrays):
+                self.gallery.add(int(face_id),int(user_id),employee_id,full_name,vector)
+        self._applied+=1
+
+    async def _full_reload(self,version:int):
+        #set the version first so deltas arriving during the reload are not treated as gaps
+        self.version=version
+        self._reloads+=1
+        await self.gallery.reload()
+
+    def stats(self) -> Dict:
+        return {
+            "enabled":self.enabled,
+            "origin":self.origin,
+            "version":self.version,
+            "deltas_applied":self._applied,
+            "full_reloads":self._reloads
+        }
+
+
+#creating singleton instance
+gallery_sync=GallerySync(face_gallery)
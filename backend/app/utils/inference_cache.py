@@ -0,0 +1,167 @@
+#Content-addressed cache of detection + embedding results
+
+import asyncio
+import copy
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Awaitable,Callable,Dict,Optional,Tuple
+import numpy as np
+
+from app.core.config import settings
+from app.utils.async_redis_cache import async_redis_cache
+from app.utils.redis_cache import encode_embedding,decode_embedding
+
+
+REDIS_KEY_PREFIX="face:inference:"
+
+#(face_info, embedding) exactly as InferenceExecutor.analyze returns it
+AnalyzeResult=Tuple[Optional[Dict],Optional[np.ndarray]]
+
+
+class InferenceCache:
+    """
+    Maps a hash of the uploaded bytes to the analyze() result, so a kiosk
+    retrying the same frame or an admin re-uploading the same photo skips
+    inference entirely. In-memory LRU bounded by entry count, optionally
+    backed by Redis so all workers share hits. Identical requests that
+    arrive while the first is still running wait for it instead of running
+    inference twice.
+    """
+
+    def __init__(
+        self,
+        max_entries:int=settings.INFERENCE_CACHE_SIZE,
+        ttl_seconds:int=settings.INFERENCE_CACHE_TTL,
+        use_redis:bool=settings.INFERENCE_CACHE_REDIS
+    ):
+        self.max_entries=max(1,max_entries)
+        self.ttl_seconds=ttl_seconds
+        self.use_redis=use_redis
+        self._entries:"OrderedDict[str,AnalyzeResult]"=OrderedDict()
+        self._in_flight:Dict[str,asyncio.Future]={}
+        self._hits=0
+        self._redis_hits=0
+        self._misses=0
+
+    @staticmethod
+    def key_for(content:bytes,min_quality:Optional[float]) -> str:
+        digest=hashlib.blake2b(content,digest_size=20).hexdigest()
+        #the quality gate decides whether an embedding was computed, so it is part of the key
+        return f"{digest}:{min_quality}"
+
+    @staticmethod
+    def _copy(result:AnalyzeResult) -> AnalyzeResult:
+        #callers pop/mutate face_info, never hand out the cached dict itself
+        face_info,embedding=result
+        return copy.deepcopy(face_info),embedding
+
+    @staticmethod
+    def _cacheable(result:AnalyzeResult,min_quality:Optional[float]) -> bool:
+        #a detected face without embedding is only final when the quality gate skipped it,
+        #otherwise embedding failed and a retry deserves a fresh attempt
+        face_info,embedding=result
+        if face_info is None or embedding is not None:
+            return True
+        return min_quality is not None and face_info["quality_score"]<min_quality
+
+    def _remember(self,key:str,result:AnalyzeResult):
+        self._entries[key]=result
+        self._entries.move_to_end(key)
+        while len(self._entries)>self.max_entries:
+            self._entries.popitem(last=False)
+
+    # ---------------- Redis tier ----------------
+
+    async def _redis_get(self,key:str) -> Optional[AnalyzeResult]:
+        values=await async_redis_cache.call(
+            lambda r:r.hmget(f"{REDIS_KEY_PREFIX}{key}",["info","embedding"]),
+            None
+        )
+        if not values or values[0] is None:
+            return None
+        face_info=json.loads(values[0])
+        embedding=decode_embedding(values[1]) if values[1] else None
+        return face_info,embedding
+
+    async def _redis_set(self,key:str,result:AnalyzeResult):
+        face_info,embedding=result
+        mapping={"info":json.dumps(face_info)}
+        if embedding is not None:
+            mapping["embedding"]=encode_embedding(embedding)
+
+        async def write(r):
+            pipe=r.pipeline(transaction=False)
+            pipe.hset(f"{REDIS_KEY_PREFIX}{key}",mapping=mapping)
+            pipe.expire(f"{REDIS_KEY_PREFIX}{key}",self.ttl_seconds)
+            return await pipe.execute()
+
+        await async_redis_cache.call(write)
+
+    # ---------------- lookup ----------------
+
+    async def get_or_compute(
+        self,
+        content:bytes,
+        min_quality:Optional[float],
+        compute:Callable[[],Awaitable[AnalyzeResult]]
+    ) -> AnalyzeResult:
+        key=self.key_for(content,min_quality)
+
+        cached=self._entries.get(key)
+        if cached is not None:
+            self._entries.move_to_end(key)
+            self._hits+=1
+            return self._copy(cached)
+
+        in_flight=self._in_flight.get(key)
+        if in_flight is not None:
+            self._hits+=1
+            return self._copy(await asyncio.shield(in_flight))
+
+        future=asyncio.get_running_loop().create_future()
+        self._in_flight[key]=future
+        try:
+            result=await self._redis_get(key) if self.use_redis else None
+            if result is not None:
+                self._redis_hits+=1
+            else:
+                self._misses+=1
+                result=await compute()
+                result=(result[0],None if result[1] is None else np.asarray(result[1],dtype=np.float32))
+                if self.use_redis and result[0] is not None and self._cacheable(result,min_quality):
+                    await self._redis_set(key,result)
+            #"no face" results are cached too, a retried empty frame is just as wasteful
+            if self._cacheable(result,min_quality):
+                self._remember(key,result)
+            future.set_result(result)
+            return self._copy(result)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            #errors (overload, timeouts) are not cached, waiters get the same error
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody was waiting
+            raise
+        finally:
+            self._in_flight.pop(key,None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups=self._hits+self._redis_hits+self._misses
+        return {
+            "entries":len(self._entries),
+            "max_entries":self.max_entries,
+            "hits":self._hits,
+            "redis_hits":self._redis_hits,
+            "misses":self._misses,
+            "hit_rate":round((self._hits+self._redis_hits)/lookups,3) if lookups else 0.0,
+            "redis":self.use_redis
+        }
+
+
+#creating singleton instance
+inference_cache=InferenceCache()
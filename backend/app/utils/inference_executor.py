@@ -0,0 +1,301 @@
+#Runs CPU bound face inference off the asyncio event loop
+
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import BrokenExecutor,Executor,ProcessPoolExecutor,ThreadPoolExecutor
+from typing import List,Optional,Tuple,Union
+import numpy as np
+from fastapi import HTTPException,status
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.utils.embedding_batcher import EmbeddingBatcher
+from app.utils.inference_cache import inference_cache
+from app.utils.model_registry import MLDisabledError
+
+
+class InferenceOverloadedError(HTTPException):
+    """Raised when the worker pool and its queue are full"""
+
+    def __init__(self,retry_after:int):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Face recognition is busy, please retry shortly",
+            headers={"Retry-After":str(retry_after)}
+        )
+
+
+def _init_worker():
+    #runs once in every worker process: load models before the first task arrives
+    from app.utils.detector_cascade import detector_cascade
+    from app.utils.face_pipeline import face_pipeline
+
+    detector_cascade.keep_log=True
+    try:
+        face_pipeline.warm_up()
+    except Exception as e:
+        logger.error(f"Inference worker warm-up failed: {e}")
+
+
+def _warm_up_worker() -> int:
+    #no-op when the initializer already warmed this worker, returns the pid for logging
+    import os
+    from app.utils.face_pipeline import face_pipeline
+
+    face_pipeline.warm_up()
+    return os.getpid()
+
+
+def _detect_in_worker(image):
+    from app.utils.detector_cascade import detector_cascade
+    from app.utils.face_detector import face_detector
+    from app.utils.face_encoder import face_encoder
+
+    face_info=face_detector.detect_and_align(image,target_size=face_encoder.target_size)
+    return face_info,detector_cascade.drain_log()
+
+
+def _detect_all_in_worker(image,max_faces):
+    from app.utils.detector_cascade import detector_cascade
+    from app.utils.face_detector import face_detector
+    from app.utils.face_encoder import face_encoder
+
+    faces=face_detector.detect_all_and_align(image,target_size=face_encoder.target_size,max_faces=max_faces)
+    return faces,detector_cascade.drain_log()
+
+
+def _embed_in_worker(faces):
+    from app.utils.face_encoder import face_encoder
+
+    return face_encoder.embed_aligned_faces(faces)
+
+
+class InferenceExecutor:
+    """
+    Bounded worker pool for detection/embedding.
+    At most max_workers tasks run at once and max_queue more may wait;
+    anything beyond that is rejected with 503 + Retry-After instead of
+    piling up and stalling every other request on the worker. Crops waiting
+    in the micro-batcher count as the batches they will form.
+    """
+
+    def __init__(
+        self,
+        max_workers:int=settings.MAX_WORKERS,
+        max_queue:int=settings.INFERENCE_QUEUE_SIZE,
+        mode:str=settings.INFERENCE_EXECUTOR
+    ):
+        self.max_workers=max(1,max_workers)
+        self.max_queue=max(0,max_queue)
+        self.mode=mode
+        self._executor:Optional[Executor]=None
+        self._pending=0
+        self._avg_task_seconds=1.0
+        self._completed=0
+        self._rejected=0
+        self.is_warm=False
+        self.batcher=EmbeddingBatcher(self._run_reserved_batch)
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers+self.max_queue
+
+    def start(self):
+        if self._executor is not None or not settings.ENABLE_ML:
+            return
+        if self.mode=="process":
+            #spawn: TensorFlow does not survive fork
+            self._executor=ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+        else:
+            self._executor=ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="inference"
+            )
+        logger.info(f"Started {self.mode} inference pool with {self.max_workers} workers, queue {self.max_queue}")
+
+    async def warm_up(self):
+        """
+        Load and warm the models in every worker before traffic arrives.
+        Submitting one task per worker at once makes the process pool spawn
+        all of its workers now, each running _init_worker first.
+        """
+        self.start()
+        loop=asyncio.get_running_loop()
+        started=time.perf_counter()
+        tasks=self.max_workers if self.mode=="process" else 1
+        try:
+            pids=await asyncio.gather(*(
+                loop.run_in_executor(self._executor,_warm_up_worker) for _ in range(tasks)
+            ))
+        except BrokenExecutor:
+            #a worker died while loading, the next attempt starts a fresh pool
+            self._executor.shutdown(wait=False,cancel_futures=True)
+            self._executor=None
+            raise
+        self.is_warm=True
+        logger.info(f"Inference pool warm ({len(set(pids))} worker processes) in {time.perf_counter()-started:.1f}s")
+
+    def shutdown(self):
+        self.batcher.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False,cancel_futures=True)
+            self._executor=None
+
+    def _retry_after(self) -> int:
+        #rough time until a slot frees up
+        waves=(self._pending+self.batcher.batches_needed())/self.max_workers
+        return max(1,int(round(waves*self._avg_task_seconds)))
+
+    def _reject_if_full(self,slots:int):
+        #batches the micro-batcher has accepted crops for hold their slots too
+        if self._pending+self.batcher.batches_needed()+slots>self.capacity:
+            self._rejected+=1
+            retry_after=self._retry_after()
+            logger.warning(f"Inference pool saturated ({self._pending} pending), rejecting request")
+            raise InferenceOverloadedError(retry_after)
+
+    async def run(self,fn,*args):
+        """Run fn(*args) in the pool, rejecting immediately when saturated"""
+        if not settings.ENABLE_ML:
+            raise MLDisabledError()
+        self._reject_if_full(1)
+        return await self._submit(fn,*args)
+
+    async def _submit(self,fn,*args):
+        self.start()
+        self._pending+=1
+        started=time.perf_counter()
+        try:
+            loop=asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor,fn,*args)
+        finally:
+            self._pending-=1
+            elapsed=time.perf_counter()-started
+            self._avg_task_seconds+=0.2*(elapsed-self._avg_task_seconds)
+            self._completed+=1
+
+    async def detect(self,image:Union[str,bytes,np.ndarray]):
+        """
+        Detect and align the best face in the pool (face_info incl. "aligned_face").
+        Prefer passing the encoded upload bytes: they are far smaller to ship to a
+        worker process than a decoded array and are decoded there with cv2.imdecode.
+        """
+        from app.utils.detector_cascade import detector_cascade
+
+        face_info,log=await self.run(_detect_in_worker,image)
+        if self.mode=="process":
+            #keep the admin cascade stats in this process up to date
+            detector_cascade.replay(log)
+        return face_info
+
+    async def detect_all(self,image:Union[str,bytes,np.ndarray],max_faces:int=20) -> List[dict]:
+        """Detect and align every confident face, largest first"""
+        from app.utils.detector_cascade import detector_cascade
+
+        faces,log=await self.run(_detect_all_in_worker,image,max_faces)
+        if self.mode=="process":
+            detector_cascade.replay(log)
+        return faces
+
+    async def embed_batch(self,faces:List[np.ndarray]) -> np.ndarray:
+        """One forward pass over a batch of aligned crops"""
+        return await self.run(_embed_in_worker,faces)
+
+    async def _run_reserved_batch(self,faces:List[np.ndarray]) -> np.ndarray:
+        #the crops already reserved this slot in embed(), so a full pool must not reject them now
+        return await self._submit(_embed_in_worker,faces)
+
+    async def embed(self,face:np.ndarray) -> np.ndarray:
+        if settings.BATCHING_ENABLED:
+            if not settings.ENABLE_ML:
+                raise MLDisabledError()
+            #reject while enqueueing: a crop joining a partly filled batch needs no extra slot
+            self._reject_if_full(self.batcher.batches_needed(1)-self.batcher.batches_needed())
+            return await self.batcher.embed(face)
+        return (await self.embed_batch([face]))[0]
+
+    async def analyze(self,image:Union[str,bytes,np.ndarray],min_quality:Optional[float]=None):
+        """
+        Detect, align and embed a face. Returns (face_info, embedding).
+        Detection runs per request, embedding goes through the micro-batcher
+        so concurrent requests share one ArcFace forward pass. Uploaded bytes
+        seen before are answered from the inference cache.
+        """
+        if settings.INFERENCE_CACHE_ENABLED and isinstance(image,(bytes,bytearray)):
+            return await inference_cache.get_or_compute(
+                bytes(image),
+                min_quality,
+                lambda:self._analyze(image,min_quality)
+            )
+        return await self._analyze(image,min_quality)
+
+    async def _analyze(self,image:Union[str,bytes,np.ndarray],min_quality:Optional[float]=None):
+        face_info=await self.detect(image)
+        if not face_info:
+            return None,None
+
+        aligned_face=face_info.pop("aligned_face")
+
+        if min_quality is not None and face_info["quality_score"]<min_quality:
+            return face_info,None
+
+        try:
+            embedding=await self.embed(aligned_face)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to embed aligned face: {e}")
+            return face_info,None
+        return face_info,np.asarray(embedding)
+
+    async def analyze_all(
+        self,
+        image:Union[str,bytes,np.ndarray],
+        min_quality:Optional[float]=None,
+        max_faces:int=20
+    ) -> List[Tuple[dict,Optional[np.ndarray]]]:
+        """
+        Detect every face and embed all of them in one forward pass.
+        Returns [(face_info, embedding)], embedding None for faces below
+        min_quality or when embedding failed.
+        """
+        faces=await self.detect_all(image,max_faces)
+        aligned=[face_info.pop("aligned_face") for face_info in faces]
+
+        wanted=[
+            i for i,face_info in enumerate(faces)
+            if min_quality is None or face_info["quality_score"]>=min_quality
+        ]
+        embeddings:List[Optional[np.ndarray]]=[None]*len(faces)
+        if wanted:
+            try:
+                #bypass the micro-batcher, this request already is a batch
+                batch=await self.embed_batch([aligned[i] for i in wanted])
+                for i,embedding in zip(wanted,batch):
+                    embeddings[i]=np.asarray(embedding)
+            except HTTPException:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to embed {len(wanted)} aligned faces: {e}")
+        return list(zip(faces,embeddings))
+
+    def stats(self) -> dict:
+        return {
+            "mode":self.mode,
+            "warm":self.is_warm,
+            "max_workers":self.max_workers,
+            "max_queue":self.max_queue,
+            "pending":self._pending,
+            "completed":self._completed,
+            "rejected":self._rejected,
+            "avg_task_ms":round(self._avg_task_seconds*1000,2)
+        }
+
+
+#creating singleton instance
+inference_executor=InferenceExecutor()
@@ -0,0 +1,96 @@
+#Single entry point to the ML stack (DeepFace / TensorFlow), imported on first use
+
+import threading
+import time
+from typing import Any,Dict,Optional
+from fastapi import HTTPException,status
+
+from app.core.config import settings
+from app.core.logger import logger
+
+
+class MLDisabledError(HTTPException):
+    """Raised when a face endpoint is called on a server running with ENABLE_ML off"""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Face recognition is disabled on this server"
+        )
+
+
+class ModelRegistry:
+    """
+    Importing deepface pulls in TensorFlow, which costs seconds and hundreds
+    of MB. Nothing outside this class imports it, so auth/admin paths and
+    scripts never pay for it, and replicas with ENABLE_ML off never load it.
+    """
+
+    def __init__(self):
+        self._lock=threading.Lock()
+        self._deepface=None
+        self._functions=None
+        self._detectors=None
+        self._models:Dict[str,Any]={}
+        self.import_seconds:Optional[float]=None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.ENABLE_ML
+
+    @property
+    def is_imported(self) -> bool:
+        return self._deepface is not None
+
+    def _import(self):
+        if self._deepface is not None:
+            return
+        if not self.enabled:
+            raise MLDisabledError()
+        with self._lock:
+            if self._deepface is not None:
+                return
+            started=time.perf_counter()
+            from deepface import DeepFace
+            from deepface.commons import functions
+            from deepface.detectors import FaceDetector as DeepFaceDetector
+
+            self._functions=functions
+            self._detectors=DeepFaceDetector
+            self._deepface=DeepFace
+            self.import_seconds=time.perf_counter()-started
+            logger.info(f"Imported DeepFace/TensorFlow in {self.import_seconds:.1f}s")
+
+    @property
+    def deepface(self):
+        self._import()
+        return self._deepface
+
+    @property
+    def functions(self):
+        self._import()
+        return self._functions
+
+    def recognition_model(self,model_name:str):
+        """Build (once) and return the recognition model"""
+        model=self._models.get(model_name)
+        if model is None:
+            model=self.deepface.build_model(model_name)
+            self._models[model_name]=model
+        return model
+
+    def detector_model(self,backend:str):
+        self._import()
+        return self._detectors.build_model(backend)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled":self.enabled,
+            "imported":self.is_imported,
+            "import_seconds":round(self.import_seconds,2) if self.import_seconds is not None else None,
+            "recognition_models":sorted(self._models)
+        }
+
+
+#creating singleton instance
+model_registry=ModelRegistry()
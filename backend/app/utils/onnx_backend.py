@@ -0,0 +1,156 @@
+#ONNX inference backends: ArcFace on ONNX Runtime and the YuNet face detector
+
+import math
+import os
+import threading
+import cv2
+import numpy as np
+from typing import Dict,List,Tuple
+
+from app.core.config import settings
+from app.core.logger import logger
+
+try:
+    import onnxruntime as ort
+except ImportError:  # onnxruntime is optional, DeepFace/TensorFlow is used without it
+    ort=None
+
+
+class OnnxArcFace:
+    """
+    ArcFace exported from the DeepFace Keras model by export_onnx_models.py.
+    Takes the same input as the Keras model (N, 112, 112, 3 BGR in [0,1])
+    and returns the same 512-d embeddings, without importing TensorFlow.
+    """
+
+    def __init__(self,model_path:str=settings.ARCFACE_ONNX_PATH,threads:int=settings.ONNX_THREADS):
+        self.model_path=model_path
+        self.threads=threads
+        self._session=None
+        self._lock=threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return settings.USE_ONNX and ort is not None and os.path.exists(self.model_path)
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    options=ort.SessionOptions()
+                    options.intra_op_num_threads=self.threads
+                    options.graph_optimization_level=ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                    self._session=ort.InferenceSession(
+                        self.model_path,
+                        sess_options=options,
+                        providers=["CPUExecutionProvider"]
+                    )
+                    logger.info(f"Loaded ONNX ArcFace from {self.model_path}")
+        return self._session
+
+    @property
+    def input_size(self) -> Tuple[int,int]:
+        #NHWC input, e.g. [None, 112, 112, 3]
+        shape=self.session.get_inputs()[0].shape
+        return int(shape[1]),int(shape[2])
+
+    def predict(self,batch:np.ndarray) -> np.ndarray:
+        session=self.session
+        inputs={session.get_inputs()[0].name:np.ascontiguousarray(batch,dtype=np.float32)}
+        return session.run(None,inputs)[0]
+
+
+class YuNetDetector:
+    """
+    OpenCV's YuNet face detector (an ONNX model run by cv2.FaceDetectorYN).
+    Returns faces in the same shape as DeepFace.extract_faces, aligned on the
+    eye landmarks and resized/padded the way DeepFace does it, so crops from
+    either backend can be embedded interchangeably.
+    """
+
+    name="yunet"
+
+    def __init__(
+        self,
+        model_path:str=settings.YUNET_ONNX_PATH,
+        score_threshold:float=0.6,
+        nms_threshold:float=0.3,
+        top_k:int=50
+    ):
+        self.model_path=model_path
+        self.score_threshold=score_threshold
+        self.nms_threshold=nms_threshold
+        self.top_k=top_k
+        self._detector=None
+        #FaceDetectorYN keeps per-input-size state, calls are serialized
+        self._lock=threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return settings.USE_ONNX and hasattr(cv2,"FaceDetectorYN") and os.path.exists(self.model_path)
+
+    def detect(self,img:np.ndarray) -> np.ndarray:
+        """Raw detections, (N, 15): x, y, w, h, 5 landmark (x, y) pairs, score"""
+        height,width=img.shape[:2]
+        with self._lock:
+            if self._detector is None:
+                self._detector=cv2.FaceDetectorYN.create(
+                    self.model_path,"",(width,height),
+                    self.score_threshold,self.nms_threshold,self.top_k
+                )
+                logger.info(f"Loaded YuNet detector from {self.model_path}")
+            self._detector.setInputSize((width,height))
+            _,faces=self._detector.detect(img)
+        return faces if faces is not None else np.zeros((0,15),dtype=np.float32)
+
+    @staticmethod
+    def _align(face:np.ndarray,eye_a:Tuple[float,float],eye_b:Tuple[float,float]) -> np.ndarray:
+        #rotate the crop so the eyes are level, like DeepFace's alignment_procedure
+        (ax,ay),(bx,by)=sorted([eye_a,eye_b])
+        angle=math.degrees(math.atan2(by-ay,bx-ax))
+        if abs(angle)<0.5:
+            return face
+        height,width=face.shape[:2]
+        matrix=cv2.getRotationMatrix2D((width/2,height/2),angle,1.0)
+        return cv2.warpAffine(face,matrix,(width,height))
+
+    @staticmethod
+    def _resize_and_pad(face:np.ndarray,target_size:Tuple[int,int]) -> np.ndarray:
+        factor=min(target_size[0]/face.shape[0],target_size[1]/face.shape[1])
+        face=cv2.resize(face,(int(face.shape[1]*factor),int(face.shape[0]*factor)))
+        diff_0=target_size[0]-face.shape[0]
+        diff_1=target_size[1]-face.shape[1]
+        face=np.pad(
+            face,
+            ((diff_0//2,diff_0-diff_0//2),(diff_1//2,diff_1-diff_1//2),(0,0)),
+            "constant"
+        )
+        if face.shape[:2]!=tuple(target_size):
+            face=cv2.resize(face,(target_size[1],target_size[0]))
+        return face
+
+    def extract_faces(self,img:np.ndarray,target_size:Tuple[int,int]=(224,224)) -> List[Dict]:
+        """DeepFace.extract_faces compatible output: face (RGB float [0,1]), facial_area, confidence"""
+        height,width=img.shape[:2]
+        results=[]
+        for detection in self.detect(img):
+            x,y,w,h=(int(round(v)) for v in detection[:4])
+            x,y=max(x,0),max(y,0)
+            w,h=min(w,width-x),min(h,height-y)
+            if w<=0 or h<=0:
+                continue
+
+            crop=self._align(img[y:y+h,x:x+w],tuple(detection[4:6]),tuple(detection[6:8]))
+            face=self._resize_and_pad(crop,target_size).astype(np.float32)/255.0
+            results.append({
+                "face":face[:,:,::-1],
+                "facial_area":{"x":x,"y":y,"w":w,"h":h},
+                "confidence":float(detection[14])
+            })
+        return results
+
+
+#creating singleton instances, models load on first use
+onnx_arcface=OnnxArcFace()
+yunet_detector=YuNetDetector()
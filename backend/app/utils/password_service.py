@@ -0,0 +1,108 @@
+#Runs bcrypt hashing/verification off the asyncio event loop
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional,Tuple
+from fastapi import HTTPException,status
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.security import hash_password,verify_password,verify_and_update_password
+
+
+class PasswordServiceBusyError(HTTPException):
+    """Raised when the hashing threads and their queue are full"""
+
+    def __init__(self,retry_after:int):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress, please retry shortly",
+            headers={"Retry-After":str(retry_after)}
+        )
+
+
+class PasswordService:
+    """
+    Async front for the bcrypt helpers in app.core.security.
+    Every hash/verify (~250 ms at cost 12) runs in a small thread pool;
+    bcrypt releases the GIL, so face matching on the same worker keeps
+    running during a login burst. At most max_workers hashes run at once
+    and max_queue more may wait, anything beyond that gets 503 + Retry-After.
+    """
+
+    def __init__(
+        self,
+        max_workers:int=settings.PASSWORD_HASH_WORKERS,
+        max_queue:int=settings.PASSWORD_HASH_QUEUE_SIZE
+    ):
+        self.max_workers=max(1,max_workers)
+        self.max_queue=max(0,max_queue)
+        self._executor:Optional[ThreadPoolExecutor]=None
+        self._pending=0
+        self._avg_seconds=0.25
+        self._completed=0
+        self._rejected=0
+        self._rehashed=0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers+self.max_queue
+
+    def _ensure_started(self):
+        if self._executor is None:
+            self._executor=ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="bcrypt"
+            )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False,cancel_futures=True)
+            self._executor=None
+
+    async def _run(self,fn,*args):
+        if self._pending>=self.capacity:
+            self._rejected+=1
+            retry_after=max(1,int(round(self._pending/self.max_workers*self._avg_seconds)))
+            logger.warning(f"Password hashing saturated ({self._pending} pending), rejecting request")
+            raise PasswordServiceBusyError(retry_after)
+
+        self._ensure_started()
+        self._pending+=1
+        started=time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor,fn,*args)
+        finally:
+            self._pending-=1
+            self._avg_seconds+=0.2*(time.perf_counter()-started-self._avg_seconds)
+            self._completed+=1
+
+    async def hash(self,password:str) -> str:
+        return await self._run(hash_password,password)
+
+    async def verify(self,password:str,hashed_password:str) -> bool:
+        return await self._run(verify_password,password,hashed_password)
+
+    async def verify_and_update(self,password:str,hashed_password:str) -> Tuple[bool,Optional[str]]:
+        """(valid, new_hash), new_hash is set when the stored hash should be replaced"""
+        valid,new_hash=await self._run(verify_and_update_password,password,hashed_password)
+        if new_hash:
+            self._rehashed+=1
+        return valid,new_hash
+
+    def stats(self) -> dict:
+        return {
+            "rounds":settings.BCRYPT_ROUNDS,
+            "max_workers":self.max_workers,
+            "max_queue":self.max_queue,
+            "pending":self._pending,
+            "completed":self._completed,
+            "rejected":self._rejected,
+            "rehashed":self._rehashed,
+            "avg_ms":round(self._avg_seconds*1000,2)
+        }
+
+
+#creating singleton instance
+password_service=PasswordService()
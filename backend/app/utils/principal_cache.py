@@ -0,0 +1,154 @@
+#Short-lived cache of authenticated users, keyed by token subject
+
+import enum
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict,Optional,Tuple
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.db.session import AsyncSessionLocal
+from app.models.user import User,UserRole
+from app.utils.async_redis_cache import async_redis_cache
+
+
+REDIS_KEY_PREFIX="auth:principal:"
+
+#the password hash never leaves the users table
+_EXCLUDED_COLUMNS={"hashed_password"}
+_DATETIME_COLUMNS={"created_at","updated_at"}
+
+
+def _to_record(user:User) -> Dict:
+    record={}
+    for column in User.__table__.columns:
+        if column.key in _EXCLUDED_COLUMNS:
+            continue
+        value=getattr(user,column.key)
+        if isinstance(value,enum.Enum):
+            value=value.value
+        elif isinstance(value,datetime):
+            value=value.isoformat()
+        record[column.key]=value
+    return record
+
+
+def _from_record(record:Dict) -> User:
+    #a fresh transient User per call, so no request shares (or attaches) another's instance
+    values=dict(record)
+    values["role"]=UserRole(values["role"])
+    for key in _DATETIME_COLUMNS:
+        if values.get(key):
+            values[key]=datetime.fromisoformat(values[key])
+    return User(**values)
+
+
+class PrincipalCache:
+    """
+    Maps a token subject (the user's email) to a snapshot of the user row so
+    authenticated endpoints don't run SELECT users on every call. Entries live
+    for ttl_seconds in a size-bounded in-process LRU, optionally shared through
+    Redis. invalidate() drops an entry here and in Redis; other workers' local
+    copies expire within the TTL, which bounds how long a deleted, deactivated
+    or demoted user keeps access.
+    """
+
+    def __init__(
+        self,
+        max_entries:int=settings.PRINCIPAL_CACHE_SIZE,
+        ttl_seconds:int=settings.PRINCIPAL_CACHE_TTL,
+        use_redis:bool=settings.PRINCIPAL_CACHE_REDIS,
+        enabled:bool=settings.PRINCIPAL_CACHE_ENABLED
+    ):
+        self.max_entries=max(1,max_entries)
+        self.ttl_seconds=ttl_seconds
+        self.use_redis=use_redis
+        self.enabled=enabled
+        self._entries:"OrderedDict[str,Tuple[float,Dict]]"=OrderedDict()
+        self._hits=0
+        self._redis_hits=0
+        self._misses=0
+
+    def _local_get(self,subject:str) -> Optional[Dict]:
+        entry=self._entries.get(subject)
+        if entry is None:
+            return None
+        expires_at,record=entry
+        if expires_at<time.monotonic():
+            del self._entries[subject]
+            return None
+        self._entries.move_to_end(subject)
+        return record
+
+    def _local_set(self,subject:str,record:Dict):
+        self._entries[subject]=(time.monotonic()+self.ttl_seconds,record)
+        self._entries.move_to_end(subject)
+        while len(self._entries)>self.max_entries:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    async def _query(subject:str) -> Optional[Dict]:
+        async with AsyncSessionLocal() as db:
+            result=await db.execute(select(User).where(User.email==subject))
+            user=result.scalar_one_or_none()
+            return _to_record(user) if user is not None else None
+
+    async def _load(self,subject:str) -> Optional[Dict]:
+        if self.use_redis:
+            data=await async_redis_cache.call(lambda r:r.get(f"{REDIS_KEY_PREFIX}{subject}"))
+            if data:
+                self._redis_hits+=1
+                return json.loads(data)
+
+        self._misses+=1
+        record=await self._query(subject)
+        #unknown users are not cached, a registration must be visible immediately
+        if record is not None and self.use_redis:
+            await async_redis_cache.call(
+                lambda r:r.set(f"{REDIS_KEY_PREFIX}{subject}",json.dumps(record),ex=self.ttl_seconds)
+            )
+        return record
+
+    async def get_user(self,subject:str) -> Optional[User]:
+        """The user for a token subject, from cache when possible"""
+        record=self._local_get(subject) if self.enabled else None
+        if record is not None:
+            self._hits+=1
+        else:
+            record=await self._load(subject) if self.enabled else await self._query(subject)
+            if record is None:
+                return None
+            if self.enabled:
+                self._local_set(subject,record)
+        return _from_record(record)
+
+    async def invalidate(self,subject:str):
+        """Forget a user after it was deleted, deactivated or changed role"""
+        self._entries.pop(subject,None)
+        if self.use_redis:
+            await async_redis_cache.call(lambda r:r.delete(f"{REDIS_KEY_PREFIX}{subject}"))
+        logger.info(f"Principal cache: invalidated {subject}")
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups=self._hits+self._redis_hits+self._misses
+        return {
+            "enabled":self.enabled,
+            "entries":len(self._entries),
+            "max_entries":self.max_entries,
+            "ttl_seconds":self.ttl_seconds,
+            "hits":self._hits,
+            "redis_hits":self._redis_hits,
+            "misses":self._misses,
+            "hit_rate":round((self._hits+self._redis_hits)/lookups,3) if lookups else 0.0,
+            "redis":self.use_redis
+        }
+
+
+#creating singleton instance
+principal_cache=PrincipalCache()
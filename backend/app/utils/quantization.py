@@ -0,0 +1,52 @@
+#Symmetric per-vector int8 quantization of normalized embeddings
+
+import numpy as np
+from typing import Tuple
+
+
+#packed code layout: scale float32 (little endian) followed by dim int8 values
+_SCALE_BYTES=4
+
+
+def quantize_int8(vectors:np.ndarray) -> Tuple[np.ndarray,np.ndarray]:
+    """
+    Quantize (N, dim) float vectors to int8 codes with one scale per row,
+    so vector ~= code * scale. Returns (codes, scales).
+    """
+    vectors=np.asarray(vectors,dtype=np.float32)
+    if vectors.ndim==1:
+        vectors=vectors.reshape(1,-1)
+    scales=np.abs(vectors).max(axis=1)/127.0
+    scales[scales==0]=1.0
+    codes=np.clip(np.rint(vectors/scales[:,None]),-127,127).astype(np.int8)
+    return codes,scales.astype(np.float32)
+
+
+def pack_int8(embedding:np.ndarray) -> bytes:
+    """Normalize and quantize one embedding into the bytes stored in Encoding.embedding_int8"""
+    vector=np.asarray(embedding,dtype=np.float32).reshape(-1)
+    norm=np.linalg.norm(vector)
+    codes,scales=quantize_int8(vector/norm if norm>0 else vector)
+    return scales.astype("<f4").tobytes()+codes[0].tobytes()
+
+
+def unpack_int8(data:bytes) -> Tuple[np.ndarray,float]:
+    """Inverse of pack_int8, returns (code, scale) without copying the code"""
+    scale=float(np.frombuffer(data,dtype="<f4",count=1)[0])
+    return np.frombuffer(data,dtype=np.int8,offset=_SCALE_BYTES),scale
+
+
+def int8_scores(codes:np.ndarray,scales:np.ndarray,query:np.ndarray,chunk_size:int=8192) -> np.ndarray:
+    """
+    Approximate inner products of every code with a float query, in bounded memory.
+    A (Q, dim) batch of queries gives (len(codes), Q) scores, each chunk is
+    converted to float32 once and shared by all queries.
+    """
+    query=np.asarray(query,dtype=np.float32)
+    queries=query.reshape(-1,query.shape[-1])
+    scores=np.empty((len(codes),len(queries)),dtype=np.float32)
+    for start in range(0,len(codes),chunk_size):
+        end=start+chunk_size
+        scores[start:end]=codes[start:end].astype(np.float32)@queries.T
+    scores*=scales[:len(codes),None]
+    return scores[:,0] if query.ndim==1 else scores
@@ -1,198 +1,334 @@
 import redis
 import json
 import numpy as np
-from typing import List,Optional,Dict
+from typing import Dict,Iterable,Iterator,List,Optional,Tuple
 import os
 
-from sqlalchemy import values
+from app.core.config import settings
 from app.core.logger import logger
 
+
+#embeddings are stored as raw little-endian float32 bytes
+EMBEDDING_DTYPE="<f4"
+
+#keys
+EMBEDDING_KEY_PREFIX="face:embedding:"
+GALLERY_EMBEDDINGS_KEY="face:gallery:embeddings"  # hash face_id -> float32 bytes
+GALLERY_META_KEY="face:gallery:meta"  # hash face_id -> json {user_id, employee_id, full_name}
+
+
+def encode_embedding(embedding:np.ndarray) -> bytes:
+    return np.asarray(embedding,dtype=EMBEDDING_DTYPE).reshape(-1).tobytes()
+
+
+def decode_embedding(value:bytes) -> np.ndarray:
+    return np.frombuffer(value,dtype=EMBEDDING_DTYPE)
+
+
+def _chunks(items:List,size:int) -> Iterator[List]:
+    for start in range(0,len(items),size):
+        yield items[start:start+size]
+
+
 class RedisCacheService:
+    #commands per pipelined round trip / keys per SCAN step
+    BATCH_SIZE=1000
+
     def __init__(self):
         #fetting redis settings from env
-        redis_host=os.getenv("REDIS_HOST","localhost")
-        redis_port=int(os.getenv("REDIS_PORT",6379))
-        redis_db=int(os.getenv("REDIS_DB",0))
-        
+        self.redis_host=os.getenv("REDIS_HOST","localhost")
+        self.redis_port=int(os.getenv("REDIS_PORT",6379))
+        self.redis_db=int(os.getenv("REDIS_DB",0))
+
+        #connecting lazily on first use, not at import
+        self._client:Optional[redis.Redis]=None
+        self._connect_attempted=False
+
+    @property
+    def redis_client(self) -> Optional[redis.Redis]:
+        if not self._connect_attempted:
+            self._connect_attempted=True
+            self._client=self._connect()
+        return self._client
+
+    def _connect(self) -> Optional[redis.Redis]:
         #Creating connection
         try:
-            self.redis_client=redis.Redis(
-                host=redis_host,
-                port=redis_port,
-                db=redis_db,
-                decode_responses=True
+            #binary client: embeddings are raw bytes, text is decoded explicitly
+            client=redis.Redis(
+                host=self.redis_host,
+                port=self.redis_port,
+                db=self.redis_db,
+                password=settings.REDIS_PASSWORD,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+                decode_responses=False
             )
-            
+
             #testing connection
-            self.redis_client.ping()
+            client.ping()
             logger.info("Connected to Redis successfully")
-            
+            return client
+
         except Exception as e:
             logger.error(f"Failed to connect to Redis: {e}")
-            self.redis_client=None
-            
+            return None
+
     def is_available(self) -> bool:
         # checks if redis working fine
         return self.redis_client is not None
-    
+
+    def _scan_keys(self,pattern:str) -> Iterator[bytes]:
+        #SCAN instead of KEYS so a large keyspace never blocks the server
+        return self.redis_client.scan_iter(match=pattern,count=self.BATCH_SIZE)
+
+    # ==================== Per-employee embeddings ====================
+
     def set_embedding(
         self,
         employee_id:str,
         embedding:np.ndarray,
         expire_seconds:int=3600
     ) -> bool:
-        
+
         if not self.is_available():
             return False
-        
+
         try:
-            key=f"face:embedding:{employee_id}"
-            embedding_list=embedding.tolist()
-            embedding_json=json.dumps(embedding_list)
-            
+            key=f"{EMBEDDING_KEY_PREFIX}{employee_id}"
+
             # Store in redis with expiration
             self.redis_client.setex(
                 name=key,
                 time=expire_seconds,
-                value=embedding_json
+                value=encode_embedding(embedding)
             )
             logger.info(f"Cached embedding for employee {employee_id}")
             return True
-        
+
         except Exception as e:
             logger.error(f"Failed to cache embedding for {employee_id}: {e}")
             return False
-        
+
     def get_embedding(self,employee_id:str) -> Optional[np.ndarray]:
         if not self.is_available():
             return None
-        
+
         try:
-            key=f"face:embedding:{employee_id}"
-            
-            embedding_json=self.redis_client.get(key)
-            
-            if embedding_json is None:
+            key=f"{EMBEDDING_KEY_PREFIX}{employee_id}"
+
+            value=self.redis_client.get(key)
+
+            if value is None:
                 logger.info(f"Cache miss for employee {employee_id}")
                 return None
-            
-            #Found convert back to numpy array
-            embedding_list=json.loads(embedding_json)
-            embedding=np.array(embedding_list)
-            
+
             logger.info(f"Cache hit for employee {employee_id}")
-            return embedding
-        
+            return decode_embedding(value)
+
         except Exception as e:
             logger.error(f"Failed to retrieve embedding for {employee_id}: {e}")
             return None
-        
-        
+
+
     def set_all_embeddings(
         self,
         embeddings: Dict[str,np.ndarray],
         expire_seconds: int=3600
     ) -> bool:
-        # store multiple embeddings at once
-        
+        # store multiple embeddings, one pipelined round trip per batch
+
         if not self.is_available():
             return False
-        
+
         try:
-            pipe=self.redis_client.pipeline()
-            for employee_id,embedding in embeddings.items():
-                key=f"face:embedding:{employee_id}"
-                embedding_list=embedding.tolist()
-                embedding_json=json.dumps(embedding_list)
-                
-                pipe.setex(
-                    key,
-                    expire_seconds,
-                    embedding_json
-                )
+            items=list(embeddings.items())
+            for batch in _chunks(items,self.BATCH_SIZE):
+                pipe=self.redis_client.pipeline(transaction=False)
+                for employee_id,embedding in batch:
+                    pipe.setex(
+                        f"{EMBEDDING_KEY_PREFIX}{employee_id}",
+                        expire_seconds,
+                        encode_embedding(embedding)
+                    )
                 pipe.execute()
-                
-                logger.info(f"Cached {len(embeddings)} embeddings in batch ")
-                return True
-            
+
+            logger.info(f"Cached {len(items)} embeddings in batch")
+            return True
+
         except Exception as e:
             logger.error(f"Failed to cache embeddings in batch: {e}")
             return False
-        
-        
+
+
     def get_all_embeddings(self) -> Dict[str,np.ndarray]:
         if not self.is_available():
             return {}
-        
+
         try:
-            #finding all embeddings keys
-            pattern="face:embedding:*"
-            keys=self.redis_client.keys(pattern)
-            
-            if not keys:
-                logger.info("No embeddings found in cache")
-                return {}
-            
-            values = self.redis_client.mget(keys)
-            
             embeddings={}
-            for key,value in zip(keys,values):
-                if value:
-                    employee_id=key.split(":")[-1]
-                    
-                    embedding_list=json.loads(value)
-                    embedding=np.array(embedding_list)
-                    embeddings[employee_id]=embedding
-                    
+            keys=list(self._scan_keys(f"{EMBEDDING_KEY_PREFIX}*"))
+
+            for batch in _chunks(keys,self.BATCH_SIZE):
+                values=self.redis_client.mget(batch)
+                for key,value in zip(batch,values):
+                    if value:
+                        employee_id=key.decode()[len(EMBEDDING_KEY_PREFIX):]
+                        embeddings[employee_id]=decode_embedding(value)
+
             logger.info(f"Retrieved {len(embeddings)} embeddings from cache")
             return embeddings
-        
+
         except Exception as e:
             logger.error(f"Failed to retrieve embeddings from cache: {e}")
             return {}
-        
-        
+
+
     def delete_embedding(self,employee_id:str)-> bool:
         if not self.is_available():
             return False
-        
+
         try:
-            key=f"face:embedding:{employee_id}"
+            key=f"{EMBEDDING_KEY_PREFIX}{employee_id}"
             result=self.redis_client.delete(key)
-            
+
             if result:
                 logger.info(f"Deleted cache for employee {employee_id}")
                 return True
-            
+
             else:
                 logger.info(f"Embedding not found in cache for employee {employee_id}")
                 return False
-            
+
         except Exception as e:
             logger.error(f"Failed to delete embedding for {employee_id}: {e}")
-            return False    
-        
-        
+            return False
+
+
     def clear_all(self) -> bool:
-        # delete all cached embeddings
-            
+        # delete all cached embeddings and the shared gallery
+
         if not self.is_available():
             return False
-        
+
         try:
-            #Finding all embeddings
-            pattern="face:embedding:*"
-            keys=self.redis_client.keys(pattern)
-            
-            if keys:
-                self.redis_client.delete(*keys)
-                logger.info(f"Cleared all embeddings from cache")
-            else:
-                logger.info("No embeddings to clear from cache")
+            deleted=0
+            batch=[]
+            for key in self._scan_keys(f"{EMBEDDING_KEY_PREFIX}*"):
+                batch.append(key)
+                if len(batch)>=self.BATCH_SIZE:
+                    deleted+=self.redis_client.unlink(*batch)
+                    batch=[]
+            if batch:
+                deleted+=self.redis_client.unlink(*batch)
+            self.redis_client.unlink(GALLERY_EMBEDDINGS_KEY,GALLERY_META_KEY)
+
+            logger.info(f"Cleared {deleted} embeddings and the gallery from cache")
             return True
         except Exception as e:
             logger.error(f"Failed to clear embeddings from cache: {e}")
             return False
-        
-        
-redis_cache=RedisCacheService()
\ No newline at end of file
+
+    # ==================== Shared gallery (one hash per gallery) ====================
+
+    def set_gallery_faces(
+        self,
+        faces:Iterable[Tuple[int,int,str,str,np.ndarray]]
+    ) -> bool:
+        """Store (face_id, user_id, employee_id, full_name, embedding) rows in the gallery hashes"""
+        if not self.is_available():
+            return False
+
+        try:
+            faces=list(faces)
+            for batch in _chunks(faces,self.BATCH_SIZE):
+                embeddings={}
+                meta={}
+                for face_id,user_id,employee_id,full_name,embedding in batch:
+                    embeddings[face_id]=encode_embedding(embedding)
+                    meta[face_id]=json.dumps({
+                        "user_id":int(user_id),
+                        "employee_id":employee_id,
+                        "full_name":full_name
+                    })
+                #both hashes in one round trip
+                pipe=self.redis_client.pipeline(transaction=False)
+                pipe.hset(GALLERY_EMBEDDINGS_KEY,mapping=embeddings)
+                pipe.hset(GALLERY_META_KEY,mapping=meta)
+                pipe.execute()
+
+            logger.info(f"Cached {len(faces)} faces in the shared gallery")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to cache gallery faces: {e}")
+            return False
+
+    def remove_gallery_faces(self,face_ids:List[int]) -> bool:
+        if not self.is_available() or not face_ids:
+            return False
+
+        try:
+            pipe=self.redis_client.pipeline(transaction=False)
+            pipe.hdel(GALLERY_EMBEDDINGS_KEY,*face_ids)
+            pipe.hdel(GALLERY_META_KEY,*face_ids)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to remove gallery faces from cache: {e}")
+            return False
+
+    def get_gallery_embeddings(self,face_ids:List[int]) -> Dict[int,np.ndarray]:
+        """Fetch the embeddings of specific faces in one HMGET"""
+        if not self.is_available() or not face_ids:
+            return {}
+
+        try:
+            values=self.redis_client.hmget(GALLERY_EMBEDDINGS_KEY,face_ids)
+            return {
+                int(face_id):decode_embedding(value)
+                for face_id,value in zip(face_ids,values) if value
+            }
+        except Exception as e:
+            logger.error(f"Failed to read gallery embeddings from cache: {e}")
+            return {}
+
+    def iter_gallery(self) -> Iterator[Tuple[int,int,str,str,np.ndarray]]:
+        """
+        Yield (face_id, user_id, employee_id, full_name, embedding) rows.
+        HSCAN walks the hash in steps so a big gallery never blocks Redis,
+        metadata for each step comes from a single HMGET.
+        """
+        if not self.is_available():
+            return
+
+        cursor=0
+        while True:
+            cursor,chunk=self.redis_client.hscan(GALLERY_EMBEDDINGS_KEY,cursor=cursor,count=self.BATCH_SIZE)
+            if chunk:
+                face_ids=list(chunk.keys())
+                metas=self.redis_client.hmget(GALLERY_META_KEY,face_ids)
+                for face_id,meta in zip(face_ids,metas):
+                    if not meta:
+                        continue
+                    meta=json.loads(meta)
+                    yield (
+                        int(face_id),
+                        meta["user_id"],
+                        meta["employee_id"],
+                        meta["full_name"],
+                        decode_embedding(chunk[face_id])
+                    )
+            if cursor==0:
+                break
+
+    def gallery_size(self) -> int:
+        if not self.is_available():
+            return 0
+        try:
+            return int(self.redis_client.hlen(GALLERY_EMBEDDINGS_KEY))
+        except Exception as e:
+            logger.error(f"Failed to read gallery size from cache: {e}")
+            return 0
+
+
+redis_cache=RedisCacheService()
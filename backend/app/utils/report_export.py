@@ -0,0 +1,157 @@
+#Streaming attendance report export (CSV and XLSX) with flat memory use
+
+import asyncio
+import csv
+import io
+import tempfile
+from datetime import date
+from typing import AsyncIterator,BinaryIO,List,Optional
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.attendance import Attendance
+from app.models.user import User
+
+
+REPORT_HEADERS=[
+    "Date",
+    "employee_id",
+    "Employee Name",
+    "Time in",
+    "Time out",
+    "Status",
+    "Day of Week"
+]
+
+XLSX_MEDIA_TYPE="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+#bytes per chunk when sending a finished file
+FILE_CHUNK_SIZE=64*1024
+
+
+def _report_query(start_date:Optional[date],end_date:Optional[date]):
+    #only the columns the report shows, no ORM objects
+    query=select(
+        Attendance.date,
+        User.employee_id,
+        User.full_name,
+        Attendance.time_in,
+        Attendance.time_out,
+        Attendance.status
+    ).join(User,Attendance.user_id==User.id).order_by(Attendance.date.desc(),Attendance.id.desc())
+    if start_date:
+        query=query.where(Attendance.date>=start_date)
+    if end_date:
+        query=query.where(Attendance.date<=end_date)
+    return query
+
+
+def _format_row(row) -> list:
+    day,employee_id,full_name,time_in,time_out,status=row
+    return [
+        day.strftime("%Y-%m-%d"),
+        employee_id,
+        full_name,
+        time_in.strftime("%I:%M %p") if time_in else "",
+        time_out.strftime("%I:%M %p") if time_out else "",
+        status.value if hasattr(status,'value') else str(status),
+        day.strftime("%A")
+    ]
+
+
+async def iter_report_rows(
+    start_date:Optional[date]=None,
+    end_date:Optional[date]=None,
+    chunk_size:int=settings.REPORT_EXPORT_CHUNK_SIZE
+) -> AsyncIterator[List[list]]:
+    """Formatted report rows in chunks, read with a server-side cursor"""
+    async with AsyncSessionLocal() as db:
+        result=await db.stream(
+            _report_query(start_date,end_date).execution_options(yield_per=chunk_size)
+        )
+        async for chunk in result.partitions(chunk_size):
+            yield [_format_row(row) for row in chunk]
+
+
+async def stream_csv(start_date:Optional[date]=None,end_date:Optional[date]=None) -> AsyncIterator[bytes]:
+    """CSV report, one encoded block per database chunk"""
+    buffer=io.StringIO()
+    writer=csv.writer(buffer)
+    #BOM so Excel opens the UTF-8 names correctly
+    buffer.write("\ufeff")
+    writer.writerow(REPORT_HEADERS)
+    async for rows in iter_report_rows(start_date,end_date):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _column_widths(sample:List[list]) -> List[int]:
+    #sized from the header and the first chunk instead of a pass over every cell
+    widths=[len(header) for header in REPORT_HEADERS]
+    for row in sample:
+        for i,value in enumerate(row):
+            widths[i]=max(widths[i],len(str(value)))
+    return [width+2 for width in widths]
+
+
+def _append_rows(ws,rows:List[list]):
+    for row in rows:
+        ws.append(row)
+
+
+async def build_xlsx(start_date:Optional[date]=None,end_date:Optional[date]=None) -> BinaryIO:
+    """
+    XLSX report built with openpyxl's write-only mode, which streams rows to
+    its own temporary sheet file instead of keeping cells in memory. The
+    zipped workbook goes to a spooled temporary file (memory while small,
+    the system temp dir beyond that), positioned at the start for reading.
+    """
+    wb=Workbook(write_only=True)
+    ws=wb.create_sheet("Attendance Report")
+    header_written=False
+
+    def start_sheet(sample:List[list]):
+        #column widths must be set before the first row in write-only mode
+        for i,width in enumerate(_column_widths(sample),start=1):
+            ws.column_dimensions[get_column_letter(i)].width=width
+        header=[]
+        for title in REPORT_HEADERS:
+            cell=WriteOnlyCell(ws,value=title)
+            cell.font=Font(bold=True)
+            header.append(cell)
+        ws.append(header)
+
+    async for rows in iter_report_rows(start_date,end_date):
+        if not header_written:
+            start_sheet(rows)
+            header_written=True
+        #openpyxl is CPU bound, keep the event loop free between chunks
+        await asyncio.to_thread(_append_rows,ws,rows)
+    if not header_written:
+        start_sheet([])
+
+    output=tempfile.SpooledTemporaryFile(max_size=settings.REPORT_EXPORT_SPOOL_BYTES)
+    await asyncio.to_thread(wb.save,output)
+    output.seek(0)
+    return output
+
+
+async def iter_file(file:BinaryIO) -> AsyncIterator[bytes]:
+    """Send a finished file in chunks and close it afterwards"""
+    try:
+        while True:
+            data=await asyncio.to_thread(file.read,FILE_CHUNK_SIZE)
+            if not data:
+                break
+            yield data
+    finally:
+        file.close()
@@ -0,0 +1,131 @@
+"""
+Measure login throughput and how much bcrypt stalls the event loop.
+
+Local mode (default) runs N concurrent password verifications two ways:
+inline on the event loop (the old behaviour) and through password_service,
+while a ticker task records how late the loop wakes it up.
+
+HTTP mode (--url) fires concurrent logins at a running API instead.
+
+Usage:
+    python benchmark_login.py [--logins 50] [--rounds 10 12]
+    python benchmark_login.py --url http://localhost:8000 --employee-id EMP001 --password Secret123 [--concurrency 20]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+from app.utils.password_service import PasswordService
+
+PASSWORD = "BenchmarkPassw0rd"
+TICK_SECONDS = 0.01
+
+
+async def loop_lag(stop):
+    """Worst delay (ms) between when the ticker should wake and when it does"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        worst = max(worst, time.perf_counter() - started - TICK_SECONDS)
+    return worst * 1000
+
+
+async def measure(verify, logins):
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(loop_lag(stop))
+    await asyncio.sleep(TICK_SECONDS)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(verify() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    lag_ms = await ticker
+    assert all(results), "verification failed"
+    return logins / elapsed, lag_ms
+
+
+async def run_local(logins, rounds_list, workers):
+    print(f"🔐 {logins} concurrent logins, {workers} hashing threads\n")
+    print(f"{'rounds':>6} {'hash ms':>8} {'mode':<16} {'logins/s':>9} {'max loop stall ms':>18}")
+    print("-" * 62)
+
+    for rounds in rounds_list:
+        context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+        started = time.perf_counter()
+        hashed = context.hash(PASSWORD)
+        hash_ms = (time.perf_counter() - started) * 1000
+
+        async def inline():
+            return context.verify(PASSWORD, hashed)
+
+        # bcrypt reads the cost from the hash, so the service verifies any rounds
+        service = PasswordService(max_workers=workers, max_queue=logins)
+
+        async def threaded():
+            return await service.verify(PASSWORD, hashed)
+
+        for mode, verify in (("inline", inline), ("password_service", threaded)):
+            throughput, lag_ms = await measure(verify, logins)
+            print(f"{rounds:>6} {hash_ms:>8.0f} {mode:<16} {throughput:>9.1f} {lag_ms:>18.0f}")
+        service.shutdown()
+
+
+async def run_http(url, employee_id, password, logins, concurrency):
+    import httpx
+
+    latencies = []
+    failures = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=url, timeout=30) as client:
+        async def login():
+            nonlocal failures
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(
+                    f"{settings.API_V1_STR}/auth/login",
+                    json={"employee_id": employee_id, "password": password},
+                )
+                latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    failures += 1
+
+        print(f"🔐 {logins} logins against {url}, concurrency {concurrency}...")
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"   Throughput: {logins / elapsed:.1f} logins/s")
+    print(f"   Latency p50: {statistics.median(latencies):.0f} ms, "
+          f"p95: {latencies[int(len(latencies) * 0.95) - 1]:.0f} ms")
+    if failures:
+        print(f"❌ {failures} logins failed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark bcrypt login throughput")
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[settings.BCRYPT_ROUNDS])
+    parser.add_argument("--workers", type=int, default=settings.PASSWORD_HASH_WORKERS)
+    parser.add_argument("--url", help="benchmark a running API instead of local hashing")
+    parser.add_argument("--employee-id")
+    parser.add_argument("--password")
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.url:
+        if not args.employee_id or not args.password:
+            parser.error("--url needs --employee-id and --password")
+        asyncio.run(run_http(args.url, args.employee_id, args.password, args.logins, args.concurrency))
+    else:
+        asyncio.run(run_local(args.logins, args.rounds, args.workers))
@@ -0,0 +1,78 @@
+"""
+Measure process startup cost: import time and peak RSS of the API,
+with and without the ML stack. Every sample runs in a fresh interpreter.
+
+Usage:
+    python benchmark_startup.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent
+
+# Runs inside the child interpreter
+CHILD_CODE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import app.main
+if {load_models}:
+    from app.utils.model_registry import model_registry
+    model_registry.deepface
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    "seconds": elapsed,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "tensorflow_imported": "tensorflow" in sys.modules,
+}}))
+"""
+
+SCENARIOS = [
+    # (label, ENABLE_ML, force the ML import)
+    ("import app.main, ENABLE_ML=false", "false", False),
+    ("import app.main, ENABLE_ML=true", "true", False),
+    ("import app.main + DeepFace/TensorFlow", "true", True),
+]
+
+
+def run_once(enable_ml, load_models):
+    env = dict(os.environ, ENABLE_ML=enable_ml, WARMUP_ON_STARTUP="false")
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD_CODE.format(load_models=load_models)],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "child failed")
+    # the last line is our JSON, anything before it is log output
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(runs):
+    print(f"⏱️  Measuring startup cost ({runs} runs per scenario)...\n")
+    print(f"{'Scenario':<40} {'median s':>9} {'max s':>7} {'peak RSS MB':>12}  TF loaded")
+    print("-" * 82)
+
+    for label, enable_ml, load_models in SCENARIOS:
+        try:
+            samples = [run_once(enable_ml, load_models) for _ in range(runs)]
+        except Exception as e:
+            print(f"{label:<40} ❌ {e}")
+            continue
+        seconds = [sample["seconds"] for sample in samples]
+        rss = max(sample["rss_mb"] for sample in samples)
+        tensorflow = "yes" if samples[0]["tensorflow_imported"] else "no"
+        print(f"{label:<40} {statistics.median(seconds):>9.2f} {max(seconds):>7.2f} {rss:>12.0f}  {tensorflow}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark API startup time and memory")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    main(args.runs)
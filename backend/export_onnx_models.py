@@ -0,0 +1,91 @@
+"""
+One-time export of the ONNX inference models used when USE_ONNX is enabled:
+  - ArcFace: converted from the DeepFace Keras model with tf2onnx
+  - YuNet:   downloaded from the OpenCV model zoo
+
+Needs the full ML stack plus tf2onnx (pip install tf2onnx), only on the
+machine that runs the export. The API itself only needs onnxruntime.
+
+Usage:
+    python export_onnx_models.py [--skip-arcface] [--skip-yunet] [--opset 13]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+
+from app.core.config import settings
+from download_models import download_file_with_retry
+
+YUNET_URL = (
+    "https://github.com/opencv/opencv_zoo/raw/main/models/"
+    "face_detection_yunet/face_detection_yunet_2023mar.onnx"
+)
+
+
+def export_arcface(opset):
+    """Convert DeepFace's ArcFace to ONNX and check it against the Keras model"""
+    import tensorflow as tf
+    import tf2onnx
+    import onnxruntime as ort
+    from deepface import DeepFace
+
+    output_path = Path(settings.ARCFACE_ONNX_PATH)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    print("🔄 Building ArcFace Keras model...")
+    model = DeepFace.build_model("ArcFace")
+    height, width = model.input_shape[1:3]
+
+    print(f"🔄 Converting to ONNX (opset {opset})...")
+    spec = (tf.TensorSpec((None, height, width, 3), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=str(output_path))
+
+    # Same input through both runtimes, embeddings should be practically identical
+    batch = np.random.default_rng(0).random((4, height, width, 3), dtype=np.float32)
+    expected = model.predict(batch, verbose=0)
+    session = ort.InferenceSession(str(output_path), providers=["CPUExecutionProvider"])
+    actual = session.run(None, {session.get_inputs()[0].name: batch})[0]
+
+    cosine = np.sum(expected * actual, axis=1) / (
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1)
+    )
+    print(f"   Max abs difference: {np.abs(expected - actual).max():.2e}")
+    print(f"   Min cosine similarity: {cosine.min():.6f}")
+    if cosine.min() < 0.9999:
+        print("❌ ONNX output does not match the Keras model")
+        return False
+
+    print(f"✅ ArcFace exported to {output_path} ({output_path.stat().st_size / 1024 / 1024:.1f} MB)")
+    return True
+
+
+def download_yunet():
+    output_path = Path(settings.YUNET_ONNX_PATH)
+    if output_path.exists():
+        print(f"✅ YuNet already exists: {output_path}")
+        return True
+    return download_file_with_retry(YUNET_URL, output_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the ONNX models used when USE_ONNX is enabled")
+    parser.add_argument("--skip-arcface", action="store_true")
+    parser.add_argument("--skip-yunet", action="store_true")
+    parser.add_argument("--opset", type=int, default=13)
+    args = parser.parse_args()
+
+    print("\n🚀 Preparing ONNX models\n")
+    ok = True
+    if not args.skip_arcface:
+        ok = export_arcface(args.opset) and ok
+    if not args.skip_yunet:
+        ok = download_yunet() and ok
+
+    if ok:
+        print("\n✅ Done, restart the API with USE_ONNX=true to use them")
+    sys.exit(0 if ok else 1)
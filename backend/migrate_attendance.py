@@ -0,0 +1,43 @@
+"""
+Bring an existing attendances table up to date with the model.
+create_all only creates missing tables, so indexes added to
+Attendance.__table_args__ later have to be created here.
+The index is built CONCURRENTLY, safe to run while the API is serving.
+
+Usage:
+    python migrate_attendance.py
+"""
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import create_engine, text
+
+from app.core.config import settings
+
+INDEXES = [
+    ("ix_attendances_user_id_date", "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_attendances_user_id_date ON attendances (user_id, date)"),
+]
+
+
+def migrate():
+    # Use sync engine
+    sync_url = settings.DATABASE_URL.replace("+asyncpg", "")
+    engine = create_engine(sync_url)
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, statement in INDEXES:
+            print(f"🔄 Creating index {name}...")
+            conn.execute(text(statement))
+            print(f"✅ {name} ready")
+        # Fresh statistics so the planner picks the new index right away
+        conn.execute(text("ANALYZE attendances"))
+
+
+if __name__ == "__main__":
+    print("🔄 Migrating attendance table...\n")
+    migrate()
+    print("\n✅ Attendance table up to date")
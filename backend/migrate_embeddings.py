@@ -0,0 +1,121 @@
+"""
+Rewrite pickled embeddings in the encodings table to the binary float32 format
+and fill the int8 codes (embedding_int8) used by the quantized gallery.
+
+Deploy order matters: the encodings.embedding_int8 column must exist BEFORE
+the new API code is deployed, otherwise face registration and every load of
+an Encoding fail with UndefinedColumn. Add it first with --schema-only
+(a quick ALTER TABLE, safe against the running old code), deploy, then run
+the full migration. That part is safe to run while the API is serving:
+readers accept both formats.
+
+Usage:
+    python migrate_embeddings.py --schema-only      # before deploying
+    python migrate_embeddings.py [--batch-size 500] [--dry-run]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.models.encoding import Encoding
+from app.utils.face_encoder import FaceEncoder
+from app.utils.quantization import pack_int8
+
+
+def add_columns(engine):
+    # create_all doesn't add columns to existing tables
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE encodings ADD COLUMN IF NOT EXISTS embedding_int8 BYTEA"))
+
+
+def migrate(batch_size, dry_run):
+    """Convert every legacy row, committing one batch at a time"""
+    # Use sync engine
+    sync_url = settings.DATABASE_URL.replace("+asyncpg", "")
+    engine = create_engine(sync_url)
+    SessionLocal = sessionmaker(bind=engine)
+    db = SessionLocal()
+
+    add_columns(engine)
+
+    converted = 0
+    quantized = 0
+    skipped = 0
+    failed = 0
+    last_id = 0
+
+    try:
+        while True:
+            # Keyset pagination so each batch is a cheap index range scan
+            rows = db.execute(
+                select(Encoding)
+                .where(Encoding.id > last_id)
+                .order_by(Encoding.id)
+                .limit(batch_size)
+            ).scalars().all()
+
+            if not rows:
+                break
+
+            for encoding in rows:
+                last_id = encoding.id
+                try:
+                    vector = np.asarray(FaceEncoder.deserialize_embedding(encoding.embedding))
+                    if FaceEncoder.is_legacy_embedding(encoding.embedding):
+                        encoding.embedding = FaceEncoder.serialize_embedding(
+                            vector,
+                            model_name=encoding.model_name or ""
+                        )
+                        converted += 1
+                    else:
+                        skipped += 1
+                    if encoding.embedding_int8 is None:
+                        encoding.embedding_int8 = pack_int8(vector)
+                        quantized += 1
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ Encoding {encoding.id}: {e}")
+
+            if dry_run:
+                db.rollback()
+            else:
+                db.commit()
+            print(f"   ... processed up to id {last_id} ({converted} converted)")
+    finally:
+        db.close()
+
+    return converted, quantized, skipped, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate pickled embeddings to the binary format")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Convert but don't commit")
+    parser.add_argument("--schema-only", action="store_true", help="Only add the embedding_int8 column (run before deploying)")
+    args = parser.parse_args()
+
+    if args.schema_only:
+        add_columns(create_engine(settings.DATABASE_URL.replace("+asyncpg", "")))
+        print("✅ encodings.embedding_int8 exists, the new code can be deployed")
+        sys.exit(0)
+
+    print("🔄 Migrating embeddings to binary float32 format...\n")
+    converted, quantized, skipped, failed = migrate(args.batch_size, args.dry_run)
+
+    print(f"\n✅ Converted: {converted}")
+    print(f"✅ Int8 codes filled: {quantized}")
+    print(f"⏭️  Already binary: {skipped}")
+    if failed:
+        print(f"❌ Failed: {failed}")
+    if args.dry_run:
+        print("\n(dry run, nothing was committed)")
+    elif not failed:
+        print("\nAll rows migrated, ALLOW_PICKLE_EMBEDDINGS can now be set to False")
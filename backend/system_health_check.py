@@ -105,7 +105,7 @@ async def test_redis():
         redis_cache.redis_client.set(test_key, test_value, ex=10)
         retrieved = redis_cache.redis_client.get(test_key)
         
-        if retrieved == test_value:
+        if retrieved == test_value.encode():
             print("      Redis read/write working")
             redis_cache.redis_client.delete(test_key)
             return True
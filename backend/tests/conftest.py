@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Add the backend directory to the path so `app` imports when run from anywhere
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
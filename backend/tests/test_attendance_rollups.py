@@ -0,0 +1,251 @@
+import asyncio
+import os
+import uuid
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+import app.models  # noqa: F401  (registers every table on Base.metadata)
+from app.db.base import Base
+from app.models.attendance import Attendance, AttendanceStatus
+from app.models.attendance_rollup import AttendanceOrgDay, AttendanceUserMonth
+from app.models.user import User
+from app.utils.attendance_rollups import forget_user, month_start, rebuild_statements, record_attendance
+
+
+def _sql(statement):
+    compiled = statement.compile(dialect=postgresql.dialect())
+    return " ".join(str(compiled).split()), compiled.params
+
+
+class RecordingSession:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+
+
+# ---------------- statement shape, no database needed ----------------
+
+def test_month_start():
+    assert month_start(date(2024, 2, 29)) == date(2024, 2, 1)
+
+
+@pytest.mark.parametrize("delta", [1, -1])
+def test_record_attendance_upserts_both_rollups(delta):
+    session = RecordingSession()
+    asyncio.run(record_attendance(session, 7, date(2024, 3, 15), AttendanceStatus.HALF_DAY, delta=delta))
+
+    user_month, org_day = (_sql(statement) for statement in session.statements)
+
+    sql, params = user_month
+    assert sql.startswith("INSERT INTO attendance_user_month")
+    assert "ON CONFLICT (user_id, month) DO UPDATE SET" in sql
+    assert "half_day = (attendance_user_month.half_day + " in sql
+    assert "total = (attendance_user_month.total + " in sql
+    assert params["user_id"] == 7
+    assert params["month"] == date(2024, 3, 1)
+    assert params["half_day"] == params["total"] == delta
+    assert params["half_day_1"] == params["total_1"] == delta
+
+    sql, params = org_day
+    assert sql.startswith("INSERT INTO attendance_org_day")
+    assert "ON CONFLICT (date) DO UPDATE SET" in sql
+    assert params["date"] == date(2024, 3, 15)
+    assert params["half_day"] == params["total"] == delta
+    assert params["half_day_1"] == params["total_1"] == delta
+
+
+def test_forget_user_subtracts_the_users_daily_counts():
+    session = RecordingSession()
+    asyncio.run(forget_user(session, 42))
+
+    (sql, params), = (_sql(statement) for statement in session.statements)
+    assert sql.startswith("UPDATE attendance_org_day SET")
+    for column in ("present", "absent", "half_day", "leave", "total"):
+        assert f"{column}=(attendance_org_day.{column} - anon_1.{column})" in sql.replace(" = ", "=")
+    assert "WHERE attendances.user_id = %(user_id_1)s GROUP BY attendances.date" in sql
+    assert "WHERE attendance_org_day.date = anon_1.date" in sql
+    assert params["user_id_1"] == 42
+
+
+def test_rebuild_statements_for_all_history():
+    statements = [_sql(statement)[0] for statement in rebuild_statements()]
+
+    assert statements[0] == "DELETE FROM attendance_user_month"
+    assert statements[1] == "DELETE FROM attendance_org_day"
+    assert statements[2].startswith(
+        "INSERT INTO attendance_user_month (user_id, month, present, absent, half_day, leave, total, updated_at) SELECT"
+    )
+    assert "count(*) FILTER (WHERE attendances.status = " in statements[2]
+    assert "GROUP BY attendances.user_id, CAST(date_trunc(" in statements[2]
+    assert statements[3].startswith(
+        "INSERT INTO attendance_org_day (date, present, absent, half_day, leave, total, updated_at) SELECT"
+    )
+    assert "GROUP BY attendances.date" in statements[3]
+    assert all("WHERE" not in statement for statement in statements[:2])
+
+
+def test_rebuild_statements_since_a_month():
+    statements = [_sql(statement) for statement in rebuild_statements(date(2024, 1, 1))]
+
+    assert statements[0][0] == "DELETE FROM attendance_user_month WHERE attendance_user_month.month >= %(month_1)s"
+    assert statements[1][0] == "DELETE FROM attendance_org_day WHERE attendance_org_day.date >= %(date_1)s"
+    for sql, params in statements[2:]:
+        assert "WHERE attendances.date >= %(date_1)s" in sql
+        assert params["date_1"] == date(2024, 1, 1)
+
+
+# ---------------- behaviour against Postgres ----------------
+# Set TEST_DATABASE_URL (postgresql+asyncpg://...) to run these. They work in a
+# throwaway schema that is dropped afterwards.
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+TABLES = [User.__table__, Attendance.__table__, AttendanceUserMonth.__table__, AttendanceOrgDay.__table__]
+COUNT_COLUMNS = ("present", "absent", "half_day", "leave", "total")
+
+ATTENDANCE = [
+    # (user, day, status)
+    ("EMP1", date(2023, 12, 30), AttendanceStatus.PRESENT),
+    ("EMP1", date(2024, 1, 2), AttendanceStatus.PRESENT),
+    ("EMP1", date(2024, 1, 3), AttendanceStatus.HALF_DAY),
+    ("EMP2", date(2024, 1, 2), AttendanceStatus.LEAVE),
+    ("EMP2", date(2024, 1, 3), AttendanceStatus.PRESENT),
+    ("EMP2", date(2024, 2, 1), AttendanceStatus.ABSENT),
+]
+
+
+def _expected(rows, key):
+    counts = {}
+    for user_id, day, attendance_status in rows:
+        entry = counts.setdefault(key(user_id, day), dict.fromkeys(COUNT_COLUMNS, 0))
+        entry[attendance_status.value] += 1
+        entry["total"] += 1
+    return counts
+
+
+async def _rollups(session):
+    user_months = {
+        (row["user_id"], row["month"]): {column: row[column] for column in COUNT_COLUMNS}
+        for row in (await session.execute(select(AttendanceUserMonth.__table__))).mappings()
+    }
+    org_days = {
+        row["date"]: {column: row[column] for column in COUNT_COLUMNS}
+        for row in (await session.execute(select(AttendanceOrgDay.__table__))).mappings()
+        if row["total"]
+    }
+    return user_months, org_days
+
+
+def _expected_rollups(rows):
+    return (
+        _expected(rows, lambda user_id, day: (user_id, month_start(day))),
+        _expected(rows, lambda user_id, day: day),
+    )
+
+
+@pytest.fixture
+def database():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    schema = f"rollup_test_{uuid.uuid4().hex[:8]}"
+
+    async def setup():
+        admin = create_async_engine(TEST_DATABASE_URL)
+        async with admin.begin() as conn:
+            await conn.execute(text(f'CREATE SCHEMA "{schema}"'))
+        await admin.dispose()
+        engine = create_async_engine(TEST_DATABASE_URL, connect_args={"server_settings": {"search_path": schema}})
+        async with engine.begin() as conn:
+            await conn.run_sync(lambda sync_conn: Base.metadata.create_all(sync_conn, tables=TABLES))
+        return engine
+
+    async def teardown(engine):
+        async with engine.begin() as conn:
+            await conn.execute(text(f'DROP SCHEMA "{schema}" CASCADE'))
+        await engine.dispose()
+
+    engine = asyncio.run(setup())
+    yield engine
+    asyncio.run(teardown(engine))
+
+
+async def _mark_everything(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        users = {}
+        for employee_id in ("EMP1", "EMP2"):
+            user = User(
+                employee_id=employee_id,
+                full_name=employee_id,
+                email=f"{employee_id.lower()}@example.com",
+                hashed_password="x",
+            )
+            session.add(user)
+            users[employee_id] = user
+        await session.flush()
+
+        rows = []
+        for employee_id, day, attendance_status in ATTENDANCE:
+            user_id = users[employee_id].id
+            session.add(Attendance(user_id=user_id, date=day, time_in=datetime(day.year, day.month, day.day, 9), status=attendance_status))
+            await record_attendance(session, user_id, day, attendance_status)
+            rows.append((user_id, day, attendance_status))
+        await session.commit()
+        return users, rows
+
+
+def test_incremental_rollups_match_the_attendance_rows(database):
+    async def scenario():
+        _, rows = await _mark_everything(database)
+        async with AsyncSession(database) as session:
+            return await _rollups(session), _expected_rollups(rows)
+
+    actual, expected = asyncio.run(scenario())
+    assert actual == expected
+
+
+def test_forget_user_and_delete_leave_only_the_other_users_counts(database):
+    async def scenario():
+        users, rows = await _mark_everything(database)
+        gone = users["EMP1"].id
+        async with AsyncSession(database) as session:
+            await forget_user(session, gone)
+            await session.execute(delete(Attendance).where(Attendance.user_id == gone))
+            await session.execute(delete(User).where(User.id == gone))
+            await session.commit()
+            return await _rollups(session), _expected_rollups([row for row in rows if row[0] != gone])
+
+    actual, expected = asyncio.run(scenario())
+    assert actual == expected
+
+
+def test_rebuild_restores_the_rollups(database):
+    async def scenario():
+        _, rows = await _mark_everything(database)
+        async with AsyncSession(database) as session:
+            # drift in every month, a --since rebuild only repairs from January on
+            await session.execute(AttendanceUserMonth.__table__.update().values(present=99))
+            await session.execute(AttendanceOrgDay.__table__.update().values(total=99))
+            await session.commit()
+
+            for statement in rebuild_statements(date(2024, 1, 1)):
+                await session.execute(statement)
+            await session.commit()
+            partial = await _rollups(session)
+
+            for statement in rebuild_statements():
+                await session.execute(statement)
+            await session.commit()
+            return partial, await _rollups(session), _expected_rollups(rows)
+
+    partial, full, expected = asyncio.run(scenario())
+    december = date(2023, 12, 1)
+    assert {key: value for key, value in partial[0].items() if key[1] > december} == \
+        {key: value for key, value in expected[0].items() if key[1] > december}
+    assert all(value["present"] == 99 for key, value in partial[0].items() if key[1] == december)
+    assert partial[1][date(2023, 12, 30)]["total"] == 99
+    assert full == expected
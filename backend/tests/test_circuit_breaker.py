@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+
+from app.utils import async_redis_cache as async_redis_cache_module
+from app.utils.async_redis_cache import AsyncRedisCacheService, CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(async_redis_cache_module.time, "monotonic", clock)
+    return clock
+
+
+def _opened(threshold=2, cooldown=30.0):
+    breaker = CircuitBreaker(threshold, cooldown)
+    for _ in range(threshold):
+        assert breaker.allow()
+        breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_threshold_and_fails_fast(clock):
+    breaker = _opened()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_half_open_lets_exactly_one_trial_through(clock):
+    breaker = _opened()
+    clock.now += 30
+
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    assert not breaker.allow()
+
+
+def test_failed_trial_reopens_and_successful_trial_closes(clock):
+    breaker = _opened()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_trial_that_never_reports_back_is_replaced_after_a_cooldown(clock):
+    breaker = _opened()
+    clock.now += 30
+    assert breaker.allow()  # e.g. the request was cancelled mid-command
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+
+def test_burst_after_cooldown_waits_on_a_single_command():
+    # real clock, the event loop reads time.monotonic too
+    service = AsyncRedisCacheService()
+    service.client = object()
+    service.breaker = _opened(cooldown=0.05)
+    time.sleep(0.06)
+    started = []
+
+    async def command(_):
+        started.append(1)
+        await asyncio.sleep(0.01)
+        raise ConnectionError("redis is still down")
+
+    async def burst():
+        return await asyncio.gather(*(service.call(command, "fallback") for _ in range(20)))
+
+    assert asyncio.run(burst()) == ["fallback"] * 20
+    assert len(started) == 1
+    assert service.breaker.state == "open"
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+from app.utils import detector_cascade as detector_cascade_module
+from app.utils.detector_cascade import DetectorCascade
+from app.utils.inference_executor import InferenceExecutor
+
+BACKENDS = ["retinaface", "mtcnn", "opencv"]
+
+
+def _worker_cascade(**kwargs):
+    cascade = DetectorCascade(BACKENDS, **kwargs)
+    cascade.keep_log = True
+    return cascade
+
+
+def _run_request(cascade, backend, success, sleep_ms=0.0):
+    run = cascade.start()
+    if sleep_ms:
+        time.sleep(sleep_ms / 1000)
+    cascade.record(backend, 12.0, success, 0.9 if success else 0.0)
+    return run.budget_left()
+
+
+def test_replay_merges_requests_attempts_and_budget_stops():
+    worker = _worker_cascade(time_budget_ms=1)
+    _run_request(worker, "retinaface", True)
+    _run_request(worker, "mtcnn", False, sleep_ms=5)
+    _run_request(worker, "opencv", True, sleep_ms=5)
+
+    parent = DetectorCascade(BACKENDS, time_budget_ms=1)
+    parent.replay(worker.drain_log())
+
+    stats = parent.stats()
+    assert stats["requests"] == 3
+    assert stats["budget_exhausted"] == worker.stats()["budget_exhausted"] >= 2
+    attempts = {backend["backend"]: backend["attempts"] for backend in stats["backends"]}
+    assert attempts == {"retinaface": 1, "mtcnn": 1, "opencv": 1}
+    assert worker.drain_log() == []
+
+
+def test_parent_without_log_records_nothing_extra():
+    parent = DetectorCascade(BACKENDS)
+    parent.plan()
+    parent.record("retinaface", 5.0, True, 0.99)
+    assert parent.drain_log() == []
+    assert parent.stats()["requests"] == 1
+
+
+def test_process_mode_detect_replays_worker_log_into_admin_stats(monkeypatch):
+    worker = _worker_cascade(time_budget_ms=1)
+    parent = DetectorCascade(BACKENDS, time_budget_ms=1)
+    monkeypatch.setattr(detector_cascade_module, "detector_cascade", parent)
+
+    executor = InferenceExecutor(mode="process")
+
+    async def run_in_worker(fn, *args):
+        # what _detect_in_worker does in a worker process
+        _run_request(worker, "retinaface", False, sleep_ms=5)
+        return None, worker.drain_log()
+
+    executor.run = run_in_worker
+    for _ in range(2):
+        asyncio.run(executor.detect(b"jpeg bytes"))
+
+    stats = parent.stats()
+    assert stats["requests"] == 2
+    assert stats["budget_exhausted"] == 2
+    assert stats["backends"][0]["attempts"] == 2
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from app.utils import inference_executor as inference_executor_module
+from app.utils.embedding_batcher import EmbeddingBatcher
+from app.utils.inference_executor import InferenceExecutor, InferenceOverloadedError
+
+
+def test_batcher_fans_embeddings_back_to_their_callers():
+    batches = []
+
+    async def run_batch(faces):
+        batches.append(len(faces))
+        return [face * 2 for face in faces]
+
+    async def scenario():
+        batcher = EmbeddingBatcher(run_batch, max_batch_size=4, max_wait_ms=20)
+        results = await asyncio.gather(*(batcher.embed(np.full(3, i, dtype=np.float32)) for i in range(10)))
+        batcher.close()
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert [float(result[0]) for result in results] == [2.0 * i for i in range(10)]
+    assert batches == [4, 4, 2]
+
+
+def test_batches_needed_rounds_up_waiting_crops():
+    async def run_batch(faces):
+        return faces
+
+    batcher = EmbeddingBatcher(run_batch, max_batch_size=4)
+    assert batcher.batches_needed() == 0
+    batcher._waiting = 5
+    assert batcher.batches_needed() == 2
+    assert batcher.batches_needed(3) == 2
+    assert batcher.batches_needed(4) == 3
+
+
+def test_crops_are_rejected_at_enqueue_and_accepted_crops_never_get_503(monkeypatch):
+    release = threading.Event()
+
+    def blocking_embed(faces):
+        release.wait(5)
+        return [face.sum() for face in faces]
+
+    monkeypatch.setattr(inference_executor_module, "_embed_in_worker", blocking_embed)
+
+    async def scenario():
+        executor = InferenceExecutor(max_workers=1, max_queue=1, mode="thread")
+        executor.batcher.max_batch_size = 4
+        executor.batcher.max_wait_ms = 20
+
+        # one slot holds a running task, the other is reserved by the first crop
+        busy = asyncio.create_task(executor.run(blocking_embed, [np.ones(1)]))
+        accepted = [asyncio.create_task(executor.embed(np.full(2, i, dtype=np.float32))) for i in range(4)]
+        await asyncio.sleep(0)
+        assert executor.batcher.batches_needed() == 1
+
+        # a fifth crop would need a second batch, a direct task a third slot
+        with pytest.raises(InferenceOverloadedError):
+            await executor.embed(np.zeros(2, dtype=np.float32))
+        with pytest.raises(InferenceOverloadedError):
+            await executor.run(blocking_embed, [np.ones(1)])
+
+        # the pool is full when the batch is dispatched, it still runs
+        await asyncio.sleep(0.05)
+        assert executor._pending == 2
+        release.set()
+        results = await asyncio.gather(busy, *accepted)
+        executor.shutdown()
+        return results[1:], executor.stats()
+
+    results, stats = asyncio.run(scenario())
+
+    assert [float(result) for result in results] == [0.0, 2.0, 4.0, 6.0]
+    assert stats["rejected"] == 2
@@ -0,0 +1,62 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.utils.face_encoder import EMBEDDING_FORMAT_VERSION, FaceEncoder
+
+
+@pytest.mark.parametrize("model_name", ["", "ArcFace", "a-much-longer-model-name"])
+def test_binary_round_trip(model_name):
+    embedding = np.random.default_rng(0).standard_normal(512)
+    data = FaceEncoder.serialize_embedding(embedding, model_name=model_name)
+
+    header = FaceEncoder.read_embedding_header(data)
+    restored = FaceEncoder.deserialize_embedding(data)
+
+    assert not FaceEncoder.is_legacy_embedding(data)
+    assert header.version == EMBEDDING_FORMAT_VERSION
+    assert header.dim == 512
+    assert header.model_name == model_name
+    assert header.offset % 4 == 0
+    assert len(data) == header.offset + 512 * 4
+    assert restored.dtype == np.float32
+    np.testing.assert_array_equal(restored, embedding.astype(np.float32))
+
+
+def test_normalized_flag_and_values():
+    data = FaceEncoder.serialize_embedding(np.array([3.0, 4.0]), normalize=True)
+
+    assert FaceEncoder.read_embedding_header(data).normalized
+    np.testing.assert_allclose(FaceEncoder.deserialize_embedding(data), [0.6, 0.8], rtol=1e-6)
+
+
+def test_round_trip_through_memoryview():
+    # asyncpg hands bytea back as bytes, Redis pipelines may give memoryviews
+    data = FaceEncoder.serialize_embedding(np.arange(8, dtype=np.float32), model_name="ArcFace")
+    np.testing.assert_array_equal(FaceEncoder.deserialize_embedding(memoryview(data)), np.arange(8))
+
+
+def test_unknown_version_is_rejected():
+    data = bytearray(FaceEncoder.serialize_embedding(np.ones(4)))
+    data[4] = EMBEDDING_FORMAT_VERSION + 1
+    with pytest.raises(ValueError, match="Unsupported embedding format version"):
+        FaceEncoder.deserialize_embedding(bytes(data))
+
+
+def test_legacy_pickle_is_read_while_allowed(monkeypatch):
+    legacy = pickle.dumps(np.arange(4, dtype=np.float64))
+    monkeypatch.setattr(settings, "ALLOW_PICKLE_EMBEDDINGS", True)
+
+    assert FaceEncoder.is_legacy_embedding(legacy)
+    np.testing.assert_array_equal(FaceEncoder.deserialize_embedding(legacy), np.arange(4))
+
+
+def test_legacy_pickle_is_refused_once_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "ALLOW_PICKLE_EMBEDDINGS", False)
+
+    # refused before pickle.loads runs, whatever the payload is
+    for legacy in (pickle.dumps(np.arange(4, dtype=np.float64)), b"\x80\x04not a pickle"):
+        with pytest.raises(ValueError, match="ALLOW_PICKLE_EMBEDDINGS"):
+            FaceEncoder.deserialize_embedding(legacy)
@@ -0,0 +1,150 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.utils import face_gallery as face_gallery_module
+from app.utils.face_gallery import FaceGallery, FaissFaceGallery, QuantizedFaceGallery, TemplateFaceGallery
+from app.utils.gallery_loader import GalleryArrays, GalleryCodes
+from app.utils.quantization import quantize_int8
+
+DIM = 64
+FACES = 400
+TOP_K = 5
+
+
+def _random_rows(seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((FACES, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    face_ids = np.arange(1, FACES + 1, dtype=np.int64)
+    # up to five faces per employee, like the registration flow allows
+    user_ids = (face_ids - 1) // 5 + 100
+    employee_ids = np.array([f"EMP{user_id}" for user_id in user_ids], dtype=object)
+    full_names = np.array([f"Employee {user_id}" for user_id in user_ids], dtype=object)
+    return GalleryArrays(vectors, face_ids, user_ids, employee_ids, full_names)
+
+
+@pytest.fixture
+def rows(monkeypatch):
+    arrays = _random_rows()
+
+    async def load_arrays(dim, face_ids=None):
+        if face_ids is None:
+            return arrays
+        keep = np.isin(arrays.face_ids, face_ids)
+        return GalleryArrays(*(array[keep] for array in arrays))
+
+    async def load_codes(dim):
+        codes, scales = quantize_int8(arrays.vectors)
+        return GalleryCodes(codes, scales, arrays.face_ids, arrays.user_ids, arrays.employee_ids, arrays.full_names)
+
+    monkeypatch.setattr(face_gallery_module, "load_gallery_arrays", load_arrays)
+    monkeypatch.setattr(face_gallery_module, "load_gallery_codes", load_codes)
+    return arrays
+
+
+def _queries(rows, count=8, seed=1):
+    # noisy copies of enrolled faces, so there are clear best matches
+    rng = np.random.default_rng(seed)
+    picked = rows.vectors[rng.choice(FACES, count, replace=False)]
+    return list(picked + 0.3 * rng.standard_normal(picked.shape).astype(np.float32))
+
+
+def _brute_force(rows, query, k=TOP_K):
+    query = query / np.linalg.norm(query)
+    scores = rows.vectors @ query
+    top = np.argsort(-scores)[:k]
+    return [int(rows.face_ids[i]) for i in top], [float((scores[i] + 1) / 2) for i in top]
+
+
+def _gallery(kind, tmp_path):
+    if kind == "numpy":
+        return FaceGallery(dim=DIM)
+    if kind == "template":
+        # every user is rescored, so the result is exact
+        return TemplateFaceGallery(dim=DIM, top_users=FACES)
+    if kind == "quantized":
+        return QuantizedFaceGallery(dim=DIM, rerank_candidates=50)
+    if face_gallery_module.faiss is None:
+        pytest.skip("faiss is not installed")
+    gallery = FaissFaceGallery(dim=DIM)
+    gallery.face_index.index_path = str(tmp_path / "faiss_index.bin")
+    return gallery
+
+
+def _search(gallery, query):
+    return asyncio.run(gallery.search_async(query, top_k=TOP_K))
+
+
+GALLERY_KINDS = ["numpy", "template", "quantized", "faiss"]
+
+
+@pytest.mark.parametrize("kind", GALLERY_KINDS)
+def test_search_matches_brute_force(rows, tmp_path, kind):
+    gallery = _gallery(kind, tmp_path)
+    asyncio.run(gallery.reload())
+
+    for query in _queries(rows):
+        expected_ids, expected_similarities = _brute_force(rows, query)
+        matches = _search(gallery, query)
+        assert [match["face_id"] for match in matches] == expected_ids
+        np.testing.assert_allclose([match["similarity"] for match in matches], expected_similarities, atol=1e-5)
+        best = matches[0]
+        row = int(np.flatnonzero(rows.face_ids == best["face_id"])[0])
+        assert best["user_id"] == rows.user_ids[row]
+        assert best["employee_id"] == rows.employee_ids[row]
+        assert best["full_name"] == rows.full_names[row]
+
+
+@pytest.mark.parametrize("kind", GALLERY_KINDS)
+def test_batch_search_equals_single_searches(rows, tmp_path, kind):
+    gallery = _gallery(kind, tmp_path)
+    asyncio.run(gallery.reload())
+    queries = _queries(rows, count=6, seed=2)
+
+    batch = asyncio.run(gallery.search_batch_async(queries, top_k=TOP_K, threshold=0.5))
+    singles = [asyncio.run(gallery.search_async(query, top_k=TOP_K, threshold=0.5)) for query in queries]
+
+    # matrix-matrix and matrix-vector products may round the last float bit differently
+    assert [[match["face_id"] for match in matches] for matches in batch] == \
+        [[match["face_id"] for match in matches] for matches in singles]
+    np.testing.assert_allclose(
+        [match["similarity"] for matches in batch for match in matches],
+        [match["similarity"] for matches in singles for match in matches],
+        atol=1e-6,
+    )
+
+
+@pytest.mark.parametrize("kind", GALLERY_KINDS)
+def test_incremental_changes_match_a_fresh_load(rows, tmp_path, kind):
+    gallery = _gallery(kind, tmp_path)
+    asyncio.run(gallery.reload())
+
+    new_vector = _queries(rows, count=1, seed=3)[0]
+    gallery.add(FACES + 1, 999, "EMP999", "New Hire", new_vector)
+    gallery.remove_face(1)
+    gallery.remove_user(101)
+
+    assert len(gallery) == FACES + 1 - 1 - 5
+    matches = _search(gallery, new_vector)
+    assert matches[0]["face_id"] == FACES + 1
+    # the quantized gallery can't fetch the exact vector of a face the database doesn't have
+    assert matches[0]["similarity"] == pytest.approx(1.0, abs=1e-3)
+    for query in _queries(rows, count=20, seed=4):
+        found = {match["face_id"] for match in _search(gallery, query)}
+        assert 1 not in found
+        assert not found & set(range(6, 11))  # user 101's faces
+
+
+def test_empty_gallery_and_threshold(rows, tmp_path):
+    gallery = FaceGallery(dim=DIM)
+    gallery._loaded = True
+    query = _queries(rows, count=1)[0]
+    assert gallery.search(query) == []
+    assert gallery.search_batch([query, query]) == [[], []]
+
+    asyncio.run(gallery.reload())
+    _, similarities = _brute_force(rows, query)
+    matches = gallery.search(query, top_k=TOP_K, threshold=similarities[2])
+    assert len(matches) == 3
@@ -0,0 +1,57 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app.utils import face_index as face_index_module
+from app.utils.face_index import FaceIndex
+
+pytestmark = pytest.mark.skipif(face_index_module.faiss is None, reason="faiss is not installed")
+
+DIM = 16
+
+
+def _vectors(count, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "faiss_index.bin")
+    index = FaceIndex(dim=DIM, index_type="Flat", index_path=path)
+    vectors = _vectors(20)
+    index.build(np.arange(100, 120), vectors)
+    index.save({"faces": [[100, 1, "EMP1", "Jane"]], "digest": "abc"})
+
+    loaded = FaceIndex(dim=DIM, index_type="Flat", index_path=path)
+    metadata = loaded.load()
+
+    assert metadata["digest"] == "abc"
+    assert metadata["faces"] == [[100, 1, "EMP1", "Jane"]]
+    assert loaded.ntotal == 20
+    ids, _ = loaded.search(vectors[7], 1)
+    assert ids[0][0] == 107
+
+
+def test_save_writes_a_single_file_and_leaves_no_temp_files(tmp_path):
+    path = str(tmp_path / "faiss_index.bin")
+    index = FaceIndex(dim=DIM, index_type="Flat", index_path=path)
+    index.build(np.arange(5), _vectors(5))
+    index.save({"faces": []})
+    index.save({"faces": []})
+
+    assert os.listdir(tmp_path) == ["faiss_index.bin"]
+
+
+def test_load_ignores_old_layout_and_other_settings(tmp_path):
+    path = str(tmp_path / "faiss_index.bin")
+    # index and meta sidecar as two files, the layout before the combined file
+    with open(path, "wb") as f:
+        f.write(b"\x00" * 64)
+    with open(f"{path}.meta.json", "w") as f:
+        json.dump({"dim": DIM, "index_type": "FLAT"}, f)
+    assert FaceIndex(dim=DIM, index_type="Flat", index_path=path).load() is None
+
+    FaceIndex(dim=DIM, index_type="Flat", index_path=path).save({"faces": []})
+    assert FaceIndex(dim=DIM * 2, index_type="Flat", index_path=path).load() is None
@@ -0,0 +1,194 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from app.utils import face_gallery as face_gallery_module
+from app.utils.face_gallery import FaissFaceGallery
+from app.utils.gallery_loader import GalleryArrays, gallery_digest
+
+pytestmark = pytest.mark.skipif(face_gallery_module.faiss is None, reason="faiss is not installed")
+
+DIM = 8
+
+
+class FakeDatabase:
+    """Active gallery rows as load_gallery_arrays / load_gallery_digest would see them"""
+
+    def __init__(self, rows):
+        self.rows = dict(rows)  # face_id -> (user_id, employee_id, full_name, vector)
+        self.array_loads = 0
+
+    async def load_arrays(self, dim, face_ids=None):
+        self.array_loads += 1
+        ids = sorted(self.rows if face_ids is None else set(face_ids) & set(self.rows))
+        return GalleryArrays(
+            np.array([self.rows[i][3] for i in ids], dtype=np.float32).reshape(len(ids), dim),
+            np.array(ids, dtype=np.int64),
+            np.array([self.rows[i][0] for i in ids], dtype=np.int64),
+            np.array([self.rows[i][1] for i in ids], dtype=object),
+            np.array([self.rows[i][2] for i in ids], dtype=object),
+        )
+
+    async def load_digest(self):
+        return gallery_digest((i, user_id, emp, name) for i, (user_id, emp, name, _) in self.rows.items())
+
+
+def _vector(seed):
+    vector = np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    db = FakeDatabase({
+        1: (10, "EMP10", "Ada", _vector(1)),
+        2: (10, "EMP10", "Ada", _vector(2)),
+        3: (20, "EMP20", "Grace", _vector(3)),
+    })
+    monkeypatch.setattr(face_gallery_module, "load_gallery_arrays", db.load_arrays)
+    monkeypatch.setattr(face_gallery_module, "load_gallery_digest", db.load_digest)
+    return db
+
+
+def _gallery(path):
+    gallery = FaissFaceGallery(dim=DIM)
+    gallery.face_index.index_type = "FLAT"
+    gallery.face_index.index_path = str(path)
+    return gallery
+
+
+def test_fresh_index_is_loaded_without_scanning_vectors(tmp_path, database):
+    path = tmp_path / "faiss_index.bin"
+    asyncio.run(_gallery(path).ensure_loaded())
+    assert database.array_loads == 1
+
+    gallery = _gallery(path)
+    asyncio.run(gallery.ensure_loaded())
+
+    assert database.array_loads == 1
+    assert len(gallery) == 3
+    assert gallery.search(_vector(3), top_k=1)[0]["face_id"] == 3
+
+
+@pytest.mark.parametrize("change", ["rename", "delete_then_insert", "deactivate"])
+def test_index_is_rebuilt_when_the_database_changed(tmp_path, database, change):
+    path = tmp_path / "faiss_index.bin"
+    asyncio.run(_gallery(path).ensure_loaded())
+
+    if change == "rename":
+        user_id, employee_id, _, vector = database.rows[3]
+        database.rows[3] = (user_id, employee_id, "Grace Hopper", vector)
+    elif change == "delete_then_insert":
+        # same count and same max id as before
+        del database.rows[2]
+        database.rows[3] = (30, "EMP30", "Alan", _vector(4))
+    else:
+        del database.rows[3]
+
+    gallery = _gallery(path)
+    asyncio.run(gallery.ensure_loaded())
+
+    assert database.array_loads == 2
+    assert sorted(match["face_id"] for match in gallery.search(_vector(1), top_k=5)) == sorted(database.rows)
+
+
+def test_index_saved_by_a_worker_that_missed_a_delta_is_not_trusted(tmp_path, database):
+    path = tmp_path / "faiss_index.bin"
+    asyncio.run(_gallery(path).ensure_loaded())
+
+    stale = _gallery(path)
+    asyncio.run(stale.ensure_loaded())
+    # another worker registers face 4, this one never hears about it and saves
+    database.rows[4] = (40, "EMP40", "Linus", _vector(5))
+    asyncio.run(stale.save())
+
+    gallery = _gallery(path)
+    asyncio.run(gallery.ensure_loaded())
+
+    assert 4 in {match["face_id"] for match in gallery.search(_vector(5), top_k=5)}
+
+
+def test_close_waits_for_a_pending_debounced_save(tmp_path, database):
+    path = tmp_path / "faiss_index.bin"
+
+    async def scenario():
+        gallery = _gallery(path)
+        gallery.SAVE_DELAY = 0
+        await gallery.ensure_loaded()
+        gallery.add(5, 50, "EMP50", "Barbara", _vector(6))
+        while gallery._save_task is None:  # the timer fires and starts the save task
+            await asyncio.sleep(0.001)
+        await gallery.close()
+        assert gallery._save_task is None and not gallery._dirty
+
+    asyncio.run(scenario())
+    metadata = _gallery(path).face_index.load()
+    assert 5 in [face[0] for face in metadata["faces"]]
+
+
+def _ivf_gallery(path, monkeypatch, count):
+    # nlist=2 switches to IVF at 2 * 39 = 78 faces
+    db = FakeDatabase({i: (i, f"EMP{i}", f"User {i}", _vector(i)) for i in range(1, count + 1)})
+    monkeypatch.setattr(face_gallery_module, "load_gallery_arrays", db.load_arrays)
+    monkeypatch.setattr(face_gallery_module, "load_gallery_digest", db.load_digest)
+    gallery = _gallery(path)
+    gallery.face_index.index_type = "IVF"
+    gallery.face_index.nlist = 2
+    return gallery
+
+
+def test_reload_trains_the_index_off_the_event_loop(tmp_path, monkeypatch):
+    gallery = _ivf_gallery(tmp_path / "faiss_index.bin", monkeypatch, 100)
+    build_index = gallery.face_index.build_index
+    threads = []
+
+    def recording_build_index(face_ids, vectors):
+        threads.append(threading.current_thread())
+        return build_index(face_ids, vectors)
+
+    monkeypatch.setattr(gallery.face_index, "build_index", recording_build_index)
+    asyncio.run(gallery.ensure_loaded())
+
+    assert threads and threading.main_thread() not in threads
+    assert gallery.face_index.is_ivf
+    assert gallery.search(_vector(42), top_k=1)[0]["face_id"] == 42
+
+
+def test_growing_past_the_ivf_threshold_upgrades_in_the_background(tmp_path, monkeypatch):
+    gallery = _ivf_gallery(tmp_path / "faiss_index.bin", monkeypatch, 77)
+    build_index = gallery.face_index.build_index
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking_build_index(face_ids, vectors):
+        if len(face_ids) >= 78:
+            started.set()
+            release.wait(5)
+        return build_index(face_ids, vectors)
+
+    monkeypatch.setattr(gallery.face_index, "build_index", blocking_build_index)
+
+    async def scenario():
+        await gallery.ensure_loaded()
+        assert not gallery.face_index.is_ivf
+
+        gallery.add(78, 78, "EMP78", "User 78", _vector(78))
+        # add() returns before the index is retrained
+        assert not gallery.face_index.is_ivf
+        assert await asyncio.to_thread(started.wait, 5)
+
+        # changes made while the IVF index trains must survive the swap
+        gallery.add(200, 200, "EMP200", "User 200", _vector(200))
+        gallery.remove_face(1)
+        release.set()
+        await gallery._upgrade_task
+        await gallery.close()
+
+    asyncio.run(scenario())
+
+    assert gallery.face_index.is_ivf
+    assert gallery.face_index.ntotal == len(gallery) == 78
+    assert gallery.search(_vector(200), top_k=1)[0]["face_id"] == 200
+    assert all(match["face_id"] != 1 for match in gallery.search(_vector(1), top_k=78))
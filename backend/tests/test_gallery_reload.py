@@ -0,0 +1,97 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.utils import face_gallery as face_gallery_module
+from app.utils.face_gallery import FaceGallery, TemplateFaceGallery
+from app.utils.gallery_loader import GalleryArrays
+
+DIM = 8
+
+
+def _vector(seed):
+    vector = np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def _arrays(rows):
+    ids = sorted(rows)
+    return GalleryArrays(
+        np.array([rows[i][2] for i in ids], dtype=np.float32).reshape(len(ids), DIM),
+        np.array(ids, dtype=np.int64),
+        np.array([rows[i][0] for i in ids], dtype=np.int64),
+        np.array([rows[i][1] for i in ids], dtype=object),
+        np.array([rows[i][1] for i in ids], dtype=object),
+    )
+
+
+@pytest.fixture
+def slow_snapshot(monkeypatch):
+    """A reload whose snapshot was read before the concurrent local change committed"""
+    state = {"rows": {1: (10, "EMP10", _vector(1)), 2: (20, "EMP20", _vector(2))}}
+
+    async def load(dim, face_ids=None):
+        rows = dict(state["rows"])
+        await state["during_read"]()
+        return _arrays(rows)
+
+    monkeypatch.setattr(face_gallery_module, "load_gallery_arrays", load)
+    return state
+
+
+def _face_ids(gallery):
+    return sorted(match["face_id"] for match in gallery.search(_vector(0), top_k=10))
+
+
+@pytest.mark.parametrize("gallery_class", [FaceGallery, TemplateFaceGallery])
+def test_local_add_during_reload_survives_the_swap(slow_snapshot, gallery_class):
+    gallery = gallery_class(dim=DIM)
+
+    async def scenario():
+        async def nothing():
+            pass
+
+        slow_snapshot["during_read"] = nothing
+        await gallery.reload()
+
+        async def register_face():
+            gallery.add(3, 30, "EMP30", "EMP30", _vector(3))
+
+        slow_snapshot["during_read"] = register_face
+        await gallery.reload()
+
+    asyncio.run(scenario())
+
+    assert _face_ids(gallery) == [1, 2, 3]
+    assert gallery.search(_vector(3), top_k=1)[0]["face_id"] == 3
+
+
+def test_local_removals_during_reload_survive_the_swap(slow_snapshot):
+    gallery = FaceGallery(dim=DIM)
+
+    async def scenario():
+        async def delete():
+            gallery.remove_face(1)
+            gallery.remove_user(20)
+
+        slow_snapshot["during_read"] = delete
+        await gallery.reload()
+
+    asyncio.run(scenario())
+
+    assert _face_ids(gallery) == []
+    assert gallery._journals == []
+
+
+def test_add_before_the_first_load_is_ignored(slow_snapshot):
+    gallery = FaceGallery(dim=DIM)
+    gallery.add(9, 90, "EMP90", "EMP90", _vector(9))
+    assert len(gallery) == 0
+
+    async def nothing():
+        pass
+
+    slow_snapshot["during_read"] = nothing
+    asyncio.run(gallery.reload())
+    assert _face_ids(gallery) == [1, 2]
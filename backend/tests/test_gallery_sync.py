@@ -0,0 +1,60 @@
+import asyncio
+
+import numpy as np
+
+from app.utils import gallery_sync as gallery_sync_module
+from app.utils.face_gallery import FaceGallery
+from app.utils.gallery_sync import GallerySync
+
+
+def test_applied_removals_are_dropped_from_the_shared_redis_tier(monkeypatch):
+    removed = []
+
+    async def remove_gallery_faces(face_ids):
+        removed.append(list(face_ids))
+        return True
+
+    monkeypatch.setattr(gallery_sync_module.async_redis_cache, "remove_gallery_faces", remove_gallery_faces)
+
+    gallery = FaceGallery(dim=4)
+    gallery._loaded = True
+    gallery.add(1, 10, "EMP10", "Ada", np.ones(4))
+    sync = GallerySync(gallery)
+
+    asyncio.run(sync._apply(added=[], removed=[1]))
+
+    assert len(gallery) == 0
+    assert removed == [[1]]
+
+
+def _message(version, origin, added=(), removed=()):
+    return f'{version}|{{"origin": "{origin}", "added": {list(added)}, "removed": {list(removed)}}}'.encode()
+
+
+def test_versioned_deltas_apply_in_order_and_gaps_trigger_a_reload(monkeypatch):
+    sync = GallerySync(FaceGallery(dim=4))
+    applied = []
+    reloads = []
+
+    async def apply(added, removed):
+        applied.append((added, removed))
+
+    async def full_reload(version):
+        reloads.append(version)
+        sync.version = version
+
+    monkeypatch.setattr(sync, "_apply", apply)
+    monkeypatch.setattr(sync, "_full_reload", full_reload)
+
+    async def scenario():
+        await sync._handle(_message(1, "other", added=[5]))
+        await sync._handle(_message(2, sync.origin, added=[6]))  # our own change, already applied
+        await sync._handle(_message(2, "other", removed=[5]))  # duplicate version
+        await sync._handle(_message(5, "other", removed=[6]))  # versions 3 and 4 were missed
+        await sync._handle(_message(6, "other", removed=[7]))
+
+    asyncio.run(scenario())
+
+    assert applied == [([5], []), ([], [7])]
+    assert reloads == [5]
+    assert sync.version == 6
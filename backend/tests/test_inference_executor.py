@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.utils.inference_executor import InferenceExecutor, InferenceOverloadedError
+
+
+def _blocking(release: threading.Event):
+    release.wait(5)
+    return "done"
+
+
+def test_saturated_pool_rejects_with_503_and_retry_after():
+    async def scenario():
+        executor = InferenceExecutor(max_workers=1, max_queue=1, mode="thread")
+        executor._avg_task_seconds = 2.0
+        release = threading.Event()
+        running = [asyncio.create_task(executor.run(_blocking, release)) for _ in range(executor.capacity)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(InferenceOverloadedError) as excinfo:
+            await executor.run(_blocking, release)
+
+        release.set()
+        results = await asyncio.gather(*running)
+        executor.shutdown()
+        return excinfo.value, results, executor.stats()
+
+    error, results, stats = asyncio.run(scenario())
+
+    assert error.status_code == 503
+    # two tasks pending on one worker, about 2s each
+    assert error.headers["Retry-After"] == "4"
+    assert results == ["done", "done"]
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+    assert stats["pending"] == 0
+
+
+def test_pool_accepts_again_once_a_slot_frees_up():
+    async def scenario():
+        executor = InferenceExecutor(max_workers=1, max_queue=0, mode="thread")
+        release = threading.Event()
+        first = asyncio.create_task(executor.run(_blocking, release))
+        await asyncio.sleep(0)
+        with pytest.raises(InferenceOverloadedError):
+            await executor.run(_blocking, release)
+        release.set()
+        await first
+        result = await executor.run(_blocking, release)
+        executor.shutdown()
+        return result
+
+    assert asyncio.run(scenario()) == "done"
@@ -0,0 +1,71 @@
+import asyncio
+import csv
+import io
+from datetime import date, datetime
+
+from openpyxl import load_workbook
+
+from app.models.attendance import AttendanceStatus
+from app.utils import report_export
+from app.utils.report_export import REPORT_HEADERS, _format_row, build_xlsx, iter_file, stream_csv
+
+ROWS = [
+    (date(2024, 1, 2), "EMP1", "Zoë Åberg", datetime(2024, 1, 2, 9, 5), datetime(2024, 1, 2, 17, 30), AttendanceStatus.PRESENT),
+    (date(2024, 1, 3), "EMP2", "Bob", None, None, AttendanceStatus.LEAVE),
+    (date(2024, 1, 4), "EMP3", "A much longer employee name", datetime(2024, 1, 4, 13, 0), None, AttendanceStatus.HALF_DAY),
+]
+
+
+def _fake_rows(monkeypatch, chunk_size=2):
+    async def iter_report_rows(start_date=None, end_date=None):
+        for start in range(0, len(ROWS), chunk_size):
+            yield [_format_row(row) for row in ROWS[start:start + chunk_size]]
+
+    monkeypatch.setattr(report_export, "iter_report_rows", iter_report_rows)
+
+
+async def _collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+def test_format_row():
+    assert _format_row(ROWS[0]) == ["2024-01-02", "EMP1", "Zoë Åberg", "09:05 AM", "05:30 PM", "present", "Tuesday"]
+    assert _format_row(ROWS[1])[3:6] == ["", "", "leave"]
+
+
+def test_csv_streams_one_block_per_chunk(monkeypatch):
+    _fake_rows(monkeypatch)
+    chunks = asyncio.run(_collect(stream_csv()))
+
+    assert len(chunks) == 2
+    text = b"".join(chunks).decode("utf-8")
+    assert text.startswith("﻿")
+    rows = list(csv.reader(io.StringIO(text.lstrip("﻿"))))
+    assert rows == [REPORT_HEADERS] + [_format_row(row) for row in ROWS]
+
+
+def test_csv_with_no_rows_is_just_the_header(monkeypatch):
+    async def no_rows(start_date=None, end_date=None):
+        return
+        yield
+
+    monkeypatch.setattr(report_export, "iter_report_rows", no_rows)
+    text = b"".join(asyncio.run(_collect(stream_csv()))).decode("utf-8")
+    assert list(csv.reader(io.StringIO(text.lstrip("﻿")))) == [REPORT_HEADERS]
+
+
+def test_xlsx_has_bold_header_rows_and_widths(monkeypatch):
+    _fake_rows(monkeypatch)
+
+    async def build():
+        return b"".join(await _collect(iter_file(await build_xlsx())))
+
+    workbook = load_workbook(io.BytesIO(asyncio.run(build())))
+    sheet = workbook["Attendance Report"]
+    values = [list(row) for row in sheet.iter_rows(values_only=True)]
+
+    assert values[0] == REPORT_HEADERS
+    assert values[1:] == [[value or None for value in _format_row(row)] for row in ROWS]
+    assert all(cell.font.bold for cell in sheet[1])
+    # sized from the header and the first chunk
+    assert sheet.column_dimensions["C"].width == len("Employee Name") + 2
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from app import main
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(main, "STARTUP_RETRY_DELAY", 0.001)
+    monkeypatch.setattr(main, "STARTUP_RETRY_MAX_DELAY", 0.004)
+
+
+def _flaky(failures):
+    calls = []
+
+    async def step():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise RuntimeError("database is not up yet")
+        return "loaded"
+
+    return step, calls
+
+
+def test_failed_step_is_retried_until_it_succeeds():
+    step, calls = _flaky(failures=3)
+    assert asyncio.run(main.retry_startup_step("Gallery load", step)) == "loaded"
+    assert len(calls) == 4
+
+
+def test_failed_warm_up_eventually_marks_models_warm(monkeypatch):
+    step, calls = _flaky(failures=2)
+    monkeypatch.setattr(main.inference_executor, "warm_up", step)
+    monkeypatch.setattr(main.app.state, "models_warm", False)
+
+    asyncio.run(main.warm_up_models())
+
+    assert main.app.state.models_warm
+    assert len(calls) == 3
+
+
+def test_ready_reports_503_until_the_gallery_is_loaded(monkeypatch):
+    monkeypatch.setattr(main.app.state, "models_warm", True)
+    monkeypatch.setattr(main.face_gallery, "_loaded", False)
+    assert asyncio.run(main.readiness_check()).status_code == 503
+
+    monkeypatch.setattr(main.face_gallery, "_loaded", True)
+    assert asyncio.run(main.readiness_check()).status_code == 200